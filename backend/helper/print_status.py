@@ -1,90 +1,174 @@
 """
 Print Status Script
-Scans DynamoDB to get all inverter and system status information
+Queries DynamoDB (SK-PK index, or a parallel scan if it is missing) to get all
+inverter and system status information
 Handles pagination properly and provides summary statistics
 """
 
 import os
+import sys
+import logging
+import queue
+import threading
 import boto3
+import botocore.config
 from collections import Counter
-from typing import Dict, List, Any
-from decimal import Decimal
+from itertools import chain
+from typing import Dict, List, Any, Iterable, Iterator, Optional
+
+# The SK-PK index reads are shared with the Lambdas
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lambda'))
+from sk_pk_index import iter_sk_pk_pages
+
+# Per-item lines are logged at DEBUG; run with LOG_LEVEL=DEBUG to see them
+logging.basicConfig(
+    level=os.environ.get('LOG_LEVEL', 'INFO'),
+    format='%(message)s'
+)
+logger = logging.getLogger('print_status')
 
 # AWS Configuration
 AWS_REGION = os.environ.get('AWS_REGION', 'us-east-1')
 DYNAMODB_TABLE_NAME = os.environ.get('DYNAMODB_TABLE_NAME', 'Moose-DDB')
+# Number of parallel segments used when the SK-PK index is unavailable
+SCAN_SEGMENTS = int(os.environ.get('SCAN_SEGMENTS', '4'))
+# Max pages (up to 1 MB each) a background prefetch may buffer ahead of its consumer
+PREFETCH_PAGES = int(os.environ.get('PREFETCH_PAGES', '8'))
+
+# Initialize DynamoDB client; the pool is sized so parallel scan segments and the
+# background system-status prefetch each get their own connection
+dynamodb_config = botocore.config.Config(
+    max_pool_connections=50
+)
+# The low-level client is used (not the Table resource) so items come back as typed
+# attribute dicts; only strings and list lengths are read, so no Decimals are built
+dynamodb_client = boto3.client('dynamodb', region_name=AWS_REGION, config=dynamodb_config)
+
+def _get_string(item: Dict[str, Any], name: str, default: str = '') -> str:
+    """Read a scalar attribute from a low-level (typed) DynamoDB item as a string"""
+    value = item.get(name)
+    if not value:
+        return default
+    return value.get('S', value.get('N', default))
+
+def _get_list_length(item: Dict[str, Any], name: str) -> int:
+    """Length of a list attribute in a low-level (typed) DynamoDB item (0 if missing/NULL)"""
+    value = item.get(name)
+    return len(value.get('L', ())) if value else 0
+
+def iter_entity_pages(pk_prefix: str, sk_value: str, projection: Optional[str] = None,
+                      attribute_names: Optional[Dict[str, str]] = None) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Yield pages of items (low-level typed dicts) with PK beginning with pk_prefix and SK = sk_value.
+    Queries the SK-PK index; falls back to a parallel scan if the index does not exist.
+    Only the attributes in projection are returned, which keeps more items per 1 MB page.
+    """
+    read_kwargs = {
+        'TableName': DYNAMODB_TABLE_NAME,
+        'ExpressionAttributeValues': {
+            ':pk_prefix': {'S': pk_prefix},
+            ':sk_value': {'S': sk_value}
+        }
+    }
+    if projection:
+        read_kwargs['ProjectionExpression'] = projection
+    if attribute_names:
+        read_kwargs['ExpressionAttributeNames'] = attribute_names
+    
+    return iter_sk_pk_pages(
+        dynamodb_client,
+        'SK = :sk_value AND begins_with(PK, :pk_prefix)',
+        'begins_with(PK, :pk_prefix) AND SK = :sk_value',
+        total_segments=SCAN_SEGMENTS,
+        **read_kwargs
+    )
+
+class _PrefetchError:
+    """Carries an exception raised on the prefetch thread back to the consumer"""
+    def __init__(self, error: Exception):
+        self.error = error
+
+def prefetch(iterable: Iterable[Any], max_buffered: int = PREFETCH_PAGES) -> Iterator[Any]:
+    """
+    Drain iterable on a background thread into a bounded queue and yield from it,
+    so fetching can run ahead of the consumer without buffering the whole result
+    """
+    buffer = queue.Queue(maxsize=max_buffered)
+    done = object()
+    
+    def _producer():
+        try:
+            for item in iterable:
+                buffer.put(item)
+        except Exception as e:
+            buffer.put(_PrefetchError(e))
+        finally:
+            buffer.put(done)
+    
+    threading.Thread(target=_producer, daemon=True).start()
+    
+    while True:
+        item = buffer.get()
+        if item is done:
+            return
+        if isinstance(item, _PrefetchError):
+            raise item.error
+        yield item
+
+def iter_inverter_status_pages() -> Iterator[List[Dict[str, Any]]]:
+    """Yield pages of Inverter# entries with SK = STATUS"""
+    # Only PK, status and pvSystemId are used ('status' is a reserved word)
+    return iter_entity_pages(
+        'Inverter#', 'STATUS',
+        projection='PK, #s, pvSystemId',
+        attribute_names={'#s': 'status'}
+    )
+
+def iter_system_status_pages() -> Iterator[List[Dict[str, Any]]]:
+    """Yield pages of System# entries with SK = STATUS"""
+    # Only PK, status and the inverter lists are used ('status' is a reserved word)
+    return iter_entity_pages(
+        'System#', 'STATUS',
+        projection='PK, #s, GreenInverters, RedInverters, MoonInverters, OfflineInverters',
+        attribute_names={'#s': 'status'}
+    )
 
-# Initialize DynamoDB client
-try:
-    dynamodb = boto3.resource('dynamodb', region_name=AWS_REGION)
-    table = dynamodb.Table(DYNAMODB_TABLE_NAME)
-    print(f"Connected to DynamoDB table: {DYNAMODB_TABLE_NAME}")
-except Exception as e:
-    print(f"Failed to connect to DynamoDB: {str(e)}")
-    exit(1)
-
-def convert_decimals(obj):
-    """Convert Decimal objects to appropriate Python types"""
-    if isinstance(obj, list):
-        return [convert_decimals(i) for i in obj]
-    elif isinstance(obj, dict):
-        return {k: convert_decimals(v) for k, v in obj.items()}
-    elif isinstance(obj, Decimal):
-        return float(obj)
-    else:
-        return obj
-
-def scan_inverter_status():
-    """Scan for all Inverter# entries with SK = STATUS"""
+def scan_inverter_status(inverter_pages: Optional[Iterable[List[Dict[str, Any]]]] = None):
+    """
+    Analyze all Inverter# entries with SK = STATUS in a single streaming pass
+    (pages fetched here unless an iterable is passed in). Returns only counts and the
+    status Counter, never the items or the pvSystemId set, so nothing scales with the table.
+    """
     print("\n" + "="*60)
     print("SCANNING INVERTER STATUS ENTRIES")
     print("="*60)
     
-    inverter_statuses = []
+    if inverter_pages is None:
+        inverter_pages = iter_inverter_status_pages()
     
-    # Initial scan
-    response = table.scan(
-        FilterExpression='begins_with(PK, :pk_prefix) AND SK = :sk_value',
-        ExpressionAttributeValues={
-            ':pk_prefix': 'Inverter#',
-            ':sk_value': 'STATUS'
-        }
-    )
-    
-    # Process the items
-    inverter_statuses.extend(response['Items'])
-    print(f"Found {len(response['Items'])} inverter status entries in first scan")
-    
-    # Handle pagination if there are more items
-    while 'LastEvaluatedKey' in response:
-        response = table.scan(
-            ExclusiveStartKey=response['LastEvaluatedKey'],
-            FilterExpression='begins_with(PK, :pk_prefix) AND SK = :sk_value',
-            ExpressionAttributeValues={
-                ':pk_prefix': 'Inverter#',
-                ':sk_value': 'STATUS'
-            }
-        )
-        inverter_statuses.extend(response['Items'])
-        print(f"Found {len(response['Items'])} more inverter status entries in pagination")
-    
-    print(f"\nTotal Inverter Status Entries Found: {len(inverter_statuses)}")
-    
-    # Analyze inverter statuses and collect unique pvSystemIds
+    # Analyze inverter statuses and collect unique pvSystemIds a page at a time;
+    # Counter.update / set.update keep the per-item counting loop in C
+    inverter_count = 0
     status_counter = Counter()
     unique_pv_system_ids = set()
+    log_items = logger.isEnabledFor(logging.DEBUG)
     
-    for item in inverter_statuses:
-        inverter_id = item['PK'].replace('Inverter#', '')
-        status = item.get('status', 'unknown')
-        status_counter[status] += 1
-        
-        # Collect unique pvSystemId
-        pv_system_id = item.get('pvSystemId', '')
-        if pv_system_id:
-            unique_pv_system_ids.add(pv_system_id)
+    for page in inverter_pages:
+        inverter_count += len(page)
+        status_counter.update(_get_string(item, 'status', 'unknown') for item in page)
+        unique_pv_system_ids.update(_get_string(item, 'pvSystemId') for item in page)
         
-        print(f"Inverter {inverter_id}: {status} (System: {pv_system_id})")
+        if log_items:
+            for item in page:
+                logger.debug("Inverter %s: %s (System: %s)",
+                             item['PK']['S'].replace('Inverter#', ''),
+                             _get_string(item, 'status', 'unknown'),
+                             _get_string(item, 'pvSystemId'))
+    
+    # Items without a pvSystemId contribute ''
+    unique_pv_system_ids.discard('')
+    
+    print(f"\nTotal Inverter Status Entries Found: {inverter_count}")
     
     # Print inverter statistics
     print(f"\n" + "-"*40)
@@ -95,65 +179,40 @@ def scan_inverter_status():
     print(f"TOTAL INVERTERS: {sum(status_counter.values())}")
     print(f"UNIQUE PV SYSTEM IDS: {len(unique_pv_system_ids)}")
     
-    return inverter_statuses, status_counter, unique_pv_system_ids
+    return inverter_count, status_counter, len(unique_pv_system_ids)
 
-def scan_system_status():
-    """Scan for all System# entries with SK = STATUS"""
+def scan_system_status(system_pages: Optional[Iterable[List[Dict[str, Any]]]] = None):
+    """
+    Analyze all System# entries with SK = STATUS in a single streaming pass
+    (pages fetched here unless an iterable is passed in). Returns the entry count, not the items.
+    """
     print("\n" + "="*60)
     print("SCANNING SYSTEM STATUS ENTRIES")
     print("="*60)
     
-    system_statuses = []
-    
-    # Initial scan
-    response = table.scan(
-        FilterExpression='begins_with(PK, :pk_prefix) AND SK = :sk_value',
-        ExpressionAttributeValues={
-            ':pk_prefix': 'System#',
-            ':sk_value': 'STATUS'
-        }
-    )
+    if system_pages is None:
+        system_pages = iter_system_status_pages()
     
-    # Process the items
-    system_statuses.extend(response['Items'])
-    print(f"Found {len(response['Items'])} system status entries in first scan")
-    
-    # Handle pagination if there are more items
-    while 'LastEvaluatedKey' in response:
-        response = table.scan(
-            ExclusiveStartKey=response['LastEvaluatedKey'],
-            FilterExpression='begins_with(PK, :pk_prefix) AND SK = :sk_value',
-            ExpressionAttributeValues={
-                ':pk_prefix': 'System#',
-                ':sk_value': 'STATUS'
-            }
-        )
-        system_statuses.extend(response['Items'])
-        print(f"Found {len(response['Items'])} more system status entries in pagination")
-    
-    print(f"\nTotal System Status Entries Found: {len(system_statuses)}")
-    
-    # Analyze system statuses
+    # Analyze system statuses as they stream in
+    system_count = 0
     total_green_inverters = 0
     total_red_inverters = 0
     total_moon_inverters = 0
     total_offline_inverters = 0
     system_overall_status_counter = Counter()
+    log_items = logger.isEnabledFor(logging.DEBUG)
     
-    for item in system_statuses:
-        system_id = item['PK'].replace('System#', '')
-        
-        # Convert decimals to regular numbers
-        item_converted = convert_decimals(item)
-        
-        # Get inverter counts
-        green_inverters = len(item_converted.get('GreenInverters', []))
-        red_inverters = len(item_converted.get('RedInverters', []))
-        moon_inverters = len(item_converted.get('MoonInverters', []))
-        offline_inverters = len(item_converted.get('OfflineInverters', []))
+    for item in chain.from_iterable(system_pages):
+        system_count += 1
+        # Get inverter counts; only list lengths are needed, so the typed
+        # attribute values are never deserialized
+        green_inverters = _get_list_length(item, 'GreenInverters')
+        red_inverters = _get_list_length(item, 'RedInverters')
+        moon_inverters = _get_list_length(item, 'MoonInverters')
+        offline_inverters = _get_list_length(item, 'OfflineInverters')
         
         # Get overall system status
-        overall_status = item_converted.get('status', 'unknown')
+        overall_status = _get_string(item, 'status', 'unknown')
         system_overall_status_counter[overall_status] += 1
         
         # Add to totals
@@ -162,14 +221,20 @@ def scan_system_status():
         total_moon_inverters += moon_inverters
         total_offline_inverters += offline_inverters
         
-        print(f"System {system_id}:")
-        print(f"  Overall Status: {overall_status}")
-        print(f"  Green Inverters: {green_inverters}")
-        print(f"  Red Inverters: {red_inverters}")
-        print(f"  Moon Inverters: {moon_inverters}")
-        print(f"  Offline Inverters: {offline_inverters}")
-        print(f"  Total Inverters: {green_inverters + red_inverters + moon_inverters + offline_inverters}")
-        print()
+        if log_items:
+            system_id = item['PK']['S'].replace('System#', '')
+            logger.debug("\n".join((
+                f"System {system_id}:",
+                f"  Overall Status: {overall_status}",
+                f"  Green Inverters: {green_inverters}",
+                f"  Red Inverters: {red_inverters}",
+                f"  Moon Inverters: {moon_inverters}",
+                f"  Offline Inverters: {offline_inverters}",
+                f"  Total Inverters: {green_inverters + red_inverters + moon_inverters + offline_inverters}",
+                ""
+            )))
+    
+    print(f"\nTotal System Status Entries Found: {system_count}")
     
     # Print system statistics
     print(f"\n" + "-"*40)
@@ -186,7 +251,7 @@ def scan_system_status():
         print(f"{status.upper()} SYSTEMS: {count}")
     print(f"TOTAL SYSTEMS: {sum(system_overall_status_counter.values())}")
     
-    return system_statuses, {
+    return system_count, {
         'total_green_inverters': total_green_inverters,
         'total_red_inverters': total_red_inverters,
         'total_moon_inverters': total_moon_inverters,
@@ -199,20 +264,32 @@ def main():
     print("🔍 SOLAR SYSTEM STATUS SCANNER")
     print("="*60)
     
+    # Creating the client makes no network call, so verify the table is reachable here
     try:
+        dynamodb_client.describe_table(TableName=DYNAMODB_TABLE_NAME)
+        print(f"Connected to DynamoDB table: {DYNAMODB_TABLE_NAME}")
+    except Exception as e:
+        print(f"Failed to connect to DynamoDB: {str(e)}")
+        exit(1)
+    
+    try:
+        # The two reads are independent, so start streaming system statuses on a
+        # background thread (bounded buffer) while inverter statuses are analyzed
+        system_pages = prefetch(iter_system_status_pages())
+        
         # Scan inverter statuses
-        inverter_data, inverter_stats, unique_pv_system_ids = scan_inverter_status()
+        inverter_count, inverter_stats, unique_pv_system_count = scan_inverter_status()
         
         # Scan system statuses
-        system_data, system_stats = scan_system_status()
+        system_count, system_stats = scan_system_status(system_pages)
         
         # Print overall summary
         print("\n" + "="*60)
         print("OVERALL SUMMARY")
         print("="*60)
-        print(f"Total Individual Inverter Status Entries: {len(inverter_data)}")
-        print(f"Total System Status Entries: {len(system_data)}")
-        print(f"Unique PV System IDs (from inverters): {len(unique_pv_system_ids)}")
+        print(f"Total Individual Inverter Status Entries: {inverter_count}")
+        print(f"Total System Status Entries: {system_count}")
+        print(f"Unique PV System IDs (from inverters): {unique_pv_system_count}")
         print()
         
         if inverter_stats:
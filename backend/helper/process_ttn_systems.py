@@ -1,20 +1,31 @@
 """
 TTN System Processing Script
 
-This script queries the Moose DynamoDB table for system profiles where PK begins with "System#" 
-and SK = "PROFILE". For systems where the name starts with "TTN", it creates user-to-system 
-link entries in the database.
+This script queries the Moose DynamoDB table (via the SK-PK index) for system profiles where
+PK begins with "System#" and SK = "PROFILE". For systems where the name starts with "TTN", it
+creates user-to-system link entries in the database.
 
 Usage:
     python process_ttn_systems.py
 """
 
 import os
+import sys
 import json
+import time
 import logging
 import boto3
-from typing import List, Dict, Any
+import botocore.config
+from boto3.dynamodb.conditions import Attr, Key
+from typing import List, Dict, Any, Optional
 from botocore.exceptions import ClientError
+from functools import reduce
+from itertools import product
+from operator import or_
+
+# The SK-PK index reads are shared with the Lambdas
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lambda'))
+from sk_pk_index import read_sk_pk_items
 
 # Set up logging
 logging.basicConfig(
@@ -26,48 +37,74 @@ logger = logging.getLogger('ttn_processor')
 # AWS Configuration (using same setup as load_db.py)
 AWS_REGION = os.environ.get('AWS_REGION', 'us-east-1')
 DYNAMODB_TABLE_NAME = os.environ.get('DYNAMODB_TABLE_NAME', 'Moose-DDB')
-
-# Initialize DynamoDB client
-dynamodb = boto3.resource('dynamodb', region_name=AWS_REGION)
+# Number of parallel segments used when the SK-PK index is unavailable
+SCAN_SEGMENTS = int(os.environ.get('SCAN_SEGMENTS', '4'))
+# BatchWriteItem accepts at most 25 puts per request
+BATCH_WRITE_SIZE = 25
+# Attempts per batch before unprocessed items are reported as failed
+MAX_BATCH_RETRIES = 5
+
+# Initialize DynamoDB client; the pool is sized so parallel scan segments do not
+# queue behind boto3's default of 10 connections
+dynamodb_config = botocore.config.Config(
+    max_pool_connections=50
+)
+dynamodb = boto3.resource('dynamodb', region_name=AWS_REGION, config=dynamodb_config)
 table = dynamodb.Table(DYNAMODB_TABLE_NAME)
 
 # Constants
 USER_ID = "a4286408-3001-70fd-700c-70fb8ed1936c"
 LINK_TYPE = "USER_TO_SYSTEM"
+# The user key is the same for every link, so build it once
+USER_KEY = f"User#{USER_ID}"
+# Every casing of "TTN" so the prefix check is one str.startswith call with no .upper() copy
+TTN_PREFIXES = tuple(''.join(chars) for chars in product('Tt', 'Tt', 'Nn'))
+# DynamoDB begins_with is case-sensitive, so OR together one check per casing
+TTN_NAME_FILTER = reduce(or_, (Attr('name').begins_with(prefix) for prefix in TTN_PREFIXES))
+
+
+def fetch_entity_items(pk_prefix: str, sk_value: str, projection: Optional[str] = None,
+                       attribute_names: Optional[Dict[str, str]] = None,
+                       filter_condition=None) -> List[Dict[str, Any]]:
+    """
+    Fetch all items with PK beginning with pk_prefix and SK = sk_value.
+    Queries the SK-PK index; falls back to a parallel scan if the index does not exist.
+    Only the attributes in projection are returned, which keeps more items per 1 MB page.
+    An optional filter_condition (boto3 Attr condition) is applied server-side.
+    """
+    read_kwargs = {}
+    if projection:
+        read_kwargs['ProjectionExpression'] = projection
+    if attribute_names:
+        read_kwargs['ExpressionAttributeNames'] = attribute_names
+    
+    key_condition = Key('SK').eq(sk_value) & Key('PK').begins_with(pk_prefix)
+    scan_filter = Attr('PK').begins_with(pk_prefix) & Attr('SK').eq(sk_value)
+    if filter_condition is not None:
+        read_kwargs['FilterExpression'] = filter_condition
+        scan_filter = scan_filter & filter_condition
+    
+    return read_sk_pk_items(table, key_condition, scan_filter, total_segments=SCAN_SEGMENTS, **read_kwargs)
 
 
 def query_system_profiles() -> List[Dict[str, Any]]:
     """
-    Query DynamoDB for all system profiles where PK begins with "System#" and SK = "PROFILE"
+    Query DynamoDB for system profiles where PK begins with "System#", SK = "PROFILE"
+    and the name starts with "TTN" (any casing). The name check runs server-side so
+    non-TTN profiles never leave DynamoDB.
     """
     try:
         logger.info("Querying DynamoDB for system profiles...")
         
-        # Use scan with filter expression since we need to check all items with PK starting with "System#"
-        response = table.scan(
-            FilterExpression='begins_with(PK, :pk_prefix) AND SK = :sk_value',
-            ExpressionAttributeValues={
-                ':pk_prefix': 'System#',
-                ':sk_value': 'PROFILE'
-            }
+        # Only name and systemId are used downstream ('name' is a reserved word)
+        items = fetch_entity_items(
+            'System#', 'PROFILE',
+            projection='systemId, #n',
+            attribute_names={'#n': 'name'},
+            filter_condition=TTN_NAME_FILTER
         )
         
-        items = response.get('Items', [])
-        
-        # Handle pagination if there are more items
-        while 'LastEvaluatedKey' in response:
-            logger.info("Fetching more items from DynamoDB...")
-            response = table.scan(
-                FilterExpression='begins_with(PK, :pk_prefix) AND SK = :sk_value',
-                ExpressionAttributeValues={
-                    ':pk_prefix': 'System#',
-                    ':sk_value': 'PROFILE'
-                },
-                ExclusiveStartKey=response['LastEvaluatedKey']
-            )
-            items.extend(response.get('Items', []))
-        
-        logger.info(f"Found {len(items)} system profile items")
+        logger.info(f"Found {len(items)} TTN system profile items")
         return items
         
     except ClientError as e:
@@ -80,18 +117,20 @@ def query_system_profiles() -> List[Dict[str, Any]]:
 
 def filter_ttn_systems(items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     """
-    Filter items to only include those where the 'name' attribute starts with 'TTN'
+    Filter items to only include those where the 'name' attribute starts with 'TTN'.
+    query_system_profiles already filters on name server-side; this is a sanity check
+    that also drops profiles missing a systemId.
     """
     ttn_systems = []
     
     for item in items:
         # Check if the item has a 'name' attribute and it starts with 'TTN'
         name = item.get('name', '')
-        if isinstance(name, str) and name.upper().startswith('TTN'):
+        if isinstance(name, str) and name.startswith(TTN_PREFIXES):
             # Ensure the item has a systemId
             if 'systemId' in item:
                 ttn_systems.append(item)
-                logger.info(f"Found TTN system: {name} (systemId: {item['systemId']})")
+                logger.debug("Found TTN system: %s (systemId: %s)", name, item['systemId'])
             else:
                 logger.warning(f"TTN system '{name}' is missing systemId attribute")
     
@@ -103,36 +142,49 @@ def create_user_system_link(system_id: str) -> Dict[str, Any]:
     """
     Create a user-to-system link entry for the given system ID
     """
+    system_key = "System#" + system_id
     return {
-        "PK": f"User#{USER_ID}",
-        "SK": f"System#{system_id}",
-        "GSI1PK": f"System#{system_id}",
-        "GSI1SK": f"User#{USER_ID}",
+        "PK": USER_KEY,
+        "SK": system_key,
+        "GSI1PK": system_key,
+        "GSI1SK": USER_KEY,
         "linkType": LINK_TYPE,
         "systemId": system_id,
         "userId": USER_ID
     }
 
 
-def add_user_system_link(system_id: str) -> bool:
+def add_user_system_links(system_ids: List[str]) -> int:
     """
-    Add a user-to-system link entry to DynamoDB
+    Add user-to-system link entries to DynamoDB using BatchWriteItem (25 items per request),
+    retrying unprocessed items with exponential backoff. A failed request is logged and the
+    remaining batches are still written. Returns the number of links actually written.
     """
-    try:
-        link_entry = create_user_system_link(system_id)
-        
-        # Use put_item to add the entry
-        table.put_item(Item=link_entry)
-        
-        logger.info(f"Successfully added user-to-system link for system {system_id}")
-        return True
-        
-    except ClientError as e:
-        logger.error(f"DynamoDB error adding link for system {system_id}: {e}")
-        return False
-    except Exception as e:
-        logger.error(f"Error adding user-to-system link for system {system_id}: {e}")
-        return False
+    # BatchWriteItem rejects a request that puts the same key twice
+    link_entries = [create_user_system_link(system_id) for system_id in dict.fromkeys(system_ids)]
+    written = 0
+    
+    for start in range(0, len(link_entries), BATCH_WRITE_SIZE):
+        requests = [{'PutRequest': {'Item': link_entry}}
+                    for link_entry in link_entries[start:start + BATCH_WRITE_SIZE]]
+        try:
+            for attempt in range(MAX_BATCH_RETRIES):
+                response = table.meta.client.batch_write_item(RequestItems={table.name: requests})
+                unprocessed = response.get('UnprocessedItems', {}).get(table.name, [])
+                written += len(requests) - len(unprocessed)
+                requests = unprocessed
+                if not requests:
+                    break
+                time.sleep(min(0.05 * 2 ** attempt, 2))
+            else:
+                logger.error(f"{len(requests)} user-to-system links still unprocessed after {MAX_BATCH_RETRIES} attempts")
+        except ClientError as e:
+            logger.error(f"DynamoDB error adding user-to-system links: {e}")
+        except Exception as e:
+            logger.error(f"Error adding user-to-system links: {e}")
+    
+    logger.info(f"Added {written} of {len(link_entries)} user-to-system links")
+    return written
 
 
 def process_ttn_systems():
@@ -153,20 +205,11 @@ def process_ttn_systems():
             logger.info("No TTN systems found. Exiting.")
             return
         
-        # Step 3: Process each TTN system
-        successful_additions = 0
-        failed_additions = 0
+        # Step 3: Link every TTN system to the user in batched writes
+        system_ids = list(dict.fromkeys(system['systemId'] for system in ttn_systems))
         
-        for system in ttn_systems:
-            system_id = system['systemId']
-            name = system.get('name', 'Unknown')
-            
-            logger.info(f"Processing TTN system: {name} (ID: {system_id})")
-            
-            if add_user_system_link(system_id):
-                successful_additions += 1
-            else:
-                failed_additions += 1
+        successful_additions = add_user_system_links(system_ids)
+        failed_additions = len(system_ids) - successful_additions
         
         # Step 4: Report results
         logger.info("=" * 50)
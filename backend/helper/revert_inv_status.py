@@ -2,7 +2,8 @@
 Inverter Status Reverter
 
 This script reverts all inverter STATUS entries back to their original clean state.
-It deletes all existing Inverter# STATUS entries and recreates them with a simple structure:
+It overwrites every Inverter# STATUS entry in place (PutItem on the same PK/SK replaces the
+whole item) with a simple structure:
 - device_id (snake_case)
 - pvSystemId
 - status (set to "green")
@@ -15,18 +16,30 @@ Usage:
 Environment Variables:
     - AWS_REGION: AWS region (default: us-east-1)
     - DYNAMODB_TABLE_NAME: DynamoDB table name (default: Moose-DDB)
+    - SK_PK_INDEX_NAME: GSI with SK as partition key and PK as sort key (default: SK-PK-index)
+    - SCAN_SEGMENTS: Parallel scan segments used if the index is missing (default: 4)
+    - WRITE_WORKERS: Concurrent batch writers (default: 8)
+    - WRITE_CHUNK_SIZE: Entries written per batch writer task (default: 100)
 """
 
 import os
+import sys
 import json
 import logging
 import boto3
+import botocore.config
 import time
-from datetime import datetime
-from typing import List, Dict, Any, Optional
-from botocore.exceptions import ClientError
+from boto3.dynamodb.conditions import Attr, Key
+from datetime import datetime, timezone
+from typing import List, Dict, Any, Iterable, Iterator, Optional
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from itertools import chain, islice
 from decimal import Decimal
 
+# The SK-PK index reads are shared with the Lambdas
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lambda'))
+from sk_pk_index import iter_sk_pk_pages
+
 # Set up logging
 logging.basicConfig(
     level=logging.INFO,
@@ -37,52 +50,64 @@ logger = logging.getLogger('status_reverter')
 # AWS Configuration
 AWS_REGION = os.environ.get('AWS_REGION', 'us-east-1')
 DYNAMODB_TABLE_NAME = os.environ.get('DYNAMODB_TABLE_NAME', 'Moose-DDB')
+# Number of parallel segments used when falling back to a table scan
+SCAN_SEGMENTS = int(os.environ.get('SCAN_SEGMENTS', '4'))
+# Concurrent batch writers and the number of entries each one handles per task
+WRITE_WORKERS = int(os.environ.get('WRITE_WORKERS', '8'))
+WRITE_CHUNK_SIZE = int(os.environ.get('WRITE_CHUNK_SIZE', '100'))
+# Puts sent per BatchWriteItem request by the batch writer
+BATCH_WRITE_SIZE = 25
+# Inverter STATUS rows on the SK-PK index, and the equivalent filter for the scan fallback
+INVERTER_STATUS_KEY_CONDITION = Key('SK').eq('STATUS') & Key('PK').begins_with('Inverter#')
+INVERTER_STATUS_FILTER = Attr('PK').begins_with('Inverter#') & Attr('SK').eq('STATUS')
 
-# Initialize DynamoDB client
-dynamodb = boto3.resource('dynamodb', region_name=AWS_REGION)
+# Initialize DynamoDB client; the pool is sized so parallel scan segments and batch
+# writers do not queue behind boto3's default of 10 connections. Adaptive retries back
+# off only when DynamoDB actually throttles, instead of a fixed sleep per write.
+dynamodb_config = botocore.config.Config(
+    max_pool_connections=50,
+    retries={'mode': 'adaptive', 'max_attempts': 10}
+)
+dynamodb = boto3.resource('dynamodb', region_name=AWS_REGION, config=dynamodb_config)
 table = dynamodb.Table(DYNAMODB_TABLE_NAME)
 
 
-def get_all_inverter_status_entries() -> List[Dict[str, Any]]:
+def iter_essential_status_data(stats: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
     """
-    Scan DynamoDB for all inverter STATUS entries (PK starts with Inverter# and SK = STATUS)
+    Stream all inverter STATUS entries (PK starts with Inverter# and SK = STATUS) from the
+    SK-PK index as essential data, counting found/skipped entries into stats as they pass.
+    Only the current page is held in memory.
     """
     try:
-        logger.info("Scanning DynamoDB for inverter STATUS entries...")
-        
-        inverter_entries = []
+        logger.info("Querying DynamoDB for inverter STATUS entries...")
         
-        # Use scan with filter expression
-        scan_kwargs = {
-            'FilterExpression': 'begins_with(PK, :pk_prefix) AND SK = :sk_value',
-            'ExpressionAttributeValues': {
-                ':pk_prefix': 'Inverter#',
-                ':sk_value': 'STATUS'
-            }
-        }
+        # Only the fields read by extract_essential_data are needed, which keeps more items per 1 MB page
+        pages = iter_sk_pk_pages(
+            table, INVERTER_STATUS_KEY_CONDITION, INVERTER_STATUS_FILTER,
+            total_segments=SCAN_SEGMENTS,
+            ProjectionExpression='PK, SK, device_id, deviceId, pvSystemId'
+        )
         
-        # Handle pagination
-        while True:
-            response = table.scan(**scan_kwargs)
-            inverter_entries.extend(response.get('Items', []))
+        for status_entry in chain.from_iterable(pages):
+            stats['entries_found'] += 1
             
-            # Check if there are more items to scan
-            if 'LastEvaluatedKey' not in response:
-                break
-                
-            scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+            essential_data = extract_essential_data(status_entry)
+            if essential_data:
+                yield essential_data
+            else:
+                logger.warning(f"⚠️  Skipping entry {status_entry.get('PK', 'unknown')} - could not extract essential data")
+                stats['entries_skipped'] += 1
         
-        logger.info(f"Found {len(inverter_entries)} inverter STATUS entries in DynamoDB")
-        return inverter_entries
+        logger.info(f"Found {stats['entries_found']} inverter STATUS entries in DynamoDB")
         
     except Exception as e:
-        logger.error(f"Error scanning DynamoDB for inverter STATUS entries: {str(e)}")
+        logger.error(f"Error querying DynamoDB for inverter STATUS entries: {str(e)}")
         raise
 
 
 def extract_essential_data(status_entry: Dict[str, Any]) -> Optional[Dict[str, Any]]:
     """
-    Extract essential data from a STATUS entry before deletion
+    Extract essential data from a STATUS entry before it is overwritten
     """
     try:
         # Try to get device_id from various possible field names
@@ -119,45 +144,68 @@ def extract_essential_data(status_entry: Dict[str, Any]) -> Optional[Dict[str, A
         return None
 
 
-def delete_status_entry(pk: str, sk: str) -> bool:
+def create_clean_status_entry(batch, device_id: str, pv_system_id: str, original_pk: str,
+                              last_updated: str) -> None:
     """
-    Delete a STATUS entry from DynamoDB
+    Queue a new clean STATUS entry with simple structure on the given batch writer.
+    The batch writer may flush inside put_item, so a failed write raises from here.
     """
-    try:
-        table.delete_item(
-            Key={'PK': pk, 'SK': sk}
-        )
-        logger.info(f"✅ Deleted STATUS entry: {pk}")
-        return True
-        
-    except Exception as e:
-        logger.error(f"❌ Error deleting STATUS entry {pk}: {str(e)}")
-        return False
+    # Create clean status entry
+    status_entry = {
+        'PK': original_pk,  # Keep the same PK format
+        'SK': 'STATUS',
+        'device_id': device_id,  # Use snake_case as requested
+        'pvSystemId': pv_system_id,
+        'status': 'green',  # Set to green as requested
+        'lastUpdated': last_updated,
+        'power': Decimal('0.0')  # Default power value
+    }
+    
+    batch.put_item(Item=status_entry)
+    logger.debug("✅ Queued clean STATUS entry: %s", original_pk)
 
 
-def create_clean_status_entry(device_id: str, pv_system_id: str, original_pk: str) -> bool:
+def write_clean_entries(essential_data_list: List[Dict[str, Any]], offset: int,
+                        last_updated: str) -> Dict[str, int]:
     """
-    Create a new clean STATUS entry with simple structure
+    Overwrite a chunk of STATUS entries with clean ones through a dedicated batch writer.
+    PutItem on an existing PK/SK replaces the item, so no delete is needed. The batch
+    writer sends BatchWriteItem requests of 25 and retries unprocessed items.
     """
+    chunk_stats = {'entries_created': 0, 'create_errors': 0}
+    # The batch writer only buffers puts and sends them each time BATCH_WRITE_SIZE are queued,
+    # so entries count as created once the request they are in has been sent
+    flushed = 0
+    unflushed = 0
+    
     try:
-        # Create clean status entry
-        status_entry = {
-            'PK': original_pk,  # Keep the same PK format
-            'SK': 'STATUS',
-            'device_id': device_id,  # Use snake_case as requested
-            'pvSystemId': pv_system_id,
-            'status': 'green',  # Set to green as requested
-            'lastUpdated': datetime.utcnow().isoformat(),
-            'power': Decimal('0.0')  # Default power value
-        }
-        
-        table.put_item(Item=status_entry)
-        logger.info(f"✅ Created clean STATUS entry: {original_pk}")
-        return True
-        
+        with table.batch_writer(overwrite_by_pkeys=['PK', 'SK']) as batch:
+            for i, essential_data in enumerate(essential_data_list, offset + 1):
+                logger.debug("Creating clean entry %d: %s", i, essential_data['PK'])
+                create_clean_status_entry(batch, essential_data['device_id'], essential_data['pvSystemId'],
+                                          essential_data['PK'], last_updated)
+                unflushed += 1
+                if unflushed == BATCH_WRITE_SIZE:
+                    flushed += unflushed
+                    unflushed = 0
+        flushed += unflushed
     except Exception as e:
-        logger.error(f"❌ Error creating clean STATUS entry for {original_pk}: {str(e)}")
-        return False
+        # The failed request's buffered entries and the rest of the chunk were not written
+        chunk_stats['create_errors'] = len(essential_data_list) - flushed
+        logger.error(f"❌ Error writing clean STATUS entries {offset + flushed + 1}-"
+                     f"{offset + len(essential_data_list)}: {str(e)}")
+    
+    chunk_stats['entries_created'] = flushed
+    return chunk_stats
+
+
+def _merge_chunk_stats(stats: Dict[str, Any], futures: Iterable) -> None:
+    """
+    Add the per-chunk counters returned by finished write futures into stats
+    """
+    for future in futures:
+        for key, value in future.result().items():
+            stats[key] += value
 
 
 def revert_all_status_entries():
@@ -169,10 +217,8 @@ def revert_all_status_entries():
     # Initialize statistics
     stats = {
         'entries_found': 0,
-        'entries_deleted': 0,
         'entries_created': 0,
         'entries_skipped': 0,
-        'delete_errors': 0,
         'create_errors': 0,
         'start_time': start_time
     }
@@ -180,78 +226,33 @@ def revert_all_status_entries():
     try:
         logger.info("=== STARTING INVERTER STATUS REVERT ===")
         
-        # Get all inverter STATUS entries from DynamoDB
-        status_entries = get_all_inverter_status_entries()
-        stats['entries_found'] = len(status_entries)
-        
-        if not status_entries:
-            logger.warning("No inverter STATUS entries found to process")
-            return stats
-        
-        logger.info(f"Processing {len(status_entries)} inverter STATUS entries...")
+        # One timestamp for the whole revert. Stored without an offset to match the
+        # naive-UTC ISO strings the polling Lambdas write to lastUpdated.
+        last_updated = datetime.now(timezone.utc).replace(tzinfo=None).isoformat()
         
-        # First pass: Extract essential data from all entries
-        essential_data_list = []
-        for i, status_entry in enumerate(status_entries, 1):
-            try:
-                pk = status_entry.get('PK', 'unknown')
-                logger.info(f"Extracting data from entry {i}/{len(status_entries)}: {pk}")
-                
-                essential_data = extract_essential_data(status_entry)
-                if essential_data:
-                    essential_data_list.append(essential_data)
-                else:
-                    logger.warning(f"⚠️  Skipping entry {pk} - could not extract essential data")
-                    stats['entries_skipped'] += 1
-                    
-            except Exception as e:
-                stats['entries_skipped'] += 1
-                logger.error(f"❌ Error extracting data from entry {status_entry.get('PK', 'unknown')}: {str(e)}")
+        # Single streaming pass: entries are read, reduced to essential data and handed
+        # to concurrent batch writers in chunks, so reading overlaps writing and at most
+        # a few chunks are in memory. Adaptive retries throttle us to table capacity.
+        essential_data_stream = iter_essential_status_data(stats)
+        max_pending = WRITE_WORKERS * 2
         
-        logger.info(f"Successfully extracted data from {len(essential_data_list)} entries")
-        
-        # Second pass: Delete all existing STATUS entries
-        logger.info("Deleting existing STATUS entries...")
-        for i, essential_data in enumerate(essential_data_list, 1):
-            try:
-                pk = essential_data['PK']
-                sk = essential_data['SK']
-                
-                logger.info(f"Deleting entry {i}/{len(essential_data_list)}: {pk}")
-                
-                if delete_status_entry(pk, sk):
-                    stats['entries_deleted'] += 1
-                else:
-                    stats['delete_errors'] += 1
-                
-                # Small delay between deletions
-                time.sleep(0.05)
+        with ThreadPoolExecutor(max_workers=WRITE_WORKERS) as executor:
+            pending = set()
+            offset = 0
+            
+            for chunk in iter(lambda: list(islice(essential_data_stream, WRITE_CHUNK_SIZE)), []):
+                if len(pending) >= max_pending:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    _merge_chunk_stats(stats, done)
                 
-            except Exception as e:
-                stats['delete_errors'] += 1
-                logger.error(f"❌ Error deleting entry {essential_data.get('PK', 'unknown')}: {str(e)}")
+                pending.add(executor.submit(write_clean_entries, chunk, offset, last_updated))
+                offset += len(chunk)
+            
+            _merge_chunk_stats(stats, as_completed(pending))
         
-        # Third pass: Create new clean STATUS entries
-        logger.info("Creating new clean STATUS entries...")
-        for i, essential_data in enumerate(essential_data_list, 1):
-            try:
-                device_id = essential_data['device_id']
-                pv_system_id = essential_data['pvSystemId']
-                original_pk = essential_data['PK']
-                
-                logger.info(f"Creating clean entry {i}/{len(essential_data_list)}: {original_pk}")
-                
-                if create_clean_status_entry(device_id, pv_system_id, original_pk):
-                    stats['entries_created'] += 1
-                else:
-                    stats['create_errors'] += 1
-                
-                # Small delay between creations
-                time.sleep(0.05)
-                
-            except Exception as e:
-                stats['create_errors'] += 1
-                logger.error(f"❌ Error creating clean entry {essential_data.get('PK', 'unknown')}: {str(e)}")
+        if not stats['entries_found']:
+            logger.warning("No inverter STATUS entries found to process")
+            return stats
         
         end_time = time.time()
         execution_time = end_time - start_time
@@ -259,13 +260,11 @@ def revert_all_status_entries():
         logger.info("=== INVERTER STATUS REVERT COMPLETED ===")
         logger.info(f"⏱️  Total execution time: {execution_time:.2f} seconds")
         logger.info(f"🔍 STATUS entries found: {stats['entries_found']}")
-        logger.info(f"🗑️  STATUS entries deleted: {stats['entries_deleted']}")
         logger.info(f"✅ Clean STATUS entries created: {stats['entries_created']}")
         logger.info(f"⏭️  Entries skipped: {stats['entries_skipped']}")
-        logger.info(f"❌ Delete errors: {stats['delete_errors']}")
         logger.info(f"❌ Create errors: {stats['create_errors']}")
         
-        total_errors = stats['delete_errors'] + stats['create_errors']
+        total_errors = stats['create_errors']
         if total_errors > 0:
             logger.warning(f"⚠️  Completed with {total_errors} total errors")
         else:
@@ -285,7 +284,7 @@ if __name__ == "__main__":
         print(json.dumps(result, indent=2, default=str))
         
         # Exit with error code if there were errors
-        total_errors = result['delete_errors'] + result['create_errors']
+        total_errors = result['create_errors']
         if total_errors > 0:
             exit(1)
         else:
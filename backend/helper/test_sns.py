@@ -11,8 +11,14 @@ Usage:
 import os
 import json
 import boto3
+import botocore.config
 import logging
-from datetime import datetime
+from datetime import datetime, timezone
+try:
+    import orjson
+except ImportError:
+    # Fall back to the standard json module when orjson is not installed
+    orjson = None
 
 # Set up logging
 logging.basicConfig(
@@ -25,8 +31,14 @@ logger = logging.getLogger('test_sns')
 AWS_REGION = os.environ.get('AWS_REGION', 'us-east-1')
 SNS_TOPIC_ARN = os.environ.get('SNS_TOPIC_ARN', 'arn:aws:sns:us-east-1:381492109487:solarSystemAlerts')
 
-# Initialize SNS client
-sns = boto3.client('sns', region_name=AWS_REGION)
+# Initialize SNS client once with adaptive retries and TCP keep-alive so repeated
+# publishes reuse pooled connections and back off only when SNS throttles
+sns_config = botocore.config.Config(
+    max_pool_connections=50,
+    retries={'mode': 'adaptive', 'max_attempts': 5},
+    tcp_keepalive=True
+)
+sns = boto3.client('sns', region_name=AWS_REGION, config=sns_config)
 
 def send_test_device_status_change_sns() -> bool:
     """Send a test SNS message for device status change from green to red"""
@@ -44,7 +56,9 @@ def send_test_device_status_change_sns() -> bool:
             "pvSystemId": pv_system_id,
             "newStatus": new_status,
             "previousStatus": previous_status,
-            "timestamp": datetime.utcnow().isoformat(),
+            # Naive UTC ISO string, same as device_status_polling.py; update_status.py
+            # compares it against naive DST boundaries
+            "timestamp": datetime.now(timezone.utc).replace(tzinfo=None).isoformat(),
             "power": power,
             "newReason": "TEST NOTIFICATION",
             "previousReason": "",
@@ -67,7 +81,7 @@ def send_test_device_status_change_sns() -> bool:
         response = sns.publish(
             TopicArn=SNS_TOPIC_ARN,
             Subject=f"Solar Inverter Status Change - {device_id}",
-            Message=json.dumps(message),
+            Message=orjson.dumps(message).decode() if orjson else json.dumps(message),
             MessageAttributes={
                 'source': {
                     'DataType': 'String',
@@ -1,27 +1,49 @@
 """
 Test System Status Script
 
-This script scans all system status records in DynamoDB and provides a comprehensive
+This script reads all system status records in DynamoDB and provides a comprehensive
 breakdown of system statuses and inverter counts.
 
 Key Features:
-- Scans all systems with PK = System# and SK = STATUS  
+- Reads all systems with PK = System# and SK = STATUS
 - Counts systems by status (green, red, offline)
 - Counts total inverters by status across all systems
 - Provides detailed breakdown per system
 - Returns comprehensive statistics
+- --counts-only: system counts per status via Select='COUNT' (no items transferred,
+  so no inverter breakdown)
+
+Index:
+    Status rows are read with a Query on the SK-PK-index GSI (partition key SK,
+    sort key PK, see docs/architecture.md):
+        KeyConditionExpression: SK = "STATUS" AND begins_with(PK, "System#")
+    so only system status rows are read, in PK order. No extra attributes are
+    needed on the status items. If the index does not exist the script falls back
+    to a parallel filtered Scan (SCAN_SEGMENTS segments, default 4).
 
 Usage:
-    python test_status.py
+    python test_status.py [--counts-only]
 """
 
 import os
+import sys
 import json
 import logging
 import boto3
-from datetime import datetime
-from typing import Dict, List, Any
+from boto3.dynamodb.conditions import Attr, Key
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Iterator, Any, Optional
 import botocore.config
+from collections import Counter
+try:
+    import orjson
+except ImportError:
+    # Fall back to the standard json module when orjson is not installed
+    orjson = None
+
+# The SK-PK index reads are shared with the Lambdas
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lambda'))
+from sk_pk_index import SK_PK_INDEX_NAME, count_sk_pk_items, iter_sk_pk_pages
 
 # Set up logging
 logging.basicConfig(
@@ -33,6 +55,17 @@ logger = logging.getLogger('test_status')
 # AWS Configuration
 AWS_REGION = os.environ.get('AWS_REGION', 'us-east-1')
 DYNAMODB_TABLE_NAME = os.environ.get('DYNAMODB_TABLE_NAME', 'Moose-DDB')
+# Number of segments scanned concurrently when the SK-PK index is unavailable
+SCAN_SEGMENTS = int(os.environ.get('SCAN_SEGMENTS', '4'))
+# Only the attributes the analysis reads; 'status' is a reserved word
+STATUS_PROJECTION = 'pvSystemId, #s, GreenInverters, RedInverters, OfflineInverters, lastUpdated'
+
+# Emoji shown next to each status in logs and the report
+STATUS_EMOJI = {"green": "✅", "red": "🔴", "offline": "🔌", "unknown": "❓"}
+
+# System status conditions, built once: key condition for the index, filter for the scan fallback
+SYSTEM_STATUS_KEY = Key('SK').eq('STATUS') & Key('PK').begins_with('System#')
+SYSTEM_STATUS_FILTER = Attr('PK').begins_with('System#') & Attr('SK').eq('STATUS')
 
 # Configure DynamoDB
 dynamodb_config = botocore.config.Config(
@@ -41,105 +74,123 @@ dynamodb_config = botocore.config.Config(
 dynamodb = boto3.resource('dynamodb', region_name=AWS_REGION, config=dynamodb_config)
 table = dynamodb.Table(DYNAMODB_TABLE_NAME)
 
-def get_all_system_statuses() -> List[Dict[str, Any]]:
-    """Get all system status records from DynamoDB"""
-    try:
-        logger.info("Scanning DynamoDB for all system status records...")
-        
-        # Scan for all system status records
-        response = table.scan(
-            FilterExpression=boto3.dynamodb.conditions.Attr('PK').begins_with('System#') & 
-                           boto3.dynamodb.conditions.Attr('SK').eq('STATUS')
-        )
-        
-        systems = response.get('Items', [])
-        logger.info(f"Found {len(systems)} system status records")
-        
-        return systems
-        
-    except Exception as e:
-        logger.error(f"Error scanning system status records: {str(e)}")
-        return []
-
-def analyze_system_statuses(systems: List[Dict[str, Any]]) -> Dict[str, Any]:
-    """Analyze and count system statuses"""
-    
-    # Initialize counters
-    system_counts = {
-        'green': 0,
-        'red': 0, 
-        'offline': 0,
-        'unknown': 0
-    }
+def iter_system_statuses() -> Iterator[Dict[str, Any]]:
+    """
+    Yield all system status records from DynamoDB as they are read,
+    so analysis runs while later pages are still being fetched
+    """
+    logger.info(f"Querying {SK_PK_INDEX_NAME} for all system status records...")
+    
+    # Only STATUS rows are read, instead of scanning and filtering the whole table
+    found = 0
+    for systems in iter_sk_pk_pages(
+        table, SYSTEM_STATUS_KEY, SYSTEM_STATUS_FILTER,
+        total_segments=SCAN_SEGMENTS,
+        ProjectionExpression=STATUS_PROJECTION,
+        ExpressionAttributeNames={'#s': 'status'}
+    ):
+        found += len(systems)
+        yield from systems
+    
+    logger.info(f"Found {found} system status records")
+
+def _utc_now_iso() -> str:
+    """Current UTC time as a naive ISO string, the format stored elsewhere in the table"""
+    return datetime.now(timezone.utc).replace(tzinfo=None).isoformat()
+
+def count_system_statuses(scan_timestamp: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Count system status records per status without transferring any items.
+    Inverter counts need the item bodies, so they are not included.
+    """
+    logger.info("Counting system status records...")
+    
+    total_systems = count_sk_pk_items(table, SYSTEM_STATUS_KEY, SYSTEM_STATUS_FILTER, total_segments=SCAN_SEGMENTS)
+    
+    def count_status(status: str) -> int:
+        status_filter = Attr('status').eq(status)
+        return count_sk_pk_items(table, SYSTEM_STATUS_KEY, SYSTEM_STATUS_FILTER & status_filter,
+                                 total_segments=SCAN_SEGMENTS, FilterExpression=status_filter)
     
-    inverter_counts = {
-        'green': 0,
-        'red': 0,
-        'offline': 0
+    system_counts = {status: count_status(status) for status in ('green', 'red', 'offline')}
+    system_counts['unknown'] = total_systems - sum(system_counts.values())
+    
+    return {
+        'total_systems': total_systems,
+        'systems_by_status': system_counts,
+        'scan_timestamp': scan_timestamp or _utc_now_iso()
     }
+
+def analyze_system_statuses(systems: Iterable[Dict[str, Any]], include_details: bool = True,
+                            scan_timestamp: Optional[str] = None) -> Dict[str, Any]:
+    """Analyze and count system statuses in a single pass over systems"""
+    
+    # Initialize counters; inverter totals are plain local ints, which is the cheapest
+    # thing to bump per system in CPython
+    status_counter = Counter()
+    green_total = red_total = offline_total = 0
     
-    system_details = []
-    total_systems = len(systems)
-    total_inverters = 0
+    system_details = [] if include_details else None
+    log_systems = logger.isEnabledFor(logging.DEBUG)
     
     logger.info("Analyzing system statuses...")
     
     for system in systems:
         # Extract system information
-        system_id = system.get('pvSystemId', 'Unknown')
-        system_status = system.get('status', 'unknown')
-        green_inverters = system.get('GreenInverters', []) or []
-        red_inverters = system.get('RedInverters', []) or []
-        offline_inverters = system.get('OfflineInverters', []) or []
-        last_updated = system.get('lastUpdated', 'Never')
+        system_get = system.get
+        system_status = system_get('status', 'unknown')
+        green_count = len(system_get('GreenInverters') or ())
+        red_count = len(system_get('RedInverters') or ())
+        offline_count = len(system_get('OfflineInverters') or ())
         
-        # Count inverters
-        green_count = len(green_inverters)
-        red_count = len(red_inverters)
-        offline_count = len(offline_inverters)
-        system_total = green_count + red_count + offline_count
+        # Update status and inverter counts
+        status_counter[system_status] += 1
+        green_total += green_count
+        red_total += red_count
+        offline_total += offline_count
         
-        # Update system status counts
-        if system_status in system_counts:
-            system_counts[system_status] += 1
-        else:
-            system_counts['unknown'] += 1
-        
-        # Update inverter counts
-        inverter_counts['green'] += green_count
-        inverter_counts['red'] += red_count
-        inverter_counts['offline'] += offline_count
-        total_inverters += system_total
+        if include_details or log_systems:
+            system_id = system_get('pvSystemId', 'Unknown')
         
         # Store system details
-        system_detail = {
-            'systemId': system_id,
-            'status': system_status,
-            'inverters': {
-                'green': green_count,
-                'red': red_count,
-                'offline': offline_count,
-                'total': system_total
-            },
-            'lastUpdated': last_updated
-        }
-        system_details.append(system_detail)
+        if include_details:
+            system_details.append({
+                'systemId': system_id,
+                'status': system_status,
+                'inverters': {
+                    'green': green_count,
+                    'red': red_count,
+                    'offline': offline_count,
+                    'total': green_count + red_count + offline_count
+                },
+                'lastUpdated': system_get('lastUpdated', 'Never')
+            })
         
         # Log system info
-        status_emoji = {"green": "✅", "red": "🔴", "offline": "🔌", "unknown": "❓"}.get(system_status, "❓")
-        logger.info(f"{status_emoji} System {system_id}: {system_status.upper()} "
-                   f"(G:{green_count}, R:{red_count}, O:{offline_count})")
+        if log_systems:
+            status_emoji = STATUS_EMOJI.get(system_status, "❓")
+            logger.debug("%s System %s: %s (G:%d, R:%d, O:%d)", status_emoji, system_id,
+                         system_status.upper(), green_count, red_count, offline_count)
     
-    return {
+    # Normalize to the fixed status keys; anything unexpected is counted as unknown
+    total_systems = sum(status_counter.values())
+    system_counts = {status: status_counter.pop(status, 0) for status in ('green', 'red', 'offline')}
+    system_counts['unknown'] = sum(status_counter.values())
+    inverter_counts = {'green': green_total, 'red': red_total, 'offline': offline_total}
+    
+    analysis = {
         'summary': {
             'total_systems': total_systems,
-            'total_inverters': total_inverters,
+            'total_inverters': sum(inverter_counts.values()),
             'systems_by_status': system_counts,
             'inverters_by_status': inverter_counts,
-            'scan_timestamp': datetime.utcnow().isoformat()
-        },
-        'system_details': system_details
+            'scan_timestamp': scan_timestamp or _utc_now_iso()
+        }
     }
+    if include_details:
+        analysis['system_details'] = system_details
+    
+    return analysis
 
 def print_summary_report(analysis: Dict[str, Any]) -> None:
     """Print a formatted summary report"""
@@ -152,7 +203,8 @@ def print_summary_report(analysis: Dict[str, Any]) -> None:
     # Overall statistics
     print(f"\n📊 OVERALL STATISTICS:")
     print(f"   Total Systems: {summary['total_systems']}")
-    print(f"   Total Inverters: {summary['total_inverters']}")
+    if 'total_inverters' in summary:
+        print(f"   Total Inverters: {summary['total_inverters']}")
     print(f"   Scan Time: {summary['scan_timestamp']}")
     
     # System status breakdown
@@ -160,22 +212,25 @@ def print_summary_report(analysis: Dict[str, Any]) -> None:
     system_counts = summary['systems_by_status']
     for status, count in system_counts.items():
         if count > 0:
-            emoji = {"green": "✅", "red": "🔴", "offline": "🔌", "unknown": "❓"}.get(status, "❓")
+            emoji = STATUS_EMOJI.get(status, "❓")
             percentage = (count / summary['total_systems'] * 100) if summary['total_systems'] > 0 else 0
             print(f"   {emoji} {status.capitalize()}: {count} systems ({percentage:.1f}%)")
     
-    # Inverter status breakdown
-    print(f"\n⚡ INVERTERS BY STATUS:")
-    inverter_counts = summary['inverters_by_status']
-    for status, count in inverter_counts.items():
-        if count > 0:
-            emoji = {"green": "✅", "red": "🔴", "offline": "🔌"}.get(status, "❓")
-            percentage = (count / summary['total_inverters'] * 100) if summary['total_inverters'] > 0 else 0
-            print(f"   {emoji} {status.capitalize()}: {count} inverters ({percentage:.1f}%)")
+    # Inverter status breakdown (not available in counts-only mode)
+    if 'inverters_by_status' in summary:
+        print(f"\n⚡ INVERTERS BY STATUS:")
+        inverter_counts = summary['inverters_by_status']
+        for status, count in inverter_counts.items():
+            if count > 0:
+                emoji = STATUS_EMOJI.get(status, "❓")
+                percentage = (count / summary['total_inverters'] * 100) if summary['total_inverters'] > 0 else 0
+                print(f"   {emoji} {status.capitalize()}: {count} inverters ({percentage:.1f}%)")
     
     # System health summary
     print(f"\n🏥 SYSTEM HEALTH SUMMARY:")
-    if system_counts['green'] == summary['total_systems']:
+    if not summary['total_systems']:
+        print("   ❓ No systems found")
+    elif system_counts['green'] == summary['total_systems']:
         print("   🎉 All systems are GREEN - Perfect health!")
     elif system_counts['red'] > 0:
         print(f"   ⚠️  {system_counts['red']} systems need attention (RED status)")
@@ -184,15 +239,24 @@ def print_summary_report(analysis: Dict[str, Any]) -> None:
     
     print("\n" + "="*60)
 
-def main():
+def main(counts_only: bool = False):
     """Main function to test system statuses"""
     try:
         logger.info("=== STARTING SYSTEM STATUS TEST ===")
         
-        # Get all system status records
-        systems = get_all_system_statuses()
+        # One timestamp for the whole run, used in the report and its file name
+        scan_time = datetime.now(timezone.utc).replace(tzinfo=None)
         
-        if not systems:
+        if counts_only:
+            analysis = {'summary': count_system_statuses(scan_time.isoformat())}
+            print_summary_report(analysis)
+            logger.info("=== SYSTEM STATUS TEST COMPLETED ===")
+            return analysis
+        
+        # Analyze system status records as they are read
+        analysis = analyze_system_statuses(iter_system_statuses(), scan_timestamp=scan_time.isoformat())
+        
+        if not analysis['summary']['total_systems']:
             logger.warning("No system status records found!")
             return {
                 'error': 'No system status records found',
@@ -204,16 +268,17 @@ def main():
                 }
             }
         
-        # Analyze the systems
-        analysis = analyze_system_statuses(systems)
-        
         # Print formatted report
         print_summary_report(analysis)
         
         # Save detailed results to file
-        output_file = f"system_status_report_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.json"
-        with open(output_file, 'w') as f:
-            json.dump(analysis, f, indent=2, default=str)
+        output_file = f"system_status_report_{scan_time.strftime('%Y%m%d_%H%M%S')}.json"
+        if orjson:
+            with open(output_file, 'wb') as f:
+                f.write(orjson.dumps(analysis, option=orjson.OPT_INDENT_2, default=str))
+        else:
+            with open(output_file, 'w') as f:
+                json.dump(analysis, f, indent=2, default=str)
         
         logger.info(f"✅ Detailed report saved to: {output_file}")
         logger.info("=== SYSTEM STATUS TEST COMPLETED ===")
@@ -225,7 +290,7 @@ def main():
         return {'error': str(e)}
 
 if __name__ == "__main__":
-    result = main()
+    result = main(counts_only="--counts-only" in sys.argv[1:])
     
     # Print final summary for easy reading
     if 'summary' in result:
@@ -234,6 +299,7 @@ if __name__ == "__main__":
         print(f"   Systems: {summary['systems_by_status']['green']} Green, "
               f"{summary['systems_by_status']['red']} Red, "
               f"{summary['systems_by_status']['offline']} Offline")
-        print(f"   Inverters: {summary['inverters_by_status']['green']} Green, "
-              f"{summary['inverters_by_status']['red']} Red, "
-              f"{summary['inverters_by_status']['offline']} Offline") 
\ No newline at end of file
+        if 'inverters_by_status' in summary:
+            print(f"   Inverters: {summary['inverters_by_status']['green']} Green, "
+                  f"{summary['inverters_by_status']['red']} Red, "
+                  f"{summary['inverters_by_status']['offline']} Offline") 
\ No newline at end of file
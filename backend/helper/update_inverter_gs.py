@@ -5,13 +5,21 @@ This script scans DynamoDB for inverter profile entries and adds GSI2PK and GSI2
 """
 
 import os
+import sys
 import boto3
+import botocore.config
+from boto3.dynamodb.conditions import Attr, Key
 import json
-from typing import Dict, Any, List
+from typing import Dict, Any, Iterator, List, Optional, Tuple
 import logging
 from botocore.exceptions import ClientError
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
 import time
 
+# The SK-PK index reads are shared with the Lambdas
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lambda'))
+from sk_pk_index import SK_PK_INDEX_NAME, iter_sk_pk_pages
+
 # Set up logging
 logging.basicConfig(
     level=logging.INFO,
@@ -22,111 +30,148 @@ logger = logging.getLogger(__name__)
 # AWS Configuration
 AWS_REGION = os.environ.get('AWS_REGION_', 'us-east-1')
 DYNAMODB_TABLE_NAME = os.environ.get('DYNAMODB_TABLE_NAME', 'Moose-DDB')
+# Number of segments scanned concurrently when the SK-PK index is unavailable; also sizes the connection pool
+SCAN_SEGMENTS = int(os.environ.get('SCAN_SEGMENTS', '8'))
+# Concurrent BatchExecuteStatement calls; each call carries up to 25 statements (the DynamoDB limit)
+WRITE_WORKERS = int(os.environ.get('WRITE_WORKERS', '8'))
+BATCH_WRITE_SIZE = 25
+MAX_BATCH_RETRIES = 5
+# Per-statement BatchExecuteStatement errors that are worth retrying
+RETRYABLE_STATEMENT_ERRORS = {
+    'ThrottlingError', 'ProvisionedThroughputExceeded', 'RequestLimitExceeded',
+    'TransactionConflict', 'InternalServerError'
+}
+# Only the attributes needed to derive and check the GSI2 fields
+PROFILE_PROJECTION = 'PK, SK, pvSystemId, deviceId, GSI2PK, GSI2SK'
+
+# Inverter profile conditions, built once: key condition for the index, filters for the scan fallback
+INVERTER_PROFILE_KEY = Key('SK').eq('PROFILE') & Key('PK').begins_with('Inverter#')
+INVERTER_PROFILE_FILTER = Attr('PK').begins_with('Inverter#') & Attr('SK').eq('PROFILE')
+MISSING_GSI2_FILTER = Attr('GSI2PK').not_exists()
+
+# Configure DynamoDB once at module scope so every caller shares one connection pool.
+# Adaptive retries back off only when DynamoDB actually throttles.
+dynamodb_config = botocore.config.Config(
+    max_pool_connections=max(50, SCAN_SEGMENTS, WRITE_WORKERS),
+    retries={'mode': 'adaptive', 'max_attempts': 10}
+)
+dynamodb = boto3.resource('dynamodb', region_name=AWS_REGION, config=dynamodb_config)
+table = dynamodb.Table(DYNAMODB_TABLE_NAME)
 
 def get_dynamodb_client():
-    """Initialize DynamoDB client and table"""
-    try:
-        dynamodb = boto3.resource('dynamodb', region_name=AWS_REGION)
-        table = dynamodb.Table(DYNAMODB_TABLE_NAME)
-        logger.info(f"Connected to DynamoDB table: {DYNAMODB_TABLE_NAME}")
-        return table
-    except Exception as e:
-        logger.error(f"Failed to connect to DynamoDB: {str(e)}")
-        return None
+    """Return the shared DynamoDB table"""
+    logger.info(f"Using DynamoDB table: {DYNAMODB_TABLE_NAME}")
+    return table
 
-def scan_inverter_profiles(table) -> List[Dict[str, Any]]:
+def iter_inverter_profiles(table, total_segments: int = SCAN_SEGMENTS,
+                           projection: Optional[str] = None,
+                           missing_gsi2_only: bool = False) -> Iterator[Dict[str, Any]]:
     """
-    Scan DynamoDB table for inverter profile entries
-    Returns list of items where PK begins with 'Inverter#' and SK = 'PROFILE'
+    Yield inverter profile entries (PK begins with 'Inverter#' and SK = 'PROFILE')
+    as they are read, so callers can start work before the read finishes.
+    Uses the SK-PK index when it exists; otherwise segments are scanned in parallel,
+    each on its own thread. If projection is given only those attributes are returned.
+    If missing_gsi2_only is set, rows that already have GSI2PK are filtered out server-side.
+    Read errors are raised, so a partial read is never taken for the full set.
     """
-    logger.info("Starting scan for inverter profile entries...")
-    
-    items = []
-    scan_kwargs = {
-        'FilterExpression': boto3.dynamodb.conditions.Key('PK').begins_with('Inverter#') & 
-                           boto3.dynamodb.conditions.Attr('SK').eq('PROFILE')
-    }
-    
-    try:
-        # Handle pagination
-        while True:
-            response = table.scan(**scan_kwargs)
-            items.extend(response['Items'])
-            
-            # Check if there are more items to scan
-            if 'LastEvaluatedKey' not in response:
-                break
-            
-            scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
-            logger.info(f"Scanned {len(items)} items so far...")
-            
-        logger.info(f"Total inverter profile entries found: {len(items)}")
-        return items
-        
-    except ClientError as e:
-        logger.error(f"Error scanning table: {e.response['Error']['Message']}")
-        return []
-    except Exception as e:
-        logger.error(f"Unexpected error during scan: {str(e)}")
-        return []
+    read_kwargs = {'ProjectionExpression': projection} if projection else {}
+    scan_filter = INVERTER_PROFILE_FILTER
+    if missing_gsi2_only:
+        read_kwargs['FilterExpression'] = MISSING_GSI2_FILTER
+        scan_filter = INVERTER_PROFILE_FILTER & MISSING_GSI2_FILTER
+    
+    logger.info(f"Querying {SK_PK_INDEX_NAME} for inverter profile entries...")
+    
+    found = 0
+    for items in iter_sk_pk_pages(table, INVERTER_PROFILE_KEY, scan_filter,
+                                  total_segments=total_segments, **read_kwargs):
+        found += len(items)
+        yield from items
+    
+    logger.info(f"Total inverter profile entries found: {found}")
 
-def update_inverter_gsi_fields(table, item: Dict[str, Any]) -> bool:
+def build_gsi_item(item: Dict[str, Any]) -> Optional[Dict[str, Any]]:
     """
-    Update a single inverter item with GSI2PK and GSI2SK fields
+    Return the key and GSI2PK/GSI2SK fields to set on an inverter item,
+    or None if the item is missing the fields needed to build them
     """
-    try:
-        # Extract required fields
-        pk = item.get('PK')
-        sk = item.get('SK')
-        pv_system_id = item.get('pvSystemId')
-        device_id = item.get('deviceId')
-        
-        # Validate required fields
-        if not pk or not sk or not pv_system_id or not device_id:
-            logger.warning(f"Missing required fields in item: PK={pk}, SK={sk}, pvSystemId={pv_system_id}, deviceId={device_id}")
-            return False
-        
-        # Create GSI2 fields
-        gsi2_pk = f"System#{pv_system_id}"
-        gsi2_sk = f"Inverter#{device_id}"
-        
-        # Check if GSI2 fields already exist
-        if item.get('GSI2PK') == gsi2_pk and item.get('GSI2SK') == gsi2_sk:
-            logger.info(f"Item {pk} already has correct GSI2 fields, skipping...")
-            return True
-        
-        # Update the item
-        update_expression = "SET GSI2PK = :gsi2pk, GSI2SK = :gsi2sk"
-        expression_attribute_values = {
-            ':gsi2pk': gsi2_pk,
-            ':gsi2sk': gsi2_sk
+    # Extract required fields
+    pk = item.get('PK')
+    sk = item.get('SK')
+    pv_system_id = item.get('pvSystemId')
+    device_id = item.get('deviceId')
+    
+    # Validate required fields; a plain check, no exception path per item
+    if not all((pk, sk, pv_system_id, device_id)):
+        logger.warning("Missing required fields in item: PK=%s, SK=%s, pvSystemId=%s, deviceId=%s",
+                       pk, sk, pv_system_id, device_id)
+        return None
+    
+    # Create GSI2 fields
+    return {'PK': pk, 'SK': sk, 'GSI2PK': f"System#{pv_system_id}", 'GSI2SK': f"Inverter#{device_id}"}
+
+def write_gsi_batch(table, items: List[Dict[str, Any]]) -> int:
+    """
+    Set GSI2PK and GSI2SK on up to 25 items with a single PartiQL BatchExecuteStatement call,
+    retrying throttled statements with exponential backoff. Only the two GSI2 attributes are
+    written, and UPDATE fails rather than creating an item if the key no longer exists.
+    Returns the number of items that could not be updated.
+    """
+    # PK/SK only identify the item; the GSI2PK guard is the real condition, so a row that
+    # picked up a different GSI2PK since it was read is reported instead of overwritten
+    statement = (f'UPDATE "{table.name}" SET GSI2PK=? SET GSI2SK=? '
+                 f'WHERE PK=? AND SK=? AND (GSI2PK IS MISSING OR GSI2PK=?)')
+    statements = [
+        {
+            'Statement': statement,
+            'Parameters': [item['GSI2PK'], item['GSI2SK'], item['PK'], item['SK'], item['GSI2PK']]
         }
+        for item in items
+    ]
+    failed = 0
+    
+    for attempt in range(MAX_BATCH_RETRIES):
+        response = table.meta.client.batch_execute_statement(Statements=statements)
         
-        # Use conditional update to ensure we're updating the right item
-        condition_expression = "PK = :pk AND SK = :sk"
-        expression_attribute_values[':pk'] = pk
-        expression_attribute_values[':sk'] = sk
-        
-        table.update_item(
-            Key={'PK': pk, 'SK': sk},
-            UpdateExpression=update_expression,
-            ExpressionAttributeValues=expression_attribute_values,
-            ConditionExpression=condition_expression
-        )
-        
-        logger.info(f"Successfully updated item: {pk} -> GSI2PK={gsi2_pk}, GSI2SK={gsi2_sk}")
-        return True
+        # Responses are returned in statement order
+        retry_statements = []
+        for request, result in zip(statements, response['Responses']):
+            error = result.get('Error')
+            if not error:
+                continue
+            if error.get('Code') in RETRYABLE_STATEMENT_ERRORS:
+                retry_statements.append(request)
+            else:
+                logger.error(f"Error updating item {request['Parameters'][2]}: {error.get('Code')} {error.get('Message', '')}")
+                failed += 1
         
-    except ClientError as e:
-        error_code = e.response['Error']['Code']
-        if error_code == 'ConditionalCheckFailedException':
-            logger.warning(f"Item {pk} was modified during update, skipping...")
-        else:
-            logger.error(f"Error updating item {pk}: {e.response['Error']['Message']}")
-        return False
-    except Exception as e:
-        logger.error(f"Unexpected error updating item {pk}: {str(e)}")
-        return False
+        if not retry_statements:
+            return failed
+        statements = retry_statements
+        time.sleep(min(0.05 * 2 ** attempt, 2))
+    
+    logger.error(f"{len(statements)} items still failing after {MAX_BATCH_RETRIES} attempts")
+    return failed + len(statements)
+
+def _collect_batch_results(done, pending: Dict[Any, List[Dict[str, Any]]]) -> Tuple[int, int]:
+    """
+    Remove finished batch futures from pending and return (written, failed) item counts
+    """
+    written = 0
+    failed = 0
+    for future in done:
+        batch = pending.pop(future)
+        try:
+            unprocessed = future.result()
+        except ClientError as e:
+            logger.error(f"Error writing batch starting at {batch[0]['PK']}: {e.response['Error']['Message']}")
+            unprocessed = len(batch)
+        except Exception as e:
+            logger.error(f"Failed to write batch starting at {batch[0]['PK']}: {str(e)}")
+            unprocessed = len(batch)
+        written += len(batch) - unprocessed
+        failed += unprocessed
+    return written, failed
 
 def main():
     """Main function to orchestrate the update process"""
@@ -138,40 +183,56 @@ def main():
         logger.error("Failed to initialize DynamoDB connection. Exiting.")
         return
     
-    # Scan for inverter profile entries
-    inverter_items = scan_inverter_profiles(table)
-    if not inverter_items:
-        logger.warning("No inverter profile entries found. Exiting.")
-        return
-    
-    # Process each item
+    total_count = 0
     success_count = 0
     failure_count = 0
-    skip_count = 0
     
-    logger.info(f"Processing {len(inverter_items)} inverter profile entries...")
+    logger.info("Processing inverter profile entries as they are read...")
     
-    for i, item in enumerate(inverter_items, 1):
-        logger.info(f"Processing item {i}/{len(inverter_items)}: {item.get('PK')}")
-        
-        # Add a small delay to avoid throttling
-        if i % 10 == 0:
-            time.sleep(0.1)
+    with ThreadPoolExecutor(max_workers=WRITE_WORKERS) as executor:
+        pending = {}
+        batch = []
         
-        try:
-            if update_inverter_gsi_fields(table, item):
-                success_count += 1
-            else:
+        # Stream entries that have not been backfilled yet straight into 25-item batches;
+        # rows that already have GSI2PK are filtered out server-side and never reach here
+        for item in iter_inverter_profiles(table, projection=PROFILE_PROJECTION, missing_gsi2_only=True):
+            total_count += 1
+            
+            updated_item = build_gsi_item(item)
+            if updated_item is None:
                 failure_count += 1
-        except Exception as e:
-            logger.error(f"Failed to process item {item.get('PK')}: {str(e)}")
-            failure_count += 1
+                continue
+            
+            batch.append(updated_item)
+            if len(batch) < BATCH_WRITE_SIZE:
+                continue
+            
+            pending[executor.submit(write_gsi_batch, table, batch)] = batch
+            batch = []
+            
+            # Keep a bounded number of batches in flight so memory stays flat
+            if len(pending) >= WRITE_WORKERS * 2:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                written, failed = _collect_batch_results(done, pending)
+                success_count += written
+                failure_count += failed
+        
+        if batch:
+            pending[executor.submit(write_gsi_batch, table, batch)] = batch
+        
+        written, failed = _collect_batch_results(list(as_completed(pending)), pending)
+        success_count += written
+        failure_count += failed
+    
+    if not total_count:
+        logger.warning("No inverter profile entries without GSI2 fields found. Exiting.")
+        return
     
     # Summary
     logger.info("=" * 50)
     logger.info("UPDATE SUMMARY")
     logger.info("=" * 50)
-    logger.info(f"Total items processed: {len(inverter_items)}")
+    logger.info(f"Total items processed: {total_count}")
     logger.info(f"Successfully updated: {success_count}")
     logger.info(f"Failed to update: {failure_count}")
     logger.info(f"Update process completed!")
@@ -185,15 +246,11 @@ def preview_changes():
         logger.error("Failed to initialize DynamoDB connection. Exiting.")
         return
     
-    inverter_items = scan_inverter_profiles(table)
-    if not inverter_items:
-        logger.warning("No inverter profile entries found.")
-        return
-    
-    logger.info(f"Found {len(inverter_items)} inverter profile entries:")
+    logger.info("Inverter profile entries:")
     logger.info("=" * 80)
     
-    for i, item in enumerate(inverter_items, 1):
+    i = 0
+    for i, item in enumerate(iter_inverter_profiles(table, projection=PROFILE_PROJECTION), 1):
         pk = item.get('PK', 'N/A')
         pv_system_id = item.get('pvSystemId', 'N/A')
         device_id = item.get('deviceId', 'N/A')
@@ -219,6 +276,9 @@ def preview_changes():
             logger.info("   Status: NEEDS UPDATE")
         
         logger.info("-" * 80)
+    
+    if not i:
+        logger.warning("No inverter profile entries found.")
 
 if __name__ == "__main__":
     import sys
@@ -15,17 +15,27 @@ Usage:
 - Deploy as AWS Lambda function
 - Configure to run monthly (e.g., via CloudWatch Events/EventBridge)
 - Set environment variables for DynamoDB table and SNS configuration
+- Optionally set REPORT_WORKER_FUNCTION to fan out one asynchronous invocation
+  per user (the worker is this same function, invoked with a single user's event);
+  use reserved concurrency on the worker to cap DynamoDB/SNS load
+- Optionally set SMS_QUEUE_URL to queue reports on SQS instead of publishing them
+  directly; sms_sender_handler is the SQS-triggered sender (configure a DLQ on the queue)
 """
 
 import os
 import json
 import boto3
 import logging
-from datetime import datetime, timedelta
-from decimal import Decimal
-from typing import List, Dict, Any, Optional
-from boto3.dynamodb.conditions import Key
-import uuid
+import random
+import re
+import time
+from datetime import datetime, timezone
+from typing import List, Dict, Any, Optional, Tuple
+from botocore.exceptions import ClientError
+import botocore.config
+from sk_pk_index import read_sk_pk_items
+from concurrent.futures import ThreadPoolExecutor
+from itertools import repeat
 
 # Set up logging
 logging.basicConfig(
@@ -37,11 +47,94 @@ logger = logging.getLogger('automatic_report')
 # AWS Configuration
 AWS_REGION = os.environ.get('AWS_REGION_', 'us-east-1')
 DYNAMODB_TABLE_NAME = os.environ.get('DYNAMODB_TABLE_NAME', 'Moose-DDB')
+# Number of segments scanned concurrently when the SK-PK index is unavailable
+SCAN_SEGMENTS = int(os.environ.get('SCAN_SEGMENTS', '8'))
 
-# Initialize AWS clients
-dynamodb = boto3.resource('dynamodb', region_name=AWS_REGION)
+# Only the profile attributes the report uses ('name' and 'role' are reserved words)
+USER_PROFILE_PROJECTION = 'userId, #n, phoneNumber, email'
+# Keep only role='user' profiles with a non-empty phone number, server side
+USER_PROFILE_FILTER = '#r = :role AND attribute_exists(phoneNumber) AND phoneNumber <> :empty'
+USER_PROFILE_ATTRIBUTE_NAMES = {'#n': 'name', '#r': 'role'}
+# A single profile read by the worker also checks the role, which the scan filters server side
+USER_PROFILE_CHECK_PROJECTION = f'{USER_PROFILE_PROJECTION}, #r'
+USER_PROFILE_VALUES = {':pk_prefix': 'User#', ':sk_value': 'PROFILE', ':role': 'user', ':empty': ''}
+
+# BatchGetItem accepts at most 100 keys per request
+BATCH_GET_SIZE = 100
+MAX_BATCH_GET_RETRIES = 5
+MONTHLY_DATA_PROJECTION = 'PK, systemName, energyProductionWh, earnings, co2Savings'
+# Per-user copies of the monthly items, written by polling.py under PK=User#<id>
+USER_MONTHLY_PROJECTION = 'systemId, systemName, energyProductionWh, earnings, co2Savings'
+# Per-user totals and breakdown rolled up by polling.py under PK=User#<id>, SK=MONTHLY#<month>
+USER_AGGREGATE_PROJECTION = 'PK, totalEnergyWh, totalEarnings, totalCO2, perSystem'
+
+# System monthly data kept across warm invocations (worker fan-out, retries, backfills),
+# keyed on (system_id, month) -> (expires_at, data); cleared when it reaches the size cap
+MONTHLY_CACHE_TTL_SECONDS = int(os.environ.get('MONTHLY_CACHE_TTL_SECONDS', '900'))
+MONTHLY_CACHE_MAX_SIZE = 4096
+_monthly_data_cache = {}
+
+# Everything but digits, stripped from phone numbers before publishing
+_NON_DIGIT = re.compile(r'\D')
+
+# Number of users whose monthly copies / system links are read concurrently
+USER_READ_WORKERS = int(os.environ.get('USER_READ_WORKERS', '8'))
+
+# Number of SMS reports published concurrently
+SMS_WORKERS = int(os.environ.get('SMS_WORKERS', '16'))
+# Publishes still throttled after botocore's own retries are retried with jittered backoff
+MAX_PUBLISH_ATTEMPTS = 3
+PUBLISH_BACKOFF_SECONDS = 0.2
+SNS_THROTTLING_ERRORS = {'Throttling', 'ThrottlingException', 'ThrottledException'}
+
+# Lambda that sends one user's report; reports are sent in-process when unset
+REPORT_WORKER_FUNCTION = os.environ.get('REPORT_WORKER_FUNCTION', '')
+
+# SQS queue drained by sms_sender_handler; reports are published directly when unset
+SMS_QUEUE_URL = os.environ.get('SMS_QUEUE_URL', '')
+# SendMessageBatch accepts at most 10 messages per request
+REPORT_BATCH_SIZE = 10 if SMS_QUEUE_URL else 1
+
+# Initialize AWS clients; adaptive retries, TCP keep-alive and a pool large enough
+# for the concurrent scan segments and SMS publishes
+aws_config = botocore.config.Config(
+    region_name=AWS_REGION,
+    max_pool_connections=50,
+    retries={'mode': 'adaptive', 'max_attempts': 5},
+    tcp_keepalive=True
+)
+dynamodb = boto3.resource('dynamodb', config=aws_config)
 table = dynamodb.Table(DYNAMODB_TABLE_NAME)
-sns = boto3.client('sns', region_name=AWS_REGION)
+# Low-level client for the monthly data reads: numbers come back as raw {'N': '...'}
+# strings and are parsed straight to float instead of going through Decimal
+dynamodb_client = boto3.client('dynamodb', config=aws_config)
+# SNS throttles concurrent publishes, so it gets more adaptive retry attempts
+sns = boto3.client('sns', config=aws_config.merge(botocore.config.Config(
+    retries={'mode': 'adaptive', 'max_attempts': 8}
+)))
+lambda_client = boto3.client('lambda', config=aws_config) if REPORT_WORKER_FUNCTION else None
+sqs = boto3.client('sqs', config=aws_config) if SMS_QUEUE_URL else None
+
+def _read_all_pages(client, operation: str, **kwargs) -> List[Dict[str, Any]]:
+    """
+    Run a query or scan through the client's paginator, which follows LastEvaluatedKey
+    """
+    items = []
+    paginator = client.get_paginator(operation)
+    for page in paginator.paginate(TableName=DYNAMODB_TABLE_NAME, **kwargs):
+        items.extend(page.get('Items', []))
+    return items
+
+def _report_user(item: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    The profile fields a report is sent with
+    """
+    return {
+        'userId': item.get('userId'),
+        'name': item.get('name', 'User'),
+        'phoneNumber': item['phoneNumber'],
+        'email': item.get('email', '')
+    }
 
 def get_users_with_phones() -> List[Dict[str, Any]]:
     """
@@ -50,43 +143,19 @@ def get_users_with_phones() -> List[Dict[str, Any]]:
     try:
         logger.info("Querying DynamoDB for user users with phone numbers...")
         
-        # Scan for all user profiles
-        response = table.scan(
-            FilterExpression='begins_with(PK, :pk_prefix) AND SK = :sk_value',
-            ExpressionAttributeValues={
-                ':pk_prefix': 'User#',
-                ':sk_value': 'PROFILE'
-            }
+        # Query only the User# PROFILE rows through the SK-PK index
+        items = read_sk_pk_items(
+            table,
+            'SK = :sk_value AND begins_with(PK, :pk_prefix)',
+            f'begins_with(PK, :pk_prefix) AND SK = :sk_value AND {USER_PROFILE_FILTER}',
+            total_segments=SCAN_SEGMENTS,
+            FilterExpression=USER_PROFILE_FILTER,
+            ProjectionExpression=USER_PROFILE_PROJECTION,
+            ExpressionAttributeNames=USER_PROFILE_ATTRIBUTE_NAMES,
+            ExpressionAttributeValues=USER_PROFILE_VALUES
         )
         
-        user_users = []
-        items = response.get('Items', [])
-        
-        # Handle pagination
-        while 'LastEvaluatedKey' in response:
-            logger.info("Fetching more user profiles from DynamoDB...")
-            response = table.scan(
-                FilterExpression='begins_with(PK, :pk_prefix) AND SK = :sk_value',
-                ExpressionAttributeValues={
-                    ':pk_prefix': 'User#',
-                    ':sk_value': 'PROFILE'
-                },
-                ExclusiveStartKey=response['LastEvaluatedKey']
-            )
-            items.extend(response.get('Items', []))
-        
-        # Filter for user users with phone numbers
-        for item in items:
-            role = item.get('role', '')
-            phone_number = item.get('phoneNumber', '')
-            
-            if role == 'user' and phone_number:
-                user_users.append({
-                    'userId': item.get('userId'),
-                    'name': item.get('name', 'User'),
-                    'phoneNumber': phone_number,
-                    'email': item.get('email', '')
-                })
+        user_users = [_report_user(item) for item in items]
         
         logger.info(f"Found {len(user_users)} user users with phone numbers")
         return user_users
@@ -95,14 +164,31 @@ def get_users_with_phones() -> List[Dict[str, Any]]:
         logger.error(f"Error getting user users: {str(e)}")
         return []
 
+def get_report_user(user_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Read one user's current profile; None unless they have role='user' and a phone number,
+    so a worker only sends to users the orchestrator would have selected
+    """
+    response = table.get_item(
+        Key={'PK': f'User#{user_id}', 'SK': 'PROFILE'},
+        ProjectionExpression=USER_PROFILE_CHECK_PROJECTION,
+        ExpressionAttributeNames=USER_PROFILE_ATTRIBUTE_NAMES
+    )
+    item = response.get('Item')
+    if not item or item.get('role') != 'user' or not item.get('phoneNumber'):
+        return None
+    return _report_user(item)
+
 def get_user_systems(user_id: str) -> List[str]:
     """
     Get all system IDs linked to a user
     """
     try:
-        logger.info(f"Getting systems for user {user_id}")
+        logger.debug("Getting systems for user %s", user_id)
         
-        response = table.query(
+        items = _read_all_pages(
+            table.meta.client,
+            'query',
             KeyConditionExpression='PK = :pk AND begins_with(SK, :sk)',
             ExpressionAttributeValues={
                 ':pk': f'User#{user_id}',
@@ -111,103 +197,226 @@ def get_user_systems(user_id: str) -> List[str]:
         )
         
         system_ids = []
-        for item in response.get('Items', []):
+        for item in items:
             system_id = item.get('systemId')
             if system_id:
                 system_ids.append(system_id)
         
-        logger.info(f"Found {len(system_ids)} systems for user {user_id}")
+        logger.debug("Found %d systems for user %s", len(system_ids), user_id)
         return system_ids
         
     except Exception as e:
         logger.error(f"Error getting systems for user {user_id}: {str(e)}")
         return []
 
-def get_system_monthly_data(system_id: str, month: str) -> Optional[Dict[str, Any]]:
+def _monthly_data_from_item(system_id: str, item: Dict[str, Any], month: str) -> Dict[str, Any]:
     """
-    Get monthly data for a specific system
+    Convert a raw (low-level client) monthly data item into the dict used by the report
+    """
+    def _number(name: str) -> float:
+        value = item.get(name)
+        return float(value['N']) if value else 0.0
+    
+    return {
+        'systemId': system_id,
+        'systemName': item['systemName']['S'] if 'systemName' in item else 'Unknown System',
+        'energyProductionWh': _number('energyProductionWh'),
+        'earnings': _number('earnings'),
+        'co2Savings': _number('co2Savings'),
+        'month': month
+    }
+
+def get_user_monthly_data(user_id: str, month: str) -> List[Dict[str, Any]]:
+    """
+    Get the monthly data copies stored under a user for all of their systems in one query
     """
     try:
-        logger.info(f"Getting monthly data for system {system_id} for month {month}")
-        
-        response = table.get_item(
-            Key={
-                'PK': f'System#{system_id}',
-                'SK': f'DATA#MONTHLY#{month}'
+        items = _read_all_pages(
+            dynamodb_client,
+            'query',
+            KeyConditionExpression='PK = :pk AND begins_with(SK, :sk)',
+            ProjectionExpression=USER_MONTHLY_PROJECTION,
+            ExpressionAttributeValues={
+                ':pk': {'S': f'User#{user_id}'},
+                ':sk': {'S': f'MONTHLY#{month}#'}
             }
         )
+        return [_monthly_data_from_item(item['systemId']['S'], item, month) for item in items]
         
-        if 'Item' in response:
-            item = response['Item']
-            # Convert Decimals to float for calculations
-            return {
-                'systemId': system_id,
-                'systemName': item.get('systemName', 'Unknown System'),
-                'energyProductionWh': float(item.get('energyProductionWh', 0)),
-                'earnings': float(item.get('earnings', 0)),
-                'co2Savings': float(item.get('co2Savings', 0)),
-                'month': month
+    except Exception as e:
+        logger.error(f"Error getting monthly data for user {user_id}: {str(e)}")
+        return []
+
+def read_user_monthly_data(user_id: str, month: str,
+                           aggregate: Optional[Tuple[Tuple[float, float, float], List[Dict[str, Any]]]] = None
+                           ) -> Tuple[List[str], Dict[str, Dict[str, Any]], Optional[Tuple[float, float, float]]]:
+    """
+    Get a user's linked systems (the source of truth) and the monthly data stored for them
+    Returns (system ids, {system_id: monthly data}, totals). The precomputed aggregate and its totals
+    are used only when it covers exactly the linked systems; otherwise the user's monthly copies are
+    read, copies of systems no longer linked are ignored, and linked systems without a copy are left
+    for the caller to read from the system items
+    """
+    system_ids = get_user_systems(user_id)
+    if not system_ids:
+        return [], {}, None
+    
+    if aggregate:
+        totals, systems_data = aggregate
+        aggregate_by_system = {data['systemId']: data for data in systems_data}
+        if aggregate_by_system.keys() == set(system_ids):
+            return system_ids, aggregate_by_system, totals
+        logger.info(f"Monthly aggregate for user {user_id} does not match their linked systems, reading copies")
+    
+    copies = {data['systemId']: data for data in get_user_monthly_data(user_id, month)}
+    return system_ids, {system_id: copies[system_id] for system_id in system_ids if system_id in copies}, None
+
+def _batch_get_items(keys: List[Dict[str, Any]], projection: str) -> List[Dict[str, Any]]:
+    """
+    BatchGetItem the given raw keys, 100 per request, retrying unprocessed keys with backoff
+    Returns the raw items found; failed chunks are logged and skipped
+    """
+    items = []
+    
+    for start in range(0, len(keys), BATCH_GET_SIZE):
+        request_items = {
+            DYNAMODB_TABLE_NAME: {
+                'Keys': keys[start:start + BATCH_GET_SIZE],
+                'ProjectionExpression': projection
             }
+        }
+        
+        try:
+            for attempt in range(MAX_BATCH_GET_RETRIES):
+                response = dynamodb_client.batch_get_item(RequestItems=request_items)
+                items.extend(response.get('Responses', {}).get(DYNAMODB_TABLE_NAME, []))
+                
+                # Retry throttled keys with exponential backoff
+                request_items = response.get('UnprocessedKeys') or {}
+                if not request_items:
+                    break
+                time.sleep(min(0.05 * 2 ** attempt, 2))
+            else:
+                unprocessed = len(request_items[DYNAMODB_TABLE_NAME]['Keys'])
+                logger.error(f"{unprocessed} keys still unprocessed after {MAX_BATCH_GET_RETRIES} attempts")
+                
+        except Exception as e:
+            logger.error(f"Error batch getting keys {start}-{start + BATCH_GET_SIZE}: {str(e)}")
+    
+    return items
+
+def get_systems_monthly_data(system_ids: List[str], month: str) -> Dict[str, Dict[str, Any]]:
+    """
+    Get monthly data for many systems, from the cache or with BatchGetItem
+    Returns {system_id: monthly data}; systems with no data for the month are left out
+    """
+    now = time.monotonic()
+    monthly_data = {}
+    uncached_ids = []
+    for system_id in system_ids:
+        cached = _monthly_data_cache.get((system_id, month))
+        if cached and cached[0] > now:
+            monthly_data[system_id] = cached[1]
         else:
-            logger.warning(f"No monthly data found for system {system_id} for month {month}")
-            return None
-            
-    except Exception as e:
-        logger.error(f"Error getting monthly data for system {system_id}: {str(e)}")
-        return None
+            uncached_ids.append(system_id)
+    
+    logger.info(f"Getting monthly data for {len(uncached_ids)} systems for month {month} "
+                f"({len(monthly_data)} cached)")
+    keys = [
+        {'PK': {'S': f'System#{system_id}'}, 'SK': {'S': f'DATA#MONTHLY#{month}'}}
+        for system_id in uncached_ids
+    ]
+    
+    if len(_monthly_data_cache) + len(keys) > MONTHLY_CACHE_MAX_SIZE:
+        _monthly_data_cache.clear()
+    
+    for item in _batch_get_items(keys, MONTHLY_DATA_PROJECTION):
+        system_id = item['PK']['S'][len('System#'):]
+        monthly_data[system_id] = _monthly_data_from_item(system_id, item, month)
+        _monthly_data_cache[(system_id, month)] = (now + MONTHLY_CACHE_TTL_SECONDS, monthly_data[system_id])
+    
+    missing = len(system_ids) - len(monthly_data)
+    if missing:
+        logger.warning(f"No monthly data found for {missing} systems for month {month}")
+    return monthly_data
+
+def get_user_monthly_aggregates(user_ids: List[str], month: str) -> Dict[str, Tuple[Tuple[float, float, float], List[Dict[str, Any]]]]:
+    """
+    Get the precomputed User#<id> / MONTHLY#<month> aggregates written by polling.py
+    Returns {user_id: ((energy Wh, earnings, CO2 kg), per-system data)}; users without one are left out
+    """
+    keys = [{'PK': {'S': f'User#{user_id}'}, 'SK': {'S': f'MONTHLY#{month}'}} for user_id in user_ids]
+    
+    aggregates = {}
+    for item in _batch_get_items(keys, USER_AGGREGATE_PROJECTION):
+        user_id = item.get('PK', {}).get('S', '')[len('User#'):]
+        try:
+            totals = tuple(float(item[name]['N']) for name in ('totalEnergyWh', 'totalEarnings', 'totalCO2'))
+            systems_data = [
+                _monthly_data_from_item(system['M']['systemId']['S'], system['M'], month)
+                for system in item['perSystem']['L']
+            ]
+        except (KeyError, TypeError, ValueError) as e:
+            # A malformed aggregate is skipped; the user's report is built from the copies instead
+            logger.warning(f"Skipping malformed monthly aggregate for user {user_id}: {e!r}")
+            continue
+        aggregates[user_id] = (totals, systems_data)
+    
+    logger.info(f"Found monthly aggregates for {len(aggregates)}/{len(user_ids)} users")
+    return aggregates
 
-def format_report_message(user_name: str, systems_data: List[Dict[str, Any]], month: str) -> str:
+def format_report_message(user_name: str, systems_data: List[Dict[str, Any]], month_name: str,
+                          totals: Optional[Tuple[float, float, float]] = None) -> str:
     """
     Format the monthly report message for SMS
+    month_name is the display form of the month (e.g. "March 2025"), computed once per run
+    totals is (energy Wh, earnings, CO2 kg) when already rolled up; otherwise summed here
     """
     if not systems_data:
-        return f"Hi {user_name}, no data available for your solar systems for {month}."
+        return f"Hi {user_name}, no data available for your solar systems for {month_name}."
     
-    # Calculate totals
-    total_energy_kwh = sum(data['energyProductionWh'] for data in systems_data) / 1000  # Convert Wh to kWh
-    total_earnings = sum(data['earnings'] for data in systems_data)
-    total_co2_kg = sum(data['co2Savings'] for data in systems_data)
+    if totals:
+        total_energy_wh, total_earnings, total_co2_kg = totals
+    else:
+        # Calculate totals in a single pass
+        total_energy_wh = total_earnings = total_co2_kg = 0.0
+        for data in systems_data:
+            total_energy_wh += data['energyProductionWh']
+            total_earnings += data['earnings']
+            total_co2_kg += data['co2Savings']
+    
+    # Add system breakdown if multiple systems
+    breakdown_lines = []
+    if len(systems_data) > 1:
+        breakdown_lines = ["SYSTEM BREAKDOWN:"]
+        for data in systems_data:
+            system_name = data['systemName'] if len(data['systemName']) <= 20 else data['systemName'][:20] + "..."
+            breakdown_lines += [
+                f"• {system_name}:",
+                f"  {data['energyProductionWh'] / 1000:.1f} kWh, ${data['earnings']:.2f}"
+            ]
+        breakdown_lines.append("")
     
-    # Start building message
-    month_name = datetime.strptime(month, "%Y-%m").strftime("%B %Y")
-    message_lines = [
+    return "\n".join([
         f"Solar Report - {month_name}",
         f"Hi {user_name}!",
         "",
         "MONTHLY SUMMARY:",
-        f"Total Energy: {total_energy_kwh:.1f} kWh",
+        f"Total Energy: {total_energy_wh / 1000:.1f} kWh",  # Convert Wh to kWh
         f"Total Earnings: ${total_earnings:.2f}",
         f"CO2 Saved: {total_co2_kg:.1f} kg",
-        ""
-    ]
-    
-    # Add system breakdown if multiple systems
-    if len(systems_data) > 1:
-        message_lines.append("SYSTEM BREAKDOWN:")
-        for data in systems_data:
-            system_name = data['systemName'][:20] + "..." if len(data['systemName']) > 20 else data['systemName']
-            energy_kwh = data['energyProductionWh'] / 1000
-            earnings = data['earnings']
-            message_lines.append(f"• {system_name}:")
-            message_lines.append(f"  {energy_kwh:.1f} kWh, ${earnings:.2f}")
-        message_lines.append("")
-    
-    # Add footer
-    message_lines.extend([
+        "",
+        *breakdown_lines,
         "Great work on clean energy!",
         "",
         "- Jazz Energy Team"
     ])
-    
-    return "\n".join(message_lines)
 
 def send_sms_report(phone_number: str, message: str, user_id: str) -> bool:
     """
     Send SMS report via AWS SNS
     """
     try:
-        logger.info(f"Sending SMS report to {phone_number}")
-        
         # Ensure phone number is in E.164 format
         if not phone_number.startswith('+'):
             # Assume North American number if no country code
@@ -217,120 +426,336 @@ def send_sms_report(phone_number: str, message: str, user_id: str) -> bool:
                 phone_number = '+1' + phone_number
         
         # Remove any non-digit characters except the leading +
-        import re
-        phone_number = '+' + re.sub(r'[^\d]', '', phone_number[1:])
-        logger.info(f"Sending SMS report to {phone_number}")
-        logger.info(f"Message SENDING: {message}")
+        phone_number = '+' + _NON_DIGIT.sub('', phone_number[1:])
+        logger.debug("Sending SMS report to %s", phone_number)
         
-        response = sns.publish(
-                #PhoneNumber=phone_number,
-                PhoneNumber="+16135134833",
-                Message=message,
-                #Message="TEST MESSAGE",
-                MessageAttributes={
-                    'source': {
-                        'DataType': 'String',
-                        'StringValue': 'automatic-monthly-report'
-                    },
-                    'userId': {
-                        'DataType': 'String',
-                        'StringValue': user_id
-                    },
-                    'reportType': {
-                        'DataType': 'String',
-                        'StringValue': 'monthly-summary'
+        for attempt in range(MAX_PUBLISH_ATTEMPTS):
+            try:
+                response = sns.publish(
+                    PhoneNumber=phone_number,
+                    Message=message,
+                    MessageAttributes={
+                        'source': {
+                            'DataType': 'String',
+                            'StringValue': 'automatic-monthly-report'
+                        },
+                        'userId': {
+                            'DataType': 'String',
+                            'StringValue': user_id
+                        },
+                        'reportType': {
+                            'DataType': 'String',
+                            'StringValue': 'monthly-summary'
+                        }
                     }
-                }
-            )
+                )
+                break
+            except ClientError as e:
+                if e.response['Error']['Code'] not in SNS_THROTTLING_ERRORS or attempt == MAX_PUBLISH_ATTEMPTS - 1:
+                    raise
+                # Full jitter keeps concurrent senders from retrying in lockstep
+                time.sleep(random.uniform(0, PUBLISH_BACKOFF_SECONDS * 2 ** attempt))
 
         
-        logger.info(f"✅ SMS sent successfully to {phone_number}. Message ID: {response['MessageId']}")
+        logger.debug("✅ SMS sent successfully to %s. Message ID: %s", phone_number, response['MessageId'])
         return True
         
     except Exception as e:
         logger.error(f"❌ Error sending SMS to {phone_number}: {str(e)}")
         return False
 
-def lambda_handler(event, context):
+def enqueue_sms_reports(reports: List[Tuple[str, str, str]]) -> List[bool]:
     """
-    Main Lambda handler function
+    Queue up to 10 (phone_number, message, user_id) reports for sms_sender_handler in one request
+    Returns whether each report was accepted by SQS
     """
-    logger.info("=== AUTOMATIC MONTHLY REPORT LAMBDA STARTED ===")
+    try:
+        response = sqs.send_message_batch(
+            QueueUrl=SMS_QUEUE_URL,
+            Entries=[
+                {
+                    'Id': str(index),
+                    'MessageBody': json.dumps({'phoneNumber': phone_number, 'message': message, 'userId': user_id})
+                }
+                for index, (phone_number, message, user_id) in enumerate(reports)
+            ]
+        )
+        
+        failed = set()
+        for failure in response.get('Failed', []):
+            failed.add(failure['Id'])
+            logger.error(f"❌ Error queueing SMS for user {reports[int(failure['Id'])][2]}: {failure.get('Message')}")
+        return [str(index) not in failed for index in range(len(reports))]
+        
+    except Exception as e:
+        logger.error(f"❌ Error queueing {len(reports)} SMS reports: {str(e)}")
+        return [False] * len(reports)
+
+def deliver_reports(reports: List[Tuple[str, str, str]]) -> List[bool]:
+    """
+    Queue the (phone_number, message, user_id) reports on SQS when configured, otherwise publish them
+    """
+    if SMS_QUEUE_URL:
+        return enqueue_sms_reports(reports)
+    return [send_sms_report(*report) for report in reports]
+
+def sms_sender_handler(event, context):
+    """
+    SQS-triggered handler that publishes queued reports
+    Unsent messages are returned as batchItemFailures so SQS retries only those
+    """
+    failures = []
+    for record in event.get('Records', []):
+        try:
+            report = json.loads(record['body'])
+            sent = send_sms_report(report['phoneNumber'], report['message'], report['userId'])
+        except Exception as e:
+            logger.error(f"❌ Error handling queued SMS {record.get('messageId')}: {str(e)}")
+            sent = False
+        
+        if not sent:
+            failures.append({'itemIdentifier': record['messageId']})
+    
+    return {'batchItemFailures': failures}
+
+def send_user_report(user: Dict[str, Any], month: str, month_name: str) -> bool:
+    """
+    Gather one user's monthly data, then format and send their report
+    """
+    user_id = user['userId']
+    aggregate = get_user_monthly_aggregates([user_id], month).get(user_id)
+    system_ids, monthly_by_system, totals = read_user_monthly_data(user_id, month, aggregate)
     
+    missing_ids = [system_id for system_id in system_ids if system_id not in monthly_by_system]
+    if missing_ids:
+        monthly_by_system.update(get_systems_monthly_data(missing_ids, month))
+    systems_data = [
+        monthly_by_system[system_id]
+        for system_id in system_ids
+        if system_id in monthly_by_system
+    ]
+    
+    if not systems_data:
+        logger.warning(f"No monthly data found for user {user_id}'s systems")
+        return False
+    
+    report_message = format_report_message(user['name'], systems_data, month_name, totals)
+    return deliver_reports([(user['phoneNumber'], report_message, user_id)])[0]
+
+def dispatch_user_reports(users: List[Dict[str, Any]], month: str) -> int:
+    """
+    Invoke the worker Lambda asynchronously once per user with a {userId, month} payload;
+    the worker reloads the profile itself. Returns the number of users dispatched
+    """
+    def _invoke_worker(user: Dict[str, Any]) -> bool:
+        try:
+            lambda_client.invoke(
+                FunctionName=REPORT_WORKER_FUNCTION,
+                InvocationType='Event',
+                Payload=json.dumps({'userId': user['userId'], 'month': month})
+            )
+            return True
+        except Exception as e:
+            logger.error(f"Error dispatching report for user {user['userId']}: {str(e)}")
+            return False
+    
+    with ThreadPoolExecutor(max_workers=SMS_WORKERS) as executor:
+        return sum(executor.map(_invoke_worker, users))
+
+def _read_user_data(user: Dict[str, Any], month: str,
+                    aggregate: Optional[Tuple[Tuple[float, float, float], List[Dict[str, Any]]]]
+                    ) -> Tuple[List[str], Dict[str, Dict[str, Any]], Optional[Tuple[float, float, float]]]:
+    """
+    read_user_monthly_data for one user of a concurrent map; errors are caught here, since one
+    raising user would otherwise end the map for every user after them
+    """
     try:
-        # Get current month (or use month from event if provided)
-        current_month = event.get('month') if event and 'month' in event else datetime.utcnow().strftime("%Y-%m")
-        logger.info(f"Processing reports for month: {current_month}")
+        return read_user_monthly_data(user['userId'], month, aggregate)
+    except Exception as e:
+        logger.error(f"Error reading monthly data for user {user.get('name', 'unknown')}: {str(e)}")
+        return [], {}, None
+
+def _flush_reports(executor: ThreadPoolExecutor, pending: List[Tuple[str, str, str, str]],
+                   sends: List[Tuple[List[str], Any]]) -> None:
+    """
+    Hand the pending (phone, message, user_id, user_name) reports to the executor for delivery
+    """
+    if pending:
+        batch = pending[:]
+        pending.clear()
+        future = executor.submit(deliver_reports, [report[:3] for report in batch])
+        sends.append(([report[3] for report in batch], future))
+
+def _queue_report(executor: ThreadPoolExecutor, pending: List[Tuple[str, str, str, str]],
+                  sends: List[Tuple[List[str], Any]], user: Dict[str, Any], systems_data: List[Dict[str, Any]],
+                  month_name: str, totals: Optional[Tuple[float, float, float]] = None) -> None:
+    """
+    Format a user's report and queue it, delivering the batch once it is full
+    """
+    logger.debug("Processing user: %s (%s)", user['name'], user['userId'])
+    if not systems_data:
+        logger.warning(f"No monthly data found for user {user['userId']}'s systems")
+        return
+    
+    report_message = format_report_message(user['name'], systems_data, month_name, totals)
+    pending.append((user['phoneNumber'], report_message, user['userId'], user['name']))
+    if len(pending) >= REPORT_BATCH_SIZE:
+        _flush_reports(executor, pending, sends)
+
+def send_user_reports(users: List[Dict[str, Any]], month: str, month_name: str) -> Tuple[int, int]:
+    """
+    Gather, format and deliver every user's report in this invocation
+    Returns (successful reports, failed reports)
+    """
+    error_count = 0
+    sends = []
+    pending = []
+    
+    # Each report is delivered as soon as it is formatted (or its SQS batch fills),
+    # so publishes for earlier users overlap the DynamoDB reads for later ones
+    with ThreadPoolExecutor(max_workers=SMS_WORKERS) as executor:
+        # Precomputed per-user aggregates cover most users in a few BatchGetItem calls
+        user_aggregates = get_user_monthly_aggregates([user['userId'] for user in users], month)
         
-        # Get all user users with phone numbers
-        user_users = get_users_with_phones()
-        if not user_users:
-            logger.warning("No user users with phone numbers found")
-            return {
-                'statusCode': 200,
-                'body': json.dumps({
-                    'message': 'No user users with phone numbers found',
-                    'processed_users': 0
-                })
-            }
+        # Every user's linked systems are looked up and checked against their aggregate, or their
+        # monthly copies are read; these per-user reads run concurrently and are consumed in user order
+        user_reads = []
+        with ThreadPoolExecutor(max_workers=USER_READ_WORKERS) as read_executor:
+            reads = read_executor.map(
+                _read_user_data, users, repeat(month), [user_aggregates.get(user['userId']) for user in users]
+            )
+            for user, (system_ids, monthly_by_system, totals) in zip(users, reads):
+                try:
+                    if not system_ids:
+                        logger.warning(f"No systems found for user {user['userId']}")
+                    elif totals:
+                        _queue_report(executor, pending, sends, user,
+                                      [monthly_by_system[system_id] for system_id in system_ids], month_name, totals)
+                    else:
+                        user_reads.append((user, system_ids, monthly_by_system))
+                except Exception as e:
+                    logger.error(f"Error processing user {user.get('name', 'unknown')}: {str(e)}")
+                    error_count += 1
         
-        success_count = 0
-        error_count = 0
+        # Linked systems without a user copy (failed copy writes, or linked since the last poll)
+        # are read from their system items, once per distinct system however many users share it
+        missing_ids = list(dict.fromkeys(
+            system_id
+            for _, system_ids, monthly_by_system in user_reads
+            for system_id in system_ids
+            if system_id not in monthly_by_system
+        ))
+        monthly_by_system_item = get_systems_monthly_data(missing_ids, month) if missing_ids else {}
         
-        # Process each  user
-        for user in user_users:
+        for user, system_ids, monthly_by_system in user_reads:
             try:
-                user_id = user['userId']
-                user_name = user['name']
-                phone_number = user['phoneNumber']
-                
-                logger.info(f"Processing user: {user_name} ({user_id})")
-                
-                # Get user's systems
-                system_ids = get_user_systems(user_id)
-                if not system_ids:
-                    logger.warning(f"No systems found for user {user_id}")
-                    continue
-                
-                # Get monthly data for each system
-                systems_data = []
-                for system_id in system_ids:
-                    monthly_data = get_system_monthly_data(system_id, current_month)
-                    if monthly_data:
-                        systems_data.append(monthly_data)
-                
-                if not systems_data:
-                    logger.warning(f"No monthly data found for user {user_id}'s systems")
-                    continue
-                
-                # Format and send report
-                report_message = format_report_message(user_name, systems_data, current_month)
-                
-                if send_sms_report(phone_number, report_message, user_id):
-                    success_count += 1
-                    logger.info(f"✅ Successfully sent report to {user_name}")
-                else:
-                    error_count += 1
-                    logger.error(f"❌ Failed to send report to {user_name}")
-                    
+                # Look up monthly data for each of the user's systems
+                _queue_report(executor, pending, sends, user, [
+                    monthly_by_system.get(system_id) or monthly_by_system_item[system_id]
+                    for system_id in system_ids
+                    if system_id in monthly_by_system or system_id in monthly_by_system_item
+                ], month_name)
             except Exception as e:
                 logger.error(f"Error processing user {user.get('name', 'unknown')}: {str(e)}")
                 error_count += 1
         
-        logger.info(f"=== REPORT PROCESSING COMPLETED ===")
-        logger.info(f"Successful reports: {success_count}")
-        logger.info(f"Failed reports: {error_count}")
-        
+        _flush_reports(executor, pending, sends)
+    
+    success_count = 0
+    for user_names, future in sends:
+        for user_name, sent in zip(user_names, future.result()):
+            if sent:
+                success_count += 1
+                logger.debug("✅ Successfully sent report to %s", user_name)
+            else:
+                error_count += 1
+                logger.error(f"❌ Failed to send report to {user_name}")
+    
+    return success_count, error_count
+
+def handle_worker_event(event: Dict[str, Any], month: str, month_name: str) -> Dict[str, Any]:
+    """
+    Worker invocation: send the report of the user handed over by the orchestrator
+    Only the userId is taken from the event; the phone number and role come from the current profile
+    """
+    user = get_report_user(event['userId'])
+    if user is None:
+        logger.warning(f"User {event['userId']} has no reportable profile; report not sent")
+        sent = False
+    else:
+        sent = send_user_report(user, month, month_name)
+    return {
+        'statusCode': 200,
+        'body': json.dumps({
+            'message': 'Monthly report sent' if sent else 'Monthly report not sent',
+            'month': month,
+            'userId': event['userId']
+        })
+    }
+
+def handle_orchestrator_event(month: str, month_name: str) -> Dict[str, Any]:
+    """
+    Orchestrator invocation: fan the users out to the worker Lambda when one is configured,
+    otherwise send every report from this invocation
+    """
+    # Get all user users with phone numbers
+    user_users = get_users_with_phones()
+    if not user_users:
+        logger.warning("No user users with phone numbers found")
         return {
             'statusCode': 200,
             'body': json.dumps({
-                'message': 'Monthly reports processed successfully',
-                'month': current_month,
-                'successful_reports': success_count,
-                'failed_reports': error_count,
-                'total_users_processed': len(user_users)
+                'message': 'No user users with phone numbers found',
+                'processed_users': 0
             })
         }
+    
+    # Fan out to the worker Lambda when one is configured
+    if REPORT_WORKER_FUNCTION:
+        dispatched = dispatch_user_reports(user_users, month)
+        logger.info(f"Dispatched {dispatched}/{len(user_users)} reports to {REPORT_WORKER_FUNCTION}")
+        return {
+            'statusCode': 200,
+            'body': json.dumps({
+                'message': 'Monthly reports dispatched',
+                'month': month,
+                'dispatched_reports': dispatched,
+                'failed_dispatches': len(user_users) - dispatched
+            })
+        }
+    
+    success_count, error_count = send_user_reports(user_users, month, month_name)
+    
+    logger.info(f"=== REPORT PROCESSING COMPLETED ===")
+    logger.info(f"Successful reports: {success_count}")
+    logger.info(f"Failed reports: {error_count}")
+    
+    return {
+        'statusCode': 200,
+        'body': json.dumps({
+            'message': 'Monthly reports processed successfully',
+            'month': month,
+            'successful_reports': success_count,
+            'failed_reports': error_count,
+            'total_users_processed': len(user_users)
+        })
+    }
+
+def lambda_handler(event, context):
+    """
+    Main Lambda handler function
+    """
+    logger.info("=== AUTOMATIC MONTHLY REPORT LAMBDA STARTED ===")
+    
+    try:
+        # Get current month (or use month from event if provided)
+        current_month = event.get('month') if event and 'month' in event else datetime.now(timezone.utc).strftime("%Y-%m")
+        month_name = datetime.strptime(current_month, "%Y-%m").strftime("%B %Y")
+        logger.info(f"Processing reports for month: {current_month}")
+        
+        if event and 'userId' in event:
+            return handle_worker_event(event, current_month, month_name)
+        return handle_orchestrator_event(current_month, month_name)
         
     except Exception as e:
         logger.error(f"Critical error in lambda_handler: {str(e)}")
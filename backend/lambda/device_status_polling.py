@@ -15,7 +15,7 @@ Key Features:
 Status Logic:
 - Within moon time (after sunset-1h OR before sunrise+1h): transitions between green/red/Moon based on power and current status
 - Within daylight time (sunrise+1h to sunset-1h): green if power > 0, red if power = 0 (with specific error reasons)
-- Uses system-specific timezones (America/New_York or America/Chicago) for accurate time comparisons
+- Uses system-specific IANA timezones (e.g. America/New_York) for accurate time comparisons
 
 Usage:
 - As a script: python device_status_polling.py
@@ -26,14 +26,26 @@ import os
 import json
 import logging
 import requests
+from requests.adapters import HTTPAdapter
 import boto3
 import time
-from datetime import datetime, timedelta
-from typing import List, Dict, Any, Optional
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import random
+from datetime import datetime, timedelta, time as dt_time
+from typing import List, Dict, Any, Iterator, Optional, Set, Tuple
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from itertools import chain, count
+from collections import Counter, deque
 from decimal import Decimal
 import threading
+import heapq
 import botocore.config
+from boto3.dynamodb.conditions import Attr, Key
+from sk_pk_index import iter_sk_pk_pages
+try:
+    import orjson
+except ImportError:
+    # Fall back to the standard json module when orjson is not installed
+    orjson = None
 try:
     from zoneinfo import ZoneInfo
 except ImportError:
@@ -71,38 +83,117 @@ SUPABASE_ANON_KEY = os.environ.get('SUPABASE_ANON_KEY', 'eyJhbGciOiJIUzI1NiIsInR
 # AWS Configuration
 AWS_REGION = os.environ.get('AWS_REGION', 'us-east-1')
 SNS_TOPIC_ARN = os.environ.get('SNS_TOPIC_ARN', 'arn:aws:sns:us-east-1:381492109487:solarSystemAlerts')
+# Parallel scan segments used when the SK-PK index is unavailable
+SCAN_SEGMENTS = int(os.environ.get('SCAN_SEGMENTS', '8'))
+
+# Inverter STATUS row conditions, built once: index key condition and scan fallback filter
+INVERTER_STATUS_KEY_CONDITION = Key('SK').eq('STATUS') & Key('PK').begins_with('Inverter#')
+INVERTER_STATUS_FILTER = Attr('PK').begins_with('Inverter#') & Attr('SK').eq('STATUS')
+INVERTER_PROJECTION = 'device_id, pvSystemId'
+# STATUS row attributes the status logic reads ('status' is a reserved word)
+DEVICE_STATUS_PROJECTION = 'PK, #status, reason, lastUpdated, lastStatusChangeTime, power'
+DEVICE_STATUS_ATTRIBUTE_NAMES = {'#status': 'status'}
 
 # Configuration constants
 MAX_RETRIES = int(os.environ.get('MAX_RETRIES', '3'))
+# Number of devices polled concurrently (stays below the 50-connection client pools)
+POLL_CONCURRENCY = int(os.environ.get('POLL_CONCURRENCY', '32'))
+# Flowdata retries when a device reports online but returns null data
+FLOWDATA_MAX_ATTEMPTS = int(os.environ.get('FLOWDATA_MAX_ATTEMPTS', '3'))
+FLOWDATA_BASE_BACKOFF = float(os.environ.get('FLOWDATA_BASE_BACKOFF', '0.5'))
+# Power is stored with 2 decimal places (W)
+POWER_QUANTUM = Decimal('0.01')
+# BatchGetItem accepts at most 100 keys per request
+BATCH_GET_SIZE = 100
+# BatchWriteItem accepts at most 25 items per request
+STATUS_WRITE_BATCH_SIZE = 25
+# PublishBatch accepts at most 10 entries and 256 KB per request
+SNS_BATCH_SIZE = 10
+SNS_BATCH_MAX_BYTES = 256 * 1024
 
-# Initialize AWS clients
-sns = boto3.client('sns', region_name=AWS_REGION)
+# Initialize AWS clients; SNS uses adaptive retries and TCP keep-alive so
+# publishes from concurrent threads reuse pooled connections
+# Connection pools are sized from POLL_CONCURRENCY so every polling thread can hold
+# a connection without blocking on (or discarding from) a full pool
+sns_config = botocore.config.Config(
+    max_pool_connections=max(50, POLL_CONCURRENCY),
+    retries={'mode': 'adaptive', 'max_attempts': 5},
+    tcp_keepalive=True
+)
+sns = boto3.client('sns', region_name=AWS_REGION, config=sns_config)
 
 # Configure DynamoDB with larger connection pool for concurrent operations
 dynamodb_config = botocore.config.Config(
-    max_pool_connections=50  # Increase from default 10 to handle concurrent threads
+    max_pool_connections=max(50, POLL_CONCURRENCY)  # Increase from default 10 to handle concurrent threads
 )
 dynamodb = boto3.resource('dynamodb', region_name=AWS_REGION, config=dynamodb_config)
 table = dynamodb.Table(os.environ.get('DYNAMODB_TABLE_NAME', 'Moose-DDB'))
 
+# Shared HTTP session so Solar.web, Supabase and WeatherAPI calls reuse keep-alive
+# connections across threads and warm invocations; retries stay in our own loops
+http_session = requests.Session()
+http_adapter = HTTPAdapter(pool_connections=32, pool_maxsize=max(64, POLL_CONCURRENCY), max_retries=0)
+http_session.mount('https://', http_adapter)
+http_session.mount('http://', http_adapter)
+
 # JWT token cache
 _jwt_token_cache = {
     'token': None,
-    'expires_at': None
+    'expires_at': None,
+    'failed_until': None  # Threads queued behind a failed refresh fail fast until then
 }
 
-# Error codes cache
+# Error codes cache, mirrored to Lambda's /tmp so a restarted runtime in the same
+# execution environment can skip the Supabase call
+ERROR_CODES_CACHE_TTL = timedelta(seconds=int(os.environ.get('ERROR_CODES_CACHE_TTL_SECONDS', '3600')))
+ERROR_CODES_CACHE_FILE = os.environ.get('ERROR_CODES_CACHE_FILE', '/tmp/error_codes.json')
 _error_codes_cache = {
     'codes': None,
     'expires_at': None
 }
+# After a failed Supabase fetch, wait this long before trying again
+ERROR_CODES_RETRY_DELAY = timedelta(minutes=1)
+
+# Refresh locks: only one worker refreshes an expired JWT / error codes map, the rest
+# wait for it and reuse the result (checked again once the lock is held)
+_jwt_token_lock = threading.RLock()
+_error_codes_lock = threading.RLock()
+
+# Per-system sun times (keyed by (system_id, date)) and timezone caches; inverters
+# on the same system share them instead of re-reading the same DynamoDB items
+SYSTEM_CACHE_TTL = timedelta(hours=1)
+# Expired entries are pruned once a cache reaches this size; it is cleared if that is not enough
+SYSTEM_CACHE_MAX_SIZE = 4096
+_system_suntimes_cache: Dict[Tuple[str, str], Dict[str, Any]] = {}
+_system_tz_cache: Dict[str, Dict[str, Any]] = {}
+# Moon time boundaries keyed by the (sunrise, sunset) strings they were parsed from
+_moon_bounds_cache: Dict[Tuple[str, str], Dict[str, Any]] = {}
+system_cache_lock = threading.Lock()
+
+# Device polling pool, created once per container and reused by every warm invocation
+polling_executor = ThreadPoolExecutor(max_workers=POLL_CONCURRENCY, thread_name_prefix='device-poll')
+
+# System lookups (sun times, timezone) run here so they overlap with each device's
+# flowdata request; kept apart from the polling pool so workers never wait on their own pool
+system_lookup_executor = ThreadPoolExecutor(max_workers=POLL_CONCURRENCY, thread_name_prefix='system-lookup')
 
 # Thread lock for stats
 stats_lock = threading.Lock()
 
+# Thread lock for the buffer of unchanged STATUS rows written in batches
+status_writes_lock = threading.Lock()
+
+# Thread lock for the buffer of status change notifications published in batches
+sns_buffer_lock = threading.Lock()
+
+# Thread lock for the heap of deferred flowdata retries, and the tie-breaker that keeps heap
+# entries from ever comparing inverters
+flowdata_retries_lock = threading.Lock()
+_flowdata_retry_sequence = count()
+
 # Rate limiter for WeatherAPI calls (max 50 calls per minute)
 weatherapi_rate_limiter = {
-    'calls': [],  # List of timestamps when calls were made
+    'calls': deque(maxlen=50),  # Monotonic timestamps of the calls in the last minute
     'lock': threading.Lock()
 }
 
@@ -112,16 +203,44 @@ class InverterMetadata:
         self.device_id = device_id
         self.system_name = system_name or f"System {pv_system_id}"
 
+def _response_json(response: requests.Response) -> Any:
+    """Decode a JSON response body, with orjson when it is available"""
+    if orjson:
+        return orjson.loads(response.content)
+    return response.json()
+
+def _cached_jwt_token() -> Optional[str]:
+    """Return the cached JWT token if it has not expired"""
+    if (_jwt_token_cache['token'] and _jwt_token_cache['expires_at'] and 
+        datetime.utcnow() < _jwt_token_cache['expires_at']):
+        return _jwt_token_cache['token']
+    return None
+
 def get_jwt_token() -> str:
     """Get a JWT token for authentication with the Solar.web API with caching"""
-    global _jwt_token_cache
-    
     # Check if we have a valid cached token
-    if (_jwt_token_cache['token'] and _jwt_token_cache['expires_at'] and 
-        datetime.utcnow() < _jwt_token_cache['expires_at']):
+    token = _cached_jwt_token()
+    if token:
         logger.debug("Using cached JWT token")
-        return _jwt_token_cache['token']
+        return token
     
+    with _jwt_token_lock:
+        # Another worker may have refreshed it while we waited for the lock
+        token = _cached_jwt_token()
+        if token:
+            return token
+        
+        if _jwt_token_cache['failed_until'] and datetime.utcnow() < _jwt_token_cache['failed_until']:
+            raise requests.exceptions.RequestException("JWT token refresh failed recently, not retrying yet")
+        
+        try:
+            return _request_jwt_token()
+        except Exception:
+            _jwt_token_cache['failed_until'] = datetime.utcnow() + timedelta(seconds=30)
+            raise
+
+def _request_jwt_token() -> str:
+    """Request a new JWT token from the Solar.web API and cache it"""
     endpoint = f"{API_BASE_URL}/iam/jwt"
     headers = {
         'Content-Type': 'application/json',
@@ -136,10 +255,10 @@ def get_jwt_token() -> str:
     for attempt in range(MAX_RETRIES):
         try:
             logger.info(f"Requesting JWT token from {endpoint} (attempt {attempt + 1})")
-            response = requests.post(endpoint, headers=headers, json=payload, timeout=30)
+            response = http_session.post(endpoint, headers=headers, json=payload, timeout=30)
             response.raise_for_status()
             
-            data = response.json()
+            data = _response_json(response)
             if 'jwtToken' not in data:
                 raise ValueError("JWT response is missing the jwtToken field")
             
@@ -160,16 +279,63 @@ def get_jwt_token() -> str:
             logger.error(f"Error obtaining JWT token: {str(e)}")
             raise
 
+def _load_error_codes_file() -> bool:
+    """Fill _error_codes_cache from ERROR_CODES_CACHE_FILE if it has not expired"""
+    try:
+        with open(ERROR_CODES_CACHE_FILE) as f:
+            cached = json.load(f)
+        expires_at = datetime.utcfromtimestamp(cached['expires_at'])
+        if datetime.utcnow() >= expires_at:
+            return False
+        
+        # Stored as [code, colour] pairs so integer codes keep their type
+        _error_codes_cache['codes'] = {code: colour for code, colour in cached['codes']}
+        _error_codes_cache['expires_at'] = expires_at
+        return True
+        
+    except (OSError, ValueError, KeyError, TypeError):
+        return False
+
+def _save_error_codes_file(color_map: Dict[int, str], expires_at: datetime):
+    """Best-effort write of the error codes cache to ERROR_CODES_CACHE_FILE"""
+    try:
+        with open(ERROR_CODES_CACHE_FILE, 'w') as f:
+            json.dump({
+                'expires_at': (expires_at - datetime(1970, 1, 1)).total_seconds(),
+                'codes': list(color_map.items())
+            }, f)
+    except (OSError, TypeError) as e:
+        logger.warning(f"Could not write error codes cache file: {str(e)}")
+
+def _cached_error_codes() -> Optional[Dict[int, str]]:
+    """Return the cached error codes map if it has not expired"""
+    if (_error_codes_cache['codes'] is not None and _error_codes_cache['expires_at'] and 
+        datetime.utcnow() < _error_codes_cache['expires_at']):
+        return _error_codes_cache['codes']
+    return None
+
 def get_all_error_codes_from_supabase() -> Dict[int, str]:
     """Get all error codes and their colors from Supabase with caching"""
-    global _error_codes_cache
-    
     # Check if we have a valid cached response
-    if (_error_codes_cache['codes'] and _error_codes_cache['expires_at'] and 
-        datetime.utcnow() < _error_codes_cache['expires_at']):
+    codes = _cached_error_codes()
+    if codes is not None:
         logger.debug("Using cached error codes")
-        return _error_codes_cache['codes']
+        return codes
     
+    with _error_codes_lock:
+        # Another worker may have refreshed it while we waited for the lock
+        codes = _cached_error_codes()
+        if codes is not None:
+            return codes
+        
+        if _load_error_codes_file() and _error_codes_cache['codes']:
+            logger.info(f"Loaded {len(_error_codes_cache['codes'])} error codes from {ERROR_CODES_CACHE_FILE}")
+            return _error_codes_cache['codes']
+        
+        return _fetch_error_codes()
+
+def _fetch_error_codes() -> Dict[int, str]:
+    """Fetch the error codes map from Supabase and cache it"""
     try:
         url = f"{SUPABASE_URL}/rest/v1/error_codes"
         headers = {
@@ -182,26 +348,31 @@ def get_all_error_codes_from_supabase() -> Dict[int, str]:
             'select': 'code,colour'
         }
         
-        response = requests.get(url, headers=headers, params=params, timeout=30)
+        response = http_session.get(url, headers=headers, params=params, timeout=30)
         response.raise_for_status()
         
-        data = response.json()
+        data = _response_json(response)
         
         color_map = {}
         for item in data:
             if 'code' in item and 'colour' in item:
                 color_map[item['code']] = item['colour']
         
-        # Cache the results for 1 hour
+        # Cache the results (1 hour by default) in memory and on disk
         _error_codes_cache['codes'] = color_map
-        _error_codes_cache['expires_at'] = datetime.utcnow() + timedelta(hours=1)
+        _error_codes_cache['expires_at'] = datetime.utcnow() + ERROR_CODES_CACHE_TTL
+        _save_error_codes_file(color_map, _error_codes_cache['expires_at'])
         
         logger.info(f"Retrieved and cached {len(color_map)} error codes from Supabase")
         return color_map
         
     except Exception as e:
         logger.error(f"Error fetching all error codes from Supabase: {str(e)}")
-        return {}
+        # Expired codes are better than none while Supabase is unreachable; keep
+        # serving them for a minute instead of every worker retrying in turn
+        _error_codes_cache['codes'] = _error_codes_cache['codes'] or {}
+        _error_codes_cache['expires_at'] = datetime.utcnow() + ERROR_CODES_RETRY_DELAY
+        return _error_codes_cache['codes']
 
 def api_request(endpoint: str, method: str = 'GET', params: Dict[str, Any] = None) -> Dict[str, Any]:
     """Make an authenticated request to the Solar.web API with retry logic"""
@@ -210,17 +381,12 @@ def api_request(endpoint: str, method: str = 'GET', params: Dict[str, Any] = Non
     
     url = f"{API_BASE_URL}/{endpoint}"
     
-    if params:
-        query_parts = []
-        for key, value in params.items():
-            if value is not None:
-                if isinstance(value, list):
-                    query_parts.append(f"{key}={','.join(str(v) for v in value)}")
-                else:
-                    query_parts.append(f"{key}={value}")
-        
-        if query_parts:
-            url += f"?{'&'.join(query_parts)}"
+    # requests URL-encodes the query string; list values are sent comma-separated
+    query_params = {
+        key: ','.join(map(str, value)) if isinstance(value, list) else value
+        for key, value in (params or {}).items()
+        if value is not None
+    }
     
     for attempt in range(MAX_RETRIES):
         try:
@@ -235,7 +401,7 @@ def api_request(endpoint: str, method: str = 'GET', params: Dict[str, Any] = Non
             }
             
             logger.debug(f"Making API request to {url}")
-            response = requests.get(url, headers=headers, timeout=30)
+            response = http_session.get(url, params=query_params, headers=headers, timeout=30)
             
             # Handle rate limiting
             if response.status_code == 429:
@@ -249,7 +415,7 @@ def api_request(endpoint: str, method: str = 'GET', params: Dict[str, Any] = Non
             if response.status_code == 204:
                 return {}
             
-            return response.json()
+            return _response_json(response)
             
         except requests.exceptions.RequestException as e:
             logger.warning(f"API request attempt {attempt + 1} failed: {str(e)}")
@@ -262,19 +428,43 @@ def api_request(endpoint: str, method: str = 'GET', params: Dict[str, Any] = Non
             logger.error(f"Unexpected error in API request: {str(e)}")
             raise
 
+def _get_cached_system_value(cache: Dict, key) -> Tuple[bool, Any]:
+    """Return (hit, value) for a per-system cache entry that has not expired"""
+    with system_cache_lock:
+        entry = cache.get(key)
+        if entry and datetime.utcnow() < entry['expires_at']:
+            return True, entry['value']
+    return False, None
+
+def _set_cached_system_value(cache: Dict, key, value: Any):
+    """Store a per-system cache entry for SYSTEM_CACHE_TTL, pruning the cache when it is full"""
+    now = datetime.utcnow()
+    with system_cache_lock:
+        if len(cache) >= SYSTEM_CACHE_MAX_SIZE:
+            for expired_key in [k for k, entry in cache.items() if entry['expires_at'] <= now]:
+                del cache[expired_key]
+            if len(cache) >= SYSTEM_CACHE_MAX_SIZE:
+                cache.clear()
+        cache[key] = {'value': value, 'expires_at': now + SYSTEM_CACHE_TTL}
+
 def get_sunrise_sunset_data(system_id: str, target_date: datetime) -> Dict[str, str]:
-    """Get sunrise and sunset times for a system from DynamoDB"""
+    """Get sunrise and sunset times for a system from DynamoDB (cached per system and date)"""
     try:
         # Convert target_date to the required format (2025-06-30)
         date_str = target_date.strftime("%Y-%m-%d")
         
+        hit, cached_sun_data = _get_cached_system_value(_system_suntimes_cache, (system_id, date_str))
+        if hit:
+            return cached_sun_data
+        
         response = table.get_item(
             Key={
                 'PK': f'System#{system_id}',
                 'SK': f'DATA#DAILY#{date_str}'
-            }
+            },
+            ProjectionExpression='sunrise, sunset'
         )
-        logger.info('INSIDE SUN DATA RESPONSE', response)
+        logger.debug("Sun data response for system %s: %s", system_id, response)
         
         if 'Item' in response:
             item = response['Item']
@@ -283,7 +473,9 @@ def get_sunrise_sunset_data(system_id: str, target_date: datetime) -> Dict[str,
             
             if sunrise and sunset:
                 logger.info(f"Found sunrise/sunset for system {system_id} on {date_str}: {sunrise} - {sunset}")
-                return {'sunrise': sunrise, 'sunset': sunset}
+                sun_data = {'sunrise': sunrise, 'sunset': sunset}
+                _set_cached_system_value(_system_suntimes_cache, (system_id, date_str), sun_data)
+                return sun_data
             else:
                 logger.info(f"Sunrise/sunset fields missing for system {system_id} on {date_str}")
                 return {}
@@ -304,7 +496,8 @@ def get_suntimes(system_id: str, target_date: datetime) -> Dict[str, str]:
             Key={
                 'PK': f'System#{system_id}',
                 'SK': 'PROFILE'
-            }
+            },
+            ProjectionExpression='gpsData'
         )
         
         if 'Item' not in profile_response:
@@ -340,10 +533,10 @@ def get_suntimes(system_id: str, target_date: datetime) -> Dict[str, str]:
         enforce_weatherapi_rate_limit()
         
         logger.info(f"Calling WeatherAPI for system {system_id}")
-        response = requests.get(astronomy_url, params=astronomy_params, timeout=30)
+        response = http_session.get(astronomy_url, params=astronomy_params, timeout=30)
         response.raise_for_status()
         
-        data = response.json()
+        data = _response_json(response)
         
         # Extract sunrise and sunset times from WeatherAPI response
         if 'astronomy' not in data or 'astro' not in data['astronomy']:
@@ -378,11 +571,13 @@ def get_suntimes(system_id: str, target_date: datetime) -> Dict[str, str]:
             logger.error(f"Error storing sunrise/sunset data in DynamoDB for system {system_id}: {str(db_error)}")
             # Continue and return the data even if storage fails
         
-        # Return the sunrise/sunset times
-        return {
+        # Return the sunrise/sunset times (and let the other inverters of this system reuse them)
+        sun_data = {
             'sunrise': sunrise,
             'sunset': sunset
         }
+        _set_cached_system_value(_system_suntimes_cache, (system_id, date_str), sun_data)
+        return sun_data
         
     except requests.exceptions.RequestException as e:
         logger.error(f"API request error getting sun times for system {system_id}: {str(e)}")
@@ -391,53 +586,99 @@ def get_suntimes(system_id: str, target_date: datetime) -> Dict[str, str]:
         logger.error(f"Error getting sun times for system {system_id}: {str(e)}")
         return {}
 
-def is_daylight_saving_time(dt: datetime) -> bool:
-    """Determine if a given datetime falls within US daylight saving time period"""
-    year = dt.year
-    
-    # DST starts on the second Sunday in March
-    march_first = datetime(year, 3, 1)
-    march_first_weekday = march_first.weekday()  # Monday = 0, Sunday = 6
-    days_until_first_sunday = (6 - march_first_weekday) % 7
-    first_sunday_march = march_first + timedelta(days=days_until_first_sunday)
-    second_sunday_march = first_sunday_march + timedelta(days=7)
-    dst_start = second_sunday_march.replace(hour=2)  # 2 AM
-    
-    # DST ends on the first Sunday in November
-    nov_first = datetime(year, 11, 1)
-    nov_first_weekday = nov_first.weekday()
-    days_until_first_sunday = (6 - nov_first_weekday) % 7
-    first_sunday_nov = nov_first + timedelta(days=days_until_first_sunday)
-    dst_end = first_sunday_nov.replace(hour=2)  # 2 AM
-    
-    return dst_start <= dt < dst_end
-
 def get_system_timezone(pv_system_id: str) -> Optional[str]:
-    """Get timezone for a system from DynamoDB system profile"""
+    """Get timezone for a system from DynamoDB system profile (cached per system)"""
+    hit, cached_timezone = _get_cached_system_value(_system_tz_cache, pv_system_id)
+    if hit:
+        return cached_timezone
+    
     try:
         response = table.get_item(
             Key={
                 'PK': f'System#{pv_system_id}',
                 'SK': 'PROFILE'
-            }
+            },
+            ProjectionExpression='timeZone'
         )
         
+        timezone = None
         if 'Item' in response:
             timezone = response['Item'].get('timeZone')
             if timezone:
                 logger.debug(f"Found timezone {timezone} for system {pv_system_id}")
-                return timezone
             else:
                 logger.warning(f"No timezone found in profile for system {pv_system_id}")
-                return None
+                timezone = None
         else:
             logger.warning(f"No profile found for system {pv_system_id}")
-            return None
+        
+        # Missing timezones are cached too; read errors are not
+        _set_cached_system_value(_system_tz_cache, pv_system_id, timezone)
+        return timezone
             
     except Exception as e:
         logger.error(f"Error getting timezone for system {pv_system_id}: {str(e)}")
         return None
 
+def _seconds_of_day(value: dt_time) -> int:
+    """Seconds since midnight for a wall-clock time"""
+    return value.hour * 3600 + value.minute * 60 + value.second
+
+def _format_seconds_of_day(seconds: int) -> str:
+    """HH:MM for a seconds-since-midnight value (for logs)"""
+    return f"{seconds // 3600:02d}:{seconds // 60 % 60:02d}"
+
+def compute_moon_bounds(sunrise_str: str, sunset_str: str) -> Tuple[int, int]:
+    """Return (moon_start, moon_end) as seconds since local midnight:
+    1 hour before sunset and 1 hour after sunrise
+    Parsed once per sunrise/sunset pair and shared by every inverter of the system"""
+    hit, bounds = _get_cached_system_value(_moon_bounds_cache, (sunrise_str, sunset_str))
+    if hit:
+        return bounds
+    
+    # Parse sunrise and sunset times (format: "05:22 AM" or "08:50 PM")
+    sunrise_time = datetime.strptime(sunrise_str, "%I:%M %p").time()
+    sunset_time = datetime.strptime(sunset_str, "%I:%M %p").time()
+    
+    # Moon time boundaries
+    moon_start = (_seconds_of_day(sunset_time) - 3600) % 86400  # 1 hour before sunset
+    moon_end = (_seconds_of_day(sunrise_time) + 3600) % 86400   # 1 hour after sunrise
+    
+    bounds = (moon_start, moon_end)
+    _set_cached_system_value(_moon_bounds_cache, (sunrise_str, sunset_str), bounds)
+    return bounds
+
+def is_within_moon_bounds(moon_bounds: Tuple[int, int], system_timezone: Optional[str] = None) -> bool:
+    """Check the current time in the system timezone against pre-computed compute_moon_bounds values"""
+    moon_start, moon_end = moon_bounds
+    
+    # Get current time in the system's timezone
+    if system_timezone and ZoneInfo:
+        try:
+            # zoneinfo handles DST transitions for any IANA timezone
+            current_time_in_system_tz = datetime.now(ZoneInfo(system_timezone)).time()
+            logger.debug(f"Current time in {system_timezone}: {current_time_in_system_tz}")
+        except Exception as tz_error:
+            logger.warning(f"Error converting to timezone {system_timezone}: {tz_error}. Using server local time.")
+            current_time_in_system_tz = datetime.now().time()
+    elif system_timezone:
+        # zoneinfo needs Python 3.9+ (and tzdata where the OS has no tz database, as on Lambda)
+        logger.warning(f"zoneinfo unavailable, ignoring timezone {system_timezone} and using server local time")
+        current_time_in_system_tz = datetime.now().time()
+    else:
+        # Fallback to server local time if no timezone provided
+        logger.warning("No system timezone provided, using server local time")
+        current_time_in_system_tz = datetime.now().time()
+    
+    # Check if current time is in moon time period
+    # Moon time is AFTER (sunset-1h) OR BEFORE (sunrise+1h)
+    # This typically crosses midnight (e.g., after 5 PM or before 7 AM)
+    now_seconds = _seconds_of_day(current_time_in_system_tz)
+    is_moon = now_seconds >= moon_start or now_seconds <= moon_end
+    
+    logger.info(f"Moon time check for timezone {system_timezone}: {current_time_in_system_tz} after {_format_seconds_of_day(moon_start)} (sunset-1h) OR before {_format_seconds_of_day(moon_end)} (sunrise+1h) = {is_moon}")
+    return is_moon
+
 def is_moon_time(sunrise_str: str, sunset_str: str, system_timezone: Optional[str] = None) -> bool:
     """Check if current time in system timezone is AFTER 1 hour before sunset OR BEFORE 1 hour after sunrise
     
@@ -452,100 +693,42 @@ def is_moon_time(sunrise_str: str, sunset_str: str, system_timezone: Optional[st
         system_timezone: Timezone string like "America/New_York" or "America/Chicago"
     """
     try:
-        # Parse sunrise and sunset times (format: "05:22 AM" or "08:50 PM")
-        sunrise_time = datetime.strptime(sunrise_str, "%I:%M %p")
-        sunset_time = datetime.strptime(sunset_str, "%I:%M %p")
-        
-        # Moon time boundaries
-        moon_start = (sunset_time - timedelta(hours=1)).time()  # 1 hour before sunset
-        moon_end = (sunrise_time + timedelta(hours=1)).time()   # 1 hour after sunrise
-        
-        # Get current time in the system's timezone
-        if system_timezone:
-            try:
-                # Manual timezone conversion for the two supported timezones
-                utc_now = datetime.utcnow()
-                is_dst = is_daylight_saving_time(utc_now)
-                
-                if system_timezone == "America/New_York":
-                    # Eastern Time: UTC-5 (EST) or UTC-4 (EDT)
-                    offset_hours = 4 if is_dst else 5
-                    current_time_in_system_tz = (utc_now - timedelta(hours=offset_hours)).time()
-                    tz_name = "EDT" if is_dst else "EST"
-                    logger.debug(f"Current time in {system_timezone} ({tz_name}): {current_time_in_system_tz}")
-                elif system_timezone == "America/Chicago":
-                    # Central Time: UTC-6 (CST) or UTC-5 (CDT)
-                    offset_hours = 5 if is_dst else 6
-                    current_time_in_system_tz = (utc_now - timedelta(hours=offset_hours)).time()
-                    tz_name = "CDT" if is_dst else "CST"
-                    logger.debug(f"Current time in {system_timezone} ({tz_name}): {current_time_in_system_tz}")
-                else:
-                    logger.warning(f"Unknown timezone {system_timezone}, using server local time")
-                    current_time_in_system_tz = datetime.now().time()
-                    
-            except Exception as tz_error:
-                logger.warning(f"Error converting to timezone {system_timezone}: {tz_error}. Using server local time.")
-                current_time_in_system_tz = datetime.now().time()
-        else:
-            # Fallback to server local time if no timezone provided
-            logger.warning("No system timezone provided, using server local time")
-            current_time_in_system_tz = datetime.now().time()
-        
-        # Check if current time is in moon time period
-        # Moon time is AFTER (sunset-1h) OR BEFORE (sunrise+1h)
-        # This typically crosses midnight (e.g., after 5 PM or before 7 AM)
-        is_moon = current_time_in_system_tz >= moon_start or current_time_in_system_tz <= moon_end
-        
-        logger.info(f"Moon time check for timezone {system_timezone}: {current_time_in_system_tz} after {moon_start} (sunset-1h) OR before {moon_end} (sunrise+1h) = {is_moon}")
-        
-        logger.debug(f"Moon time boundaries: starts at {moon_start} (sunset-1h), ends at {moon_end} (sunrise+1h)")
         logger.debug(f"Original times: sunrise={sunrise_str}, sunset={sunset_str}")
-        return is_moon
+        return is_within_moon_bounds(compute_moon_bounds(sunrise_str, sunset_str), system_timezone)
         
     except Exception as e:
         logger.error(f"Error checking moon time with sunrise={sunrise_str}, sunset={sunset_str}, timezone={system_timezone}: {str(e)}")
         return False  # Default to daylight time if there's an error
 
+def _inverters_from_items(items: List[Dict[str, Any]]) -> List[InverterMetadata]:
+    """Build the inverters of one page of Inverter# STATUS rows"""
+    inverters = []
+    for item in items:
+        device_id = item.get('device_id', '')
+        pv_system_id = item.get('pvSystemId', '')
+        
+        if device_id and pv_system_id:
+            inverters.append(InverterMetadata(
+                pv_system_id=pv_system_id,
+                device_id=device_id
+            ))
+    return inverters
 
+def iter_inverter_pages() -> Iterator[List[InverterMetadata]]:
+    """Yield inverters one DynamoDB page at a time, so callers can start on a page while the next is read"""
+    # Query only the Inverter# STATUS rows through the SK-PK index
+    pages = iter_sk_pk_pages(
+        table, INVERTER_STATUS_KEY_CONDITION, INVERTER_STATUS_FILTER,
+        total_segments=SCAN_SEGMENTS,
+        ProjectionExpression=INVERTER_PROJECTION
+    )
+    for items in pages:
+        yield _inverters_from_items(items)
 
 def get_all_inverters() -> List[InverterMetadata]:
     """Get all inverters from DynamoDB"""
     try:
-        # Query for all inverter status records (PK begins with "Inverter#" and SK = "STATUS")
-        response = table.scan(
-            FilterExpression=boto3.dynamodb.conditions.Attr('PK').begins_with('Inverter#') & 
-                           boto3.dynamodb.conditions.Attr('SK').eq('STATUS')
-        )
-        
-        inverters = []
-        for item in response.get('Items', []):
-            # Extract device ID from PK (remove "Inverter<" prefix and ">" suffix)
-            device_id = item.get('device_id', '')
-            pv_system_id = item.get('pvSystemId', '')
-            
-            if device_id and pv_system_id:
-                inverters.append(InverterMetadata(
-                    pv_system_id=pv_system_id,
-                    device_id=device_id
-                ))
-        while 'LastEvaluatedKey' in response:
-            response = table.scan(
-                ExclusiveStartKey=response['LastEvaluatedKey'],
-                FilterExpression=boto3.dynamodb.conditions.Attr('PK').begins_with('Inverter#') & 
-                            boto3.dynamodb.conditions.Attr('SK').eq('STATUS')
-            )
-            for item in response.get('Items', []):
-                # Extract device ID from PK (remove "Inverter<" prefix and ">" suffix)
-                device_id = item.get('device_id', '')
-                pv_system_id = item.get('pvSystemId', '')
-                
-                if device_id and pv_system_id:
-                    inverters.append(InverterMetadata(
-                        pv_system_id=pv_system_id,
-                        device_id=device_id
-                    ))
-       
-        
+        inverters = list(chain.from_iterable(iter_inverter_pages()))
         logger.info(f"Found {len(inverters)} inverters from DynamoDB")
         return inverters
         
@@ -553,54 +736,54 @@ def get_all_inverters() -> List[InverterMetadata]:
         logger.error(f"Failed to get inverters from DynamoDB: {str(e)}")
         return []
 
-def get_device_flowdata(pv_system_id: str, device_id: str) -> Dict[str, Any]:
-    """Get current power and online status for a device with retry logic for null data"""
+def get_device_flowdata(pv_system_id: str, device_id: str, attempt: int = 1) -> Tuple[Dict[str, Any], Optional[float]]:
+    """Get current power and online status for a device with one API call
+    An online device with null data is retried up to FLOWDATA_MAX_ATTEMPTS times; instead of
+    sleeping here, the retry delay (exponential backoff with jitter) is returned for the caller to wait out.
+    Returns (response, retry_delay); retry_delay is None once the response is final"""
     try:
         endpoint = f'pvsystems/{pv_system_id}/devices/{device_id}/flowdata'
-        max_attempts = 5
-        
-        for attempt in range(1, max_attempts + 1):
-            # Make API call
-            if attempt == 1:
-                logger.info(f"Making initial API call for device {device_id}")
-                response = api_request(endpoint)
-                logger.info(f"FLOW DATA FOR DEVICE {device_id}")
-            else:
-                logger.info(f"Making retry API call {attempt - 1} for device {device_id}")
-                response = api_request(endpoint)
-                logger.info(f"FLOW DATA RETRY {attempt - 1} FOR DEVICE {device_id}")
-            
-            # Log the API response
-            logger.info(f"Complete API Response: {json.dumps(response, indent=2, default=str)}")
-            
-            # Check if we need to retry
-            status_data = response.get('status') if response else None
-            is_online = status_data.get('isOnline', False) if status_data else False
-            data_section = response.get('data') if response else None
-            
-            # If device is online but data is null, retry (unless this is the last attempt)
-            if is_online and data_section is None and attempt < max_attempts:
-                logger.info(f"Device {device_id} is online but data is null, retrying in 1 second (attempt {attempt}/{max_attempts})")
-                time.sleep(2)
-                continue
-            else:
-                # Either we have valid data, device is offline, or we've exhausted retries
-                if is_online and data_section is not None:
-                    logger.info(f"Got valid data on attempt {attempt} for device {device_id}")
-                elif is_online and data_section is None:
-                    logger.info(f"Device {device_id} still has null data after {max_attempts} attempts, treating as offline")
-                else:
-                    logger.info(f"Device {device_id} is offline (isOnline: {is_online}) on attempt {attempt}")
-                
-                return response
+        max_attempts = FLOWDATA_MAX_ATTEMPTS
         
-        # This shouldn't be reached, but just in case
-        logger.warning(f"Unexpected end of retry loop for device {device_id}")
-        return {}
+        # Make API call
+        if attempt == 1:
+            logger.info(f"Making initial API call for device {device_id}")
+            response = api_request(endpoint)
+            logger.info(f"FLOW DATA FOR DEVICE {device_id}")
+        else:
+            logger.info(f"Making retry API call {attempt - 1} for device {device_id}")
+            response = api_request(endpoint)
+            logger.info(f"FLOW DATA RETRY {attempt - 1} FOR DEVICE {device_id}")
+        
+        # Log the API response (serialized only when DEBUG is enabled)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("API Response: %s", json.dumps(response, default=str))
+        
+        # Check if we need to retry
+        status_data = response.get('status') if response else None
+        is_online = status_data.get('isOnline', False) if status_data else False
+        data_section = response.get('data') if response else None
+        
+        # If device is online but data is null, retry (unless this is the last attempt)
+        if is_online and data_section is None and attempt < max_attempts:
+            # Exponential backoff with jitter so retried devices don't hit the API in lockstep
+            delay = FLOWDATA_BASE_BACKOFF * (2 ** (attempt - 1)) + random.uniform(0, FLOWDATA_BASE_BACKOFF / 2)
+            logger.info(f"Device {device_id} is online but data is null, retrying in {delay:.2f}s (attempt {attempt}/{max_attempts})")
+            return response, delay
+        
+        # Either we have valid data, device is offline, or we've exhausted retries
+        if is_online and data_section is not None:
+            logger.info(f"Got valid data on attempt {attempt} for device {device_id}")
+        elif is_online and data_section is None:
+            logger.info(f"Device {device_id} still has null data after {max_attempts} attempts, treating as offline")
+        else:
+            logger.info(f"Device {device_id} is offline (isOnline: {is_online}) on attempt {attempt}")
+        
+        return response, None
         
     except Exception as e:
         logger.error(f"Failed to get flowdata for device {device_id} in system {pv_system_id}: {str(e)}")
-        return {}
+        return {}, None
 
 def get_device_messages(pv_system_id: str, device_id: str, from_timestamp: str) -> Dict[str, Any]:
     """Get error messages for a device from a specific timestamp"""
@@ -617,6 +800,16 @@ def get_device_messages(pv_system_id: str, device_id: str, from_timestamp: str)
         logger.error(f"Failed to get messages for device {device_id} in system {pv_system_id}: {str(e)}")
         return {}
 
+def _default_device_status() -> Dict[str, Any]:
+    """Status assumed for a device with no STATUS row yet"""
+    return {
+        'status': 'green',
+        'reason': '',
+        'lastUpdated': None,
+        'lastStatusChangeTime': None,
+        'power': 0
+    }
+
 def get_device_status_from_db(device_id: str) -> Dict[str, Any]:
     """Get existing device status from DynamoDB"""
     try:
@@ -624,55 +817,146 @@ def get_device_status_from_db(device_id: str) -> Dict[str, Any]:
             Key={
                 'PK': f'Inverter#{device_id}',
                 'SK': 'STATUS'
-            }
+            },
+            ProjectionExpression=DEVICE_STATUS_PROJECTION,
+            ExpressionAttributeNames=DEVICE_STATUS_ATTRIBUTE_NAMES
         )
         
         if 'Item' in response:
             return response['Item']
         else:
-            return {
-                'status': 'green',
-                'reason': '',
-                'lastUpdated': None,
-                'lastStatusChangeTime': None,
-                'power': 0
-            }
+            return _default_device_status()
             
     except Exception as e:
         logger.error(f"Error getting device status for {device_id}: {str(e)}")
-        return {
-            'status': 'green',
-            'reason': '',
-            'lastUpdated': None,
-            'lastStatusChangeTime': None,
-            'power': 0
+        return _default_device_status()
+
+def get_device_statuses_from_db(device_ids: List[str]) -> Tuple[Dict[str, Dict[str, Any]], Set[str]]:
+    """Get existing STATUS rows for many devices with BatchGetItem (100 keys per request)
+    Returns (statuses, unread): devices without a row are absent from statuses; devices whose
+    keys could not be read (request error, or still unprocessed after the retries) are in unread"""
+    statuses = {}
+    unread = set()
+    table_name = table.name
+    
+    for start in range(0, len(device_ids), BATCH_GET_SIZE):
+        # Devices whose keys have not been answered yet
+        pending = set(device_ids[start:start + BATCH_GET_SIZE])
+        request_items = {
+            table_name: {
+                'Keys': [{'PK': f'Inverter#{device_id}', 'SK': 'STATUS'} for device_id in pending],
+                'ProjectionExpression': DEVICE_STATUS_PROJECTION,
+                'ExpressionAttributeNames': DEVICE_STATUS_ATTRIBUTE_NAMES
+            }
         }
+        
+        try:
+            for attempt in range(MAX_RETRIES + 1):
+                response = dynamodb.batch_get_item(RequestItems=request_items)
+                for item in response.get('Responses', {}).get(table_name, []):
+                    statuses[item['PK'][len('Inverter#'):]] = item
+                
+                # Retry throttled keys with exponential backoff
+                request_items = response.get('UnprocessedKeys') or {}
+                pending = {
+                    key['PK'][len('Inverter#'):]
+                    for key in request_items.get(table_name, {}).get('Keys', [])
+                }
+                if not pending:
+                    break
+                if attempt < MAX_RETRIES:
+                    time.sleep(min(0.05 * 2 ** attempt, 2))
+                
+        except Exception as e:
+            logger.error(f"Error batch getting device statuses {start}-{start + BATCH_GET_SIZE}: {str(e)}")
+        
+        unread |= pending
+    
+    if unread:
+        logger.warning(f"Could not batch read {len(unread)} device statuses; they will be read individually")
+    logger.info(f"Pre-loaded {len(statuses)}/{len(device_ids)} device statuses")
+    return statuses, unread
+
+def build_status_item(device_id: str, pv_system_id: str, status: str, power: float, reason: str,
+                      last_status_change_time: str, now: str) -> Dict[str, Any]:
+    """Build a full STATUS row for a batched put"""
+    return {
+        'PK': f'Inverter#{device_id}',
+        'SK': 'STATUS',
+        'pvSystemId': pv_system_id,
+        'device_id': device_id,
+        'status': status,
+        'reason': reason,
+        'power': Decimal(power).quantize(POWER_QUANTUM),  # Convert float to Decimal for DynamoDB without a str round trip
+        'lastStatusChangeTime': last_status_change_time,  # Only update if status actually changed
+        'lastUpdated': now  # Always update this timestamp
+    }
 
-def update_device_status_in_db(device_id: str, pv_system_id: str, status: str, power: float, reason: str, status_changed: bool = False) -> bool:
-    """Update device status in DynamoDB"""
+def update_device_status_in_db(device_id: str, pv_system_id: str, status: str, power: float, reason: str, status_changed: bool = False,
+                               existing_record: Optional[Dict[str, Any]] = None, write_buffer: Optional[List[Dict[str, Any]]] = None,
+                               stats: Optional[Dict[str, int]] = None) -> bool:
+    """Update device status in DynamoDB
+    Written directly with a single UpdateItem; with write_buffer, the full item is queued for a
+    batched write instead (flushed by whichever worker fills a batch of 25), using existing_record
+    (the already-loaded STATUS row) to keep lastStatusChangeTime when the status is unchanged.
+    A failed batch flush counts an error in stats for every row in the batch, since the other
+    devices in it have already returned; the flushing device then returns True like them"""
     try:
         now = datetime.utcnow().isoformat()
         
-        # Get existing record to preserve lastStatusChangeTime if status didn't change
-        if not status_changed:
-            existing_record = get_device_status_from_db(device_id)
-            last_status_change_time = existing_record.get('lastStatusChangeTime', now)
+        if write_buffer is not None:
+            # Preserve lastStatusChangeTime if status didn't change
+            if not status_changed:
+                if existing_record is None:
+                    existing_record = get_device_status_from_db(device_id)
+                last_status_change_time = existing_record.get('lastStatusChangeTime') or now
+            else:
+                last_status_change_time = now
+            
+            status_item = build_status_item(device_id, pv_system_id, status, power, reason, last_status_change_time, now)
+            with status_writes_lock:
+                write_buffer.append(status_item)
+                ready = None
+                if len(write_buffer) >= STATUS_WRITE_BATCH_SIZE:
+                    ready = write_buffer[:]
+                    write_buffer.clear()
+            
+            if ready and not flush_status_writes(ready):
+                if stats is None:
+                    return False
+                update_stats_thread_safe(stats, 'errors', len(ready))
         else:
-            last_status_change_time = now
-        
-        status_item = {
-            'PK': f'Inverter#{device_id}',
-            'SK': 'STATUS',
-            'pvSystemId': pv_system_id,
-            'device_id': device_id,
-            'status': status,
-            'reason': reason,
-            'power': Decimal(str(power)),  # Convert float to Decimal for DynamoDB
-            'lastStatusChangeTime': last_status_change_time,  # Only update if status actually changed
-            'lastUpdated': now  # Always update this timestamp
-        }
+            # lastStatusChangeTime is resolved server-side, so no read is needed first
+            last_status_change = ':now' if status_changed else 'if_not_exists(#lastStatusChangeTime, :now)'
+            table.update_item(
+                Key={
+                    'PK': f'Inverter#{device_id}',
+                    'SK': 'STATUS'
+                },
+                UpdateExpression=(
+                    'SET #pvSystemId = :pvSystemId, #device_id = :device_id, #status = :status, '
+                    '#reason = :reason, #power = :power, #lastUpdated = :now, '
+                    f'#lastStatusChangeTime = {last_status_change}'
+                ),
+                ExpressionAttributeNames={
+                    '#pvSystemId': 'pvSystemId',
+                    '#device_id': 'device_id',
+                    '#status': 'status',
+                    '#reason': 'reason',
+                    '#power': 'power',
+                    '#lastUpdated': 'lastUpdated',
+                    '#lastStatusChangeTime': 'lastStatusChangeTime'
+                },
+                ExpressionAttributeValues={
+                    ':pvSystemId': pv_system_id,
+                    ':device_id': device_id,
+                    ':status': status,
+                    ':reason': reason,
+                    ':power': Decimal(power).quantize(POWER_QUANTUM),
+                    ':now': now
+                }
+            )
         
-        table.put_item(Item=status_item)
         if status_changed:
             logger.info(f"✅ Status changed for device {device_id} to {status} (reason: {reason})")
         else:
@@ -683,79 +967,99 @@ def update_device_status_in_db(device_id: str, pv_system_id: str, status: str, p
         logger.error(f"❌ Error updating status for device {device_id}: {str(e)}")
         return False
 
-def send_device_status_change_sns(device_id: str, pv_system_id: str, new_status: str, previous_status: str, power: float, new_reason: str, previous_reason: str, sunrise_time: str = None, sunset_time: str = None, timezone: str = None, flow_data: Dict[str, Any] = None) -> bool:
-    """Send SNS message for device status change"""
+def flush_status_writes(status_items: List[Dict[str, Any]]) -> bool:
+    """Write the queued STATUS items with BatchWriteItem (boto3 chunks to 25 and retries unprocessed items)"""
     try:
-        message = {
-            "deviceId": device_id,
-            "pvSystemId": pv_system_id,
-            "newStatus": new_status,
-            "previousStatus": previous_status,
-            "newReason": new_reason,
-            "previousReason": previous_reason,
-            "timestamp": datetime.utcnow().isoformat(),
-            "power": power,
-            "sunrise_time": sunrise_time,
-            "sunset_time": sunset_time,
-            "timezone": timezone,
-            "flow_data": flow_data,
-            "type": "Status Changed"
-        }
+        with table.batch_writer() as batch:
+            for status_item in status_items:
+                batch.put_item(Item=status_item)
+        logger.info(f"✅ Wrote {len(status_items)} device statuses in batches")
+        return True
         
-        # Build message attributes
-        message_attributes = {
-            'source': {
-                'DataType': 'String',
-                'StringValue': 'device-status-polling-script'
-            },
-            'deviceId': {
-                'DataType': 'String',
-                'StringValue': device_id
-            },
-            'systemId': {
-                'DataType': 'String',
-                'StringValue': pv_system_id
-            },
-            'statusChange': {
-                'DataType': 'String',
-                'StringValue': f'{previous_status}-{new_status}'
-            }
+    except Exception as e:
+        logger.error(f"❌ Error batch writing {len(status_items)} device statuses: {str(e)}")
+        return False
+
+def build_status_change_entry(device_id: str, pv_system_id: str, new_status: str, previous_status: str, power: float, new_reason: str, previous_reason: str, sunrise_time: str = None, sunset_time: str = None, timezone: str = None, flow_data: Dict[str, Any] = None) -> Dict[str, Any]:
+    """Build the SNS message (Subject, Message, MessageAttributes) for a device status change"""
+    message = {
+        "deviceId": device_id,
+        "pvSystemId": pv_system_id,
+        "newStatus": new_status,
+        "previousStatus": previous_status,
+        "newReason": new_reason,
+        "previousReason": previous_reason,
+        "timestamp": datetime.utcnow().isoformat(),
+        "power": power,
+        "sunrise_time": sunrise_time,
+        "sunset_time": sunset_time,
+        "timezone": timezone,
+        "flow_data": flow_data,
+        "type": "Status Changed"
+    }
+    
+    # Build message attributes
+    message_attributes = {
+        'source': {
+            'DataType': 'String',
+            'StringValue': 'device-status-polling-script'
+        },
+        'deviceId': {
+            'DataType': 'String',
+            'StringValue': device_id
+        },
+        'systemId': {
+            'DataType': 'String',
+            'StringValue': pv_system_id
+        },
+        'statusChange': {
+            'DataType': 'String',
+            'StringValue': f'{previous_status}-{new_status}'
         }
-        
-        # Add sunrise_time if provided
-        if sunrise_time:
-            message_attributes['sunrise_time'] = {
-                'DataType': 'String',
-                'StringValue': sunrise_time
-            }
-        
-        # Add sunset_time if provided
-        if sunset_time:
-            message_attributes['sunset_time'] = {
-                'DataType': 'String',
-                'StringValue': sunset_time
-            }
-        
-        # Add timezone if provided
-        if timezone:
-            message_attributes['timezone'] = {
-                'DataType': 'String',
-                'StringValue': timezone
-            }
-        
-        # Add flow_data if provided
-        if flow_data:
-            message_attributes['flow_data'] = {
-                'DataType': 'String',
-                'StringValue': json.dumps(flow_data, default=str)
-            }
-        
-        response = sns.publish(
-            TopicArn=SNS_TOPIC_ARN,
-            Subject=f"Solar Inverter Status Change - {device_id}",
-            Message=json.dumps(message),
-            MessageAttributes=message_attributes
+    }
+    
+    # Add sunrise_time if provided
+    if sunrise_time:
+        message_attributes['sunrise_time'] = {
+            'DataType': 'String',
+            'StringValue': sunrise_time
+        }
+    
+    # Add sunset_time if provided
+    if sunset_time:
+        message_attributes['sunset_time'] = {
+            'DataType': 'String',
+            'StringValue': sunset_time
+        }
+    
+    # Add timezone if provided
+    if timezone:
+        message_attributes['timezone'] = {
+            'DataType': 'String',
+            'StringValue': timezone
+        }
+    
+    # Add flow_data if provided
+    if flow_data:
+        message_attributes['flow_data'] = {
+            'DataType': 'String',
+            'StringValue': json.dumps(flow_data, default=str)
+        }
+    
+    return {
+        'Subject': f"Solar Inverter Status Change - {device_id}",
+        'Message': json.dumps(message),
+        'MessageAttributes': message_attributes
+    }
+
+def send_device_status_change_sns(device_id: str, pv_system_id: str, new_status: str, previous_status: str, power: float, new_reason: str, previous_reason: str, sunrise_time: str = None, sunset_time: str = None, timezone: str = None, flow_data: Dict[str, Any] = None) -> bool:
+    """Send SNS message for device status change"""
+    try:
+        entry = build_status_change_entry(
+            device_id, pv_system_id, new_status, previous_status, power, new_reason, previous_reason,
+            sunrise_time=sunrise_time, sunset_time=sunset_time, timezone=timezone, flow_data=flow_data
         )
+        response = sns.publish(TopicArn=SNS_TOPIC_ARN, **entry)
         
         logger.info(f"✅ Sent SNS status change notification for device {device_id}: {previous_status} → {new_status} (reason: {new_reason}). Message ID: {response['MessageId']}")
         return True
@@ -764,19 +1068,147 @@ def send_device_status_change_sns(device_id: str, pv_system_id: str, new_status:
         logger.error(f"❌ Error sending SNS message for device {device_id}: {str(e)}")
         return False
 
-def process_device_status(inverter: InverterMetadata, target_date: datetime, stats: Dict[str, int]) -> bool:
-    """Process status for a single inverter device - New Workflow Logic"""
+def _entry_size(entry: Dict[str, Any]) -> int:
+    """Approximate size of a publish batch entry (message plus attribute names and values)"""
+    return len(entry['Message'].encode()) + sum(
+        len(name) + len(attribute['StringValue'].encode()) for name, attribute in entry['MessageAttributes'].items()
+    )
+
+def publish_status_changes(entries: List[Dict[str, Any]], stats: Dict[str, int]):
+    """Publish buffered status change entries with PublishBatch
+    (at most 10 entries and 256 KB per request)"""
+    batches = []
+    batch, batch_size = [], 0
+    for entry in entries:
+        size = _entry_size(entry)
+        if batch and (len(batch) == SNS_BATCH_SIZE or batch_size + size > SNS_BATCH_MAX_BYTES):
+            batches.append(batch)
+            batch, batch_size = [], 0
+        batch.append(entry)
+        batch_size += size
+    if batch:
+        batches.append(batch)
+    
+    for batch in batches:
+        _publish_status_change_batch(batch, stats)
+
+def _publish_status_change_batch(batch: List[Dict[str, Any]], stats: Dict[str, int]):
+    """Publish one batch of entries; entries that failed on SNS's side are retried once"""
+    for attempt in range(2):
+        # Batch entry ids only need to be unique within the request
+        request_entries = [{'Id': str(index), **entry} for index, entry in enumerate(batch)]
+        try:
+            response = sns.publish_batch(TopicArn=SNS_TOPIC_ARN, PublishBatchRequestEntries=request_entries)
+        except Exception as e:
+            logger.error(f"❌ Error publishing {len(batch)} SNS status change notifications: {str(e)}")
+            if attempt == 0:
+                continue
+            update_stats_thread_safe(stats, 'errors', len(batch))
+            return
+        
+        successful = len(response.get('Successful', []))
+        update_stats_thread_safe(stats, 'status_changes', successful)
+        logger.info(f"✅ Published {successful}/{len(batch)} SNS status change notifications")
+        
+        # Sender faults (bad entries) will fail again; only SNS-side failures are retried
+        retryable = []
+        for failed in response.get('Failed', []):
+            logger.error(f"❌ SNS rejected status change notification {failed.get('Id')}: {failed.get('Code')} {failed.get('Message', '')}")
+            if failed.get('SenderFault') or attempt == 1:
+                update_stats_thread_safe(stats, 'errors')
+            else:
+                retryable.append(batch[int(failed['Id'])])
+        
+        if not retryable:
+            return
+        batch = retryable
+
+def flush_status_changes(changes: List[Tuple[Dict[str, Any], Dict[str, Any]]], stats: Dict[str, int]):
+    """Write the changed STATUS rows in one batch, then publish their notifications
+    Notifications are only sent once the new statuses are stored"""
+    if not flush_status_writes([status_item for status_item, _ in changes]):
+        update_stats_thread_safe(stats, 'errors', len(changes))
+        return
+    
+    publish_status_changes([entry for _, entry in changes], stats)
+
+def queue_status_change(status_item: Dict[str, Any], entry: Dict[str, Any],
+                        sns_buffer: List[Tuple[Dict[str, Any], Dict[str, Any]]], stats: Dict[str, int]):
+    """Add a changed STATUS row and its notification to sns_buffer; whichever worker fills a batch flushes it"""
+    with sns_buffer_lock:
+        sns_buffer.append((status_item, entry))
+        if len(sns_buffer) < SNS_BATCH_SIZE:
+            return
+        ready = sns_buffer[:]
+        sns_buffer.clear()
+    
+    flush_status_changes(ready, stats)
+
+def get_system_context(pv_system_id: str, target_date: datetime) -> Tuple[Dict[str, str], Optional[str], Optional[Tuple[int, int]]]:
+    """Get a system's sunrise/sunset data (from DynamoDB, else WeatherAPI), timezone and moon time bounds"""
+    # Get sunrise/sunset data for daylight hours check
+    sun_data = get_sunrise_sunset_data(pv_system_id, target_date)
+    logger.info(f"Sun data: {sun_data}")
+    if sun_data == {}:
+        sun_data = get_suntimes(pv_system_id, target_date)
+        logger.info(f"New Sun data: {sun_data}")
+    
+    # Parse the moon time bounds once for all of the system's inverters
+    moon_bounds = None
+    if sun_data and 'sunrise' in sun_data and 'sunset' in sun_data:
+        try:
+            moon_bounds = compute_moon_bounds(sun_data['sunrise'], sun_data['sunset'])
+        except ValueError as e:
+            logger.error(f"Error parsing sunrise={sun_data['sunrise']}, sunset={sun_data['sunset']} for system {pv_system_id}: {str(e)}")
+    
+    # Get system timezone for accurate time comparison
+    return sun_data, get_system_timezone(pv_system_id), moon_bounds
+
+def process_device_status(inverter: InverterMetadata, target_date: datetime, stats: Dict[str, int],
+                          current_status_data: Optional[Dict[str, Any]] = None,
+                          write_buffer: Optional[List[Dict[str, Any]]] = None,
+                          sns_buffer: Optional[List[Tuple[Dict[str, Any], Dict[str, Any]]]] = None,
+                          error_codes: Optional[Dict[int, str]] = None,
+                          system_context: Optional[Future] = None,
+                          flowdata_retries: Optional[List[Tuple[float, int, InverterMetadata, int, Dict[str, Any]]]] = None,
+                          flowdata_attempt: int = 1) -> Tuple[Optional[bool], Counter]:
+    """Process status for a single inverter device - New Workflow Logic
+    current_status_data is the pre-loaded STATUS row; it is read from DynamoDB when not given.
+    error_codes is the error code → colour map pre-loaded for the run; looked up (cached) when empty.
+    system_context is the system's shared get_system_context future; submitted here when not given.
+    Unchanged statuses are queued on write_buffer, and status changes with their notifications
+    on sns_buffer (written and published in batches), when they are given.
+    When flowdata_retries is given, a flowdata retry is pushed onto it as (ready_at, sequence, inverter,
+    next attempt, current_status_data) for the caller to resubmit, rather than waited for on this worker.
+    Returns (success, local_stats), with success None when the device was deferred; the device's
+    counters are merged into stats by the caller"""
+    local_stats = Counter()
     try:
         logger.info(f"Processing status for device: {inverter.device_id} (System: {inverter.pv_system_id})")
         
         # Get current device status from DynamoDB
-        current_status_data = get_device_status_from_db(inverter.device_id)
+        if current_status_data is None:
+            current_status_data = get_device_status_from_db(inverter.device_id)
         current_status = current_status_data.get('status', 'green')
         current_reason = current_status_data.get('reason', '')
         last_updated = current_status_data.get('lastUpdated')
         
+        # Look up the system's sun times and timezone alongside the flowdata request
+        if system_context is None:
+            system_context = system_lookup_executor.submit(get_system_context, inverter.pv_system_id, target_date)
+        
         # Get flowdata to check online status and power
-        flowdata = get_device_flowdata(inverter.pv_system_id, inverter.device_id)
+        flowdata, retry_delay = get_device_flowdata(inverter.pv_system_id, inverter.device_id, flowdata_attempt)
+        if retry_delay is not None and flowdata_retries is not None:
+            # Free this worker for other devices until the retry is due
+            with flowdata_retries_lock:
+                heapq.heappush(flowdata_retries, (time.monotonic() + retry_delay, next(_flowdata_retry_sequence),
+                                                  inverter, flowdata_attempt + 1, current_status_data))
+            return None, local_stats
+        while retry_delay is not None:
+            time.sleep(retry_delay)
+            flowdata_attempt += 1
+            flowdata, retry_delay = get_device_flowdata(inverter.pv_system_id, inverter.device_id, flowdata_attempt)
         
         # Determine power - treat offline devices as no power
         power = 0.0
@@ -814,15 +1246,8 @@ def process_device_status(inverter: InverterMetadata, target_date: datetime, sta
             power = 0.0
             logger.info(f"Device {inverter.device_id} has no flowdata - treating as no power")
         
-        # Get sunrise/sunset data for daylight hours check
-        sun_data = get_sunrise_sunset_data(inverter.pv_system_id, target_date)
-        logger.info(f"Sun data: {sun_data}")
-        if sun_data == {}:
-            sun_data = get_suntimes(inverter.pv_system_id, target_date)
-            logger.info(f"New Sun data: {sun_data}")
-        
-        # Get system timezone for accurate time comparison
-        system_timezone = get_system_timezone(inverter.pv_system_id)
+        # Sun times and timezone were looked up while flowdata was being fetched
+        sun_data, system_timezone, moon_bounds = system_context.result()
         if system_timezone:
             logger.info(f"Using system timezone {system_timezone} for device {inverter.device_id}")
         else:
@@ -830,8 +1255,8 @@ def process_device_status(inverter: InverterMetadata, target_date: datetime, sta
         
         # Determine if we're within moon time (1 hour before sunset to 1 hour after sunrise)
         is_moon_time_period = False
-        if sun_data and 'sunrise' in sun_data and 'sunset' in sun_data:
-            is_moon_time_period = is_moon_time(sun_data['sunrise'], sun_data['sunset'], system_timezone)
+        if moon_bounds:
+            is_moon_time_period = is_within_moon_bounds(moon_bounds, system_timezone)
         
         # Apply new workflow logic
         new_status = current_status
@@ -899,7 +1324,7 @@ def process_device_status(inverter: InverterMetadata, target_date: datetime, sta
                 # Check for red error codes
                 red_error_code = None
                 if messages_response and 'messages' in messages_response and messages_response['messages']:
-                    color_map = get_all_error_codes_from_supabase()
+                    color_map = error_codes or get_all_error_codes_from_supabase()
                     
                     for msg in messages_response['messages']:
                         error_code = msg['stateCode']
@@ -920,16 +1345,33 @@ def process_device_status(inverter: InverterMetadata, target_date: datetime, sta
         
         # Update status counters
         if new_status == 'green':
-            update_stats_thread_safe(stats, 'green_devices')
+            local_stats['green_devices'] += 1
         elif new_status == 'red':
-            update_stats_thread_safe(stats, 'red_devices')
+            local_stats['red_devices'] += 1
         elif new_status == 'Moon':
-            update_stats_thread_safe(stats, 'moon_devices')
+            local_stats['moon_devices'] += 1
         
         # Check if status or reason changed
         status_changed = (new_status != current_status) or (new_reason != current_reason)
         
-        if status_changed:
+        if status_changed and sns_buffer is not None:
+            # Queue the new STATUS row with its SNS notification; the batch is written before it is
+            # published, and the change is counted once SNS accepts it
+            now = datetime.utcnow().isoformat()
+            queue_status_change(
+                build_status_item(inverter.device_id, inverter.pv_system_id, new_status, power, new_reason, now, now),
+                build_status_change_entry(
+                    inverter.device_id, inverter.pv_system_id, new_status, current_status, power, new_reason, current_reason,
+                    sunrise_time=sun_data.get('sunrise') if sun_data else None,
+                    sunset_time=sun_data.get('sunset') if sun_data else None,
+                    timezone=system_timezone,
+                    flow_data=flowdata
+                ),
+                sns_buffer, stats
+            )
+            logger.info(f"✅ Status change queued for device {inverter.device_id}: {current_status} → {new_status} (reason: {new_reason})")
+            return True, local_stats
+        elif status_changed:
             # Update DynamoDB
             update_success = update_device_status_in_db(
                 inverter.device_id, inverter.pv_system_id, new_status, power, new_reason, status_changed=True
@@ -946,60 +1388,57 @@ def process_device_status(inverter: InverterMetadata, target_date: datetime, sta
                 )
                 
                 if sns_success:
-                    update_stats_thread_safe(stats, 'status_changes')
+                    local_stats['status_changes'] += 1
                     logger.info(f"✅ Status change processed for device {inverter.device_id}: {current_status} → {new_status}")
                 
-                return sns_success
+                return sns_success, local_stats
             else:
-                return False
+                return False, local_stats
         else:
             # No status change, but still update lastUpdated timestamp and power
-            update_device_status_in_db(inverter.device_id, inverter.pv_system_id, new_status, power, new_reason, status_changed=False)
+            update_success = update_device_status_in_db(inverter.device_id, inverter.pv_system_id, new_status, power, new_reason, status_changed=False,
+                                                        existing_record=current_status_data, write_buffer=write_buffer, stats=stats)
             logger.info(f"No status change for device {inverter.device_id} (remains {current_status})")
-            return True
+            return update_success, local_stats
         
     except Exception as e:
         logger.error(f"❌ Error processing device {inverter.device_id}: {str(e)}")
-        return False
+        return False, local_stats
 
 def update_stats_thread_safe(stats, key, increment=1):
     """Thread-safe stats update"""
     with stats_lock:
         stats[key] += increment
 
+def merge_stats_thread_safe(stats, counts):
+    """Thread-safe update of several stats at once"""
+    with stats_lock:
+        for key, increment in counts.items():
+            stats[key] += increment
+
 def enforce_weatherapi_rate_limit():
-    """Enforce WeatherAPI rate limit of 50 calls per minute"""
+    """Enforce WeatherAPI rate limit of 50 calls per minute (sliding window)"""
     with weatherapi_rate_limiter['lock']:
-        now = time.time()
-        one_minute_ago = now - 60
+        calls = weatherapi_rate_limiter['calls']
+        now = time.monotonic()
         
-        # Remove calls older than 1 minute
-        weatherapi_rate_limiter['calls'] = [
-            call_time for call_time in weatherapi_rate_limiter['calls'] 
-            if call_time > one_minute_ago
-        ]
+        # Drop calls that have left the one-minute window; the oldest is always calls[0]
+        while calls and calls[0] <= now - 60:
+            calls.popleft()
         
         # Check if we're at the limit (use 50 to be safe)
-        if len(weatherapi_rate_limiter['calls']) >= 50:
-            # Find the oldest call in the current minute
-            oldest_call = min(weatherapi_rate_limiter['calls'])
-            wait_time = oldest_call + 60 - now
+        if len(calls) >= calls.maxlen:
+            wait_time = calls[0] + 60 - now
             
             if wait_time > 0:
                 logger.info(f"WeatherAPI rate limit reached. Waiting {wait_time:.2f} seconds...")
                 time.sleep(wait_time)
-                
-                # Clean up the list again after waiting
-                now = time.time()
-                one_minute_ago = now - 60
-                weatherapi_rate_limiter['calls'] = [
-                    call_time for call_time in weatherapi_rate_limiter['calls'] 
-                    if call_time > one_minute_ago
-                ]
+                now = time.monotonic()
+            calls.popleft()
         
         # Record this call
-        weatherapi_rate_limiter['calls'].append(now)
-        logger.debug(f"WeatherAPI calls in last minute: {len(weatherapi_rate_limiter['calls'])}/50")
+        calls.append(now)
+        logger.debug(f"WeatherAPI calls in last minute: {len(calls)}/{calls.maxlen}")
 
 def process_devices_concurrently():
     """Main function to process all devices for status"""
@@ -1027,51 +1466,115 @@ def process_devices_concurrently():
         error_codes_loaded = get_all_error_codes_from_supabase()
         logger.info(f"Pre-loaded {len(error_codes_loaded)} error codes for efficient lookup")
         
-        # Get all inverters from DynamoDB
+        # Stream inverters from DynamoDB
         logger.info("Fetching inverters list from DynamoDB...")
-        inverters = get_all_inverters()
+        status_writes = []
+        status_changes = []
+        # One get_system_context lookup per system, shared by all of its inverters
+        system_contexts = {}
+        # Devices waiting out a flowdata retry delay without holding a pool worker
+        flowdata_retries = []
+        
+        # Process all devices on the module-level bounded pool; a slow device no longer holds up a whole batch
+        executor = polling_executor
+        future_to_inverter = {}
+        
+        # Devices of each page start polling while the next page is being read
+        try:
+            for inverters in iter_inverter_pages():
+                if not inverters:
+                    continue
+                
+                # Load the page's current statuses in batches instead of one GetItem per device
+                device_statuses, unread_statuses = get_device_statuses_from_db([inverter.device_id for inverter in inverters])
+                for inverter in inverters:
+                    # Unread rows get None so process_device_status falls back to GetItem; only rows that
+                    # really don't exist start from the default (new device) status
+                    if inverter.device_id in unread_statuses:
+                        current_status_data = None
+                    else:
+                        current_status_data = device_statuses.get(inverter.device_id) or _default_device_status()
+                    if inverter.pv_system_id not in system_contexts:
+                        system_contexts[inverter.pv_system_id] = system_lookup_executor.submit(
+                            get_system_context, inverter.pv_system_id, today
+                        )
+                    future = executor.submit(
+                        process_device_status, inverter, today, stats,
+                        current_status_data, status_writes, status_changes,
+                        error_codes_loaded, system_contexts[inverter.pv_system_id],
+                        flowdata_retries
+                    )
+                    future_to_inverter[future] = inverter
+        except Exception as e:
+            # Devices already submitted still finish and get their writes flushed below
+            logger.error(f"Error reading inverters from DynamoDB: {str(e)}")
+            update_stats_thread_safe(stats, 'errors')
         
-        if not inverters:
+        if not future_to_inverter:
             logger.warning("No inverters found")
             return stats
         
-        logger.info(f"Found {len(inverters)} inverters. Starting status processing...")
-        
-        # Process devices in batches
-        batch_size = 32
-        total_batches = (len(inverters) + batch_size - 1) // batch_size
-        
-        for batch_num in range(total_batches):
-            start_idx = batch_num * batch_size
-            end_idx = min(start_idx + batch_size, len(inverters))
-            batch_inverters = inverters[start_idx:end_idx]
+        logger.info(f"Found {len(future_to_inverter)} inverters. Waiting for status processing...")
+        
+        # Per-device results are only counted on this thread, so they are tallied locally
+        # and merged into the shared stats once instead of taking stats_lock per device
+        device_counts = Counter()
+        pending = set(future_to_inverter)
+        while pending or flowdata_retries:
+            # Resubmit the devices whose flowdata retry delay has passed
+            with flowdata_retries_lock:
+                now = time.monotonic()
+                due = []
+                while flowdata_retries and flowdata_retries[0][0] <= now:
+                    due.append(heapq.heappop(flowdata_retries))
+                next_retry_at = flowdata_retries[0][0] if flowdata_retries else None
             
-            logger.info(f"Processing batch {batch_num + 1}/{total_batches}: devices {start_idx + 1}-{end_idx}")
+            for _, _, inverter, attempt, current_status_data in due:
+                future = executor.submit(
+                    process_device_status, inverter, today, stats,
+                    current_status_data, status_writes, status_changes,
+                    error_codes_loaded, system_contexts[inverter.pv_system_id],
+                    flowdata_retries, attempt
+                )
+                future_to_inverter[future] = inverter
+                pending.add(future)
             
-            with ThreadPoolExecutor(max_workers=batch_size) as executor:
-                future_to_inverter = {
-                    executor.submit(process_device_status, inverter, today, stats): inverter 
-                    for inverter in batch_inverters
-                }
-                
-                for future in as_completed(future_to_inverter):
-                    inverter = future_to_inverter[future]
-                    try:
-                        success = future.result()
-                        
-                        update_stats_thread_safe(stats, 'devices_processed')
-                        update_stats_thread_safe(stats, 'api_calls_made', 2)  # flowdata + messages
-                        
-                        if not success:
-                            update_stats_thread_safe(stats, 'errors')
-                        
-                    except Exception as e:
-                        logger.error(f"❌ Error processing device {inverter.device_id}: {str(e)}")
-                        update_stats_thread_safe(stats, 'errors')
+            timeout = max(0.0, next_retry_at - time.monotonic()) if next_retry_at is not None else None
+            if not pending:
+                time.sleep(timeout)
+                continue
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
             
-            if batch_num < total_batches - 1:
-                logger.info(f"Batch {batch_num + 1} completed. Waiting 0.5 seconds before next batch...")
-                time.sleep(0.5)
+            for future in done:
+                inverter = future_to_inverter.pop(future)
+                try:
+                    success, local_stats = future.result()
+                    
+                    device_counts.update(local_stats)
+                    device_counts['api_calls_made'] += 1  # flowdata
+                    if success is None:
+                        # Deferred for a flowdata retry; counted once it finishes
+                        continue
+                    
+                    device_counts['devices_processed'] += 1
+                    device_counts['api_calls_made'] += 1  # messages
+                    
+                    if not success:
+                        device_counts['errors'] += 1
+                    
+                except Exception as e:
+                    logger.error(f"❌ Error processing device {inverter.device_id}: {str(e)}")
+                    device_counts['errors'] += 1
+        
+        merge_stats_thread_safe(stats, device_counts)
+        
+        # Unchanged statuses only refresh power/lastUpdated, so they are written together
+        if status_writes and not flush_status_writes(status_writes):
+            stats['errors'] += len(status_writes)
+        
+        # Write and publish the status changes left over from the last partial batch
+        if status_changes:
+            flush_status_changes(status_changes, stats)
         
         end_time = time.time()
         execution_time = end_time - start_time
@@ -28,6 +28,8 @@ from decimal import Decimal
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import threading
 import botocore.config
+from boto3.dynamodb.conditions import Attr, Key
+from sk_pk_index import read_sk_pk_items
 
 # Set up logging
 logging.basicConfig(
@@ -56,6 +58,8 @@ PASSWORD = os.environ.get('SOLAR_WEB_PASSWORD', 'solar123')
 # AWS Configuration
 AWS_REGION = os.environ.get('AWS_REGION_', 'us-east-1')
 DYNAMODB_TABLE_NAME = os.environ.get('DYNAMODB_TABLE_NAME', 'Moose-DDB')
+# GSI1 (GSI1PK=System#<id>, GSI1SK=User#<id>): the users linked to a system
+USER_SYSTEM_INDEX_NAME = os.environ.get('USER_SYSTEM_INDEX_NAME', 'user-system-index')
 
 # Configuration constants
 MAX_RETRIES = int(os.environ.get('MAX_RETRIES', '3'))
@@ -81,6 +85,10 @@ _jwt_token_cache = {
 # Thread lock for stats
 stats_lock = threading.Lock()
 
+# Monthly copies written this run, {User# PK: {System# PK: item}}, rolled up once all systems are done
+monthly_user_copies = {}
+monthly_user_copies_lock = threading.Lock()
+
 class PvSystemMetadata:
     def __init__(self, pv_system_id: str, name: str):
         self.pv_system_id = pv_system_id
@@ -233,30 +241,14 @@ def get_all_inverters() -> List[InverterMetadata]:
         
         inverter_profiles = []
         
-        # Use scan with filter expression to find all inverter profiles
-        response = table.scan(
-            FilterExpression='begins_with(PK, :pk_prefix) AND SK = :sk_value',
-            ExpressionAttributeValues={
-                ':pk_prefix': 'Inverter#',
-                ':sk_value': 'PROFILE'
-            }
+        # Query only the Inverter# PROFILE rows through the SK-PK index
+        items = read_sk_pk_items(
+            table,
+            Key('SK').eq('PROFILE') & Key('PK').begins_with('Inverter#'),
+            Attr('PK').begins_with('Inverter#') & Attr('SK').eq('PROFILE'),
+            ProjectionExpression='deviceId, pvSystemId'
         )
         
-        items = response.get('Items', [])
-        
-        # Handle pagination if there are more items
-        while 'LastEvaluatedKey' in response:
-            logger.info("Fetching more inverter items from DynamoDB...")
-            response = table.scan(
-                FilterExpression='begins_with(PK, :pk_prefix) AND SK = :sk_value',
-                ExpressionAttributeValues={
-                    ':pk_prefix': 'Inverter#',
-                    ':sk_value': 'PROFILE'
-                },
-                ExclusiveStartKey=response['LastEvaluatedKey']
-            )
-            items.extend(response.get('Items', []))
-        
         # Extract deviceId and pvSystemId from each item
         for item in items:
             device_id = item.get('deviceId')
@@ -476,12 +468,100 @@ def store_monthly_data(system: PvSystemMetadata, target_date: datetime, earnings
         # Store in DynamoDB
         table.put_item(Item=item)
         logger.info(f"✅ Stored monthly data for {system.name}")
+        
+        # The system item is already stored, so a failed copy does not fail the monthly entry;
+        # the report falls back to the system items for users without a copy
+        try:
+            store_user_monthly_copies(item)
+        except Exception as e:
+            logger.error(f"❌ Error copying monthly data for {system.name} to its users: {str(e)}")
         return True
         
     except Exception as e:
         logger.error(f"❌ Error storing monthly data for {system.name}: {str(e)}")
         return False
 
+def get_system_user_pks(system_pk: str) -> List[str]:
+    """Get the User# PKs linked to a system from the user-system index, following LastEvaluatedKey
+    Errors are raised so a failed lookup is never mistaken for a system without users"""
+    query_kwargs = {
+        'IndexName': USER_SYSTEM_INDEX_NAME,
+        'KeyConditionExpression': 'GSI1PK = :system_pk AND begins_with(GSI1SK, :user_prefix)',
+        'ExpressionAttributeValues': {
+            ':system_pk': system_pk,
+            ':user_prefix': 'User#'
+        },
+        'ProjectionExpression': 'PK'
+    }
+    
+    response = table.query(**query_kwargs)
+    user_pks = [link['PK'] for link in response.get('Items', [])]
+    
+    # Handle pagination if there are more links
+    while 'LastEvaluatedKey' in response:
+        response = table.query(ExclusiveStartKey=response['LastEvaluatedKey'], **query_kwargs)
+        user_pks.extend(link['PK'] for link in response.get('Items', []))
+    
+    return user_pks
+
+def store_user_monthly_copies(item: Dict[str, Any]) -> None:
+    """Copy a system's monthly item under every linked user (SK=MONTHLY#<month>#System#<id>)
+    so the monthly report can read all of a user's systems with one query.
+    Errors are raised to the caller, which logs them without failing the stored system item"""
+    user_pks = get_system_user_pks(item['PK'])
+    
+    with table.batch_writer() as batch:
+        for user_pk in user_pks:
+            batch.put_item(Item={
+                **item,
+                'PK': user_pk,
+                'SK': f"MONTHLY#{item['month']}#{item['PK']}"
+            })
+    
+    with monthly_user_copies_lock:
+        for user_pk in user_pks:
+            monthly_user_copies.setdefault(user_pk, {})[item['PK']] = item
+
+def store_user_monthly_aggregates(month: str, user_copies: Dict[str, Dict[str, Dict[str, Any]]]) -> int:
+    """Roll the monthly copies written this run into one User#<id> / MONTHLY#<month> item per user
+    holding the totals and a per-system breakdown. Returns the number of users stored, which is
+    0 if the batch writer failed to flush, since it cannot tell which of its items were written"""
+    updated_at = datetime.utcnow().isoformat()
+    queued = 0
+    
+    try:
+        with table.batch_writer() as batch:
+            for user_pk, copies_by_system in user_copies.items():
+                try:
+                    copies = [
+                        {name: copy[name] for name in ('systemId', 'systemName', 'energyProductionWh', 'earnings', 'co2Savings')}
+                        for copy in copies_by_system.values()
+                    ]
+                    aggregate = {
+                        'PK': user_pk,
+                        'SK': f'MONTHLY#{month}',
+                        'month': month,
+                        'dataType': 'USER_MONTHLY_AGGREGATE',
+                        'totalEnergyWh': sum(copy['energyProductionWh'] for copy in copies),
+                        'totalEarnings': sum(copy['earnings'] for copy in copies),
+                        'totalCO2': sum(copy['co2Savings'] for copy in copies),
+                        'perSystem': copies,
+                        'updatedAt': updated_at
+                    }
+                except Exception as e:
+                    logger.error(f"❌ Error building monthly aggregate for {user_pk}: {str(e)}")
+                    continue
+                
+                # Write errors (the batch writer flushes inside put_item) fail the whole batch
+                batch.put_item(Item=aggregate)
+                queued += 1
+        
+    except Exception as e:
+        logger.error(f"❌ Error storing monthly aggregates for {queued} users: {str(e)}")
+        return 0
+    
+    return queued
+
 def store_yearly_data(system: PvSystemMetadata, target_date: datetime, earnings_rate: float) -> bool:
     """Store yearly data - makes 1 API call (aggr only)"""
     try:
@@ -895,6 +975,9 @@ def process_systems_concurrently():
         
         logger.info(f"Found {len(pv_systems)} PV systems and {len(inverters)} inverters. Starting batch processing...")
         
+        with monthly_user_copies_lock:
+            monthly_user_copies.clear()
+        
         # Combine systems and inverters for processing
         all_items = [(item, 'system') for item in pv_systems] + [(item, 'inverter') for item in inverters]
         
@@ -957,6 +1040,11 @@ def process_systems_concurrently():
                 logger.info(f"Batch {batch_num + 1} completed. Waiting 0.5 seconds before next batch...")
                 time.sleep(0.5)
         
+        # Roll the monthly copies written this run up into one aggregate item per user;
+        # users whose aggregate misses a linked system are resolved by the report itself
+        aggregated = store_user_monthly_aggregates(today.strftime("%Y-%m"), monthly_user_copies)
+        logger.info(f"Stored monthly aggregates for {aggregated} users")
+        
         end_time = time.time()
         execution_time = end_time - start_time
         
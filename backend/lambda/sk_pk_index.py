@@ -0,0 +1,131 @@
+"""
+SK-PK Index Reads
+
+Shared by the Lambdas and the helper scripts. SK-PK-index is a GSI keyed on SK (partition)
+and PK (sort), so "all records of one type" lookups (e.g. every Inverter# / STATUS row) are a
+Query instead of a full-table Scan + FilterExpression (see docs/architecture.md). Tables created
+without the index fall back to a parallel Scan with the equivalent filter.
+
+Every function takes a reader: a boto3 Table resource, or a low-level DynamoDB client (pass
+TableName, and typed ExpressionAttributeValues, in the read kwargs). The key condition and the
+scan filter are given by the caller, as strings or boto3 conditions.
+"""
+
+import os
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from itertools import chain
+from typing import Any, Dict, Iterator, List
+
+from botocore.exceptions import ClientError
+
+logger = logging.getLogger('sk_pk_index')
+
+# GSI keyed on SK (partition) + PK (sort)
+SK_PK_INDEX_NAME = os.environ.get('SK_PK_INDEX_NAME', 'SK-PK-index')
+# Default number of segments scanned concurrently when the index is unavailable
+SCAN_SEGMENTS = int(os.environ.get('SCAN_SEGMENTS', '8'))
+
+def _copy_read_kwargs(read_kwargs: Dict[str, Any], **extra) -> Dict[str, Any]:
+    """
+    Copy read kwargs with a fresh ExpressionAttributeNames dict; boto3 adds the placeholders
+    of condition objects to it in place, so concurrent requests must not share one
+    """
+    kwargs = dict(read_kwargs, **extra)
+    if 'ExpressionAttributeNames' in kwargs:
+        kwargs['ExpressionAttributeNames'] = dict(kwargs['ExpressionAttributeNames'])
+    return kwargs
+
+def _iter_responses(read, read_ahead: bool = False, **kwargs) -> Iterator[Dict[str, Any]]:
+    """
+    Call reader.query/reader.scan until LastEvaluatedKey is exhausted, yielding each response
+    With read_ahead the next page is requested before the current one is handed to the caller,
+    so its round trip overlaps the caller's processing
+    """
+    if not read_ahead:
+        while True:
+            response = read(**kwargs)
+            yield response
+            if 'LastEvaluatedKey' not in response:
+                return
+            kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+    
+    # One background request at a time: the page being processed plus the one in flight
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        future = executor.submit(read, **kwargs)
+        while future is not None:
+            response = future.result()
+            future = None
+            if 'LastEvaluatedKey' in response:
+                kwargs = dict(kwargs, ExclusiveStartKey=response['LastEvaluatedKey'])
+                future = executor.submit(read, **kwargs)
+            yield response
+
+def _is_missing_index(error: ClientError) -> bool:
+    """A query on an index the table does not have fails with ValidationException"""
+    return error.response['Error']['Code'] == 'ValidationException'
+
+def _iter_index_responses(reader, key_condition, scan_filter, total_segments: int,
+                          **read_kwargs) -> Iterator[Dict[str, Any]]:
+    """
+    Yield the responses of an SK-PK index query, or of a parallel scan (one response list per
+    segment, as each segment completes) when the index does not exist. A FilterExpression in
+    read_kwargs applies to the query only; scan_filter replaces it for the scan, so it must include it
+    Other errors, and any error once a response has been yielded, are raised
+    """
+    responses = _iter_responses(
+        reader.query, read_ahead=True,
+        **_copy_read_kwargs(read_kwargs, IndexName=SK_PK_INDEX_NAME, KeyConditionExpression=key_condition)
+    )
+    try:
+        first_response = next(responses)
+    except ClientError as e:
+        if not _is_missing_index(e):
+            raise
+        logger.warning(f"Index {SK_PK_INDEX_NAME} unavailable ({e.response['Error']['Message']}), "
+                       f"falling back to a {total_segments}-segment parallel scan")
+    else:
+        yield first_response
+        yield from responses
+        return
+    
+    def _scan_segment(segment: int) -> List[Dict[str, Any]]:
+        return list(_iter_responses(reader.scan, **_copy_read_kwargs(
+            read_kwargs, FilterExpression=scan_filter, Segment=segment, TotalSegments=total_segments
+        )))
+    
+    with ThreadPoolExecutor(max_workers=total_segments) as executor:
+        futures = [executor.submit(_scan_segment, segment) for segment in range(total_segments)]
+        for future in as_completed(futures):
+            yield from future.result()
+
+def iter_sk_pk_pages(reader, key_condition, scan_filter, total_segments: int = SCAN_SEGMENTS,
+                     **read_kwargs) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Yield pages of the items matching key_condition on the SK-PK index, as they are read
+    Falls back to a parallel scan filtered by scan_filter when the index does not exist
+    """
+    for response in _iter_index_responses(reader, key_condition, scan_filter, total_segments, **read_kwargs):
+        yield response.get('Items', [])
+
+def read_sk_pk_items(reader, key_condition, scan_filter, total_segments: int = SCAN_SEGMENTS,
+                     **read_kwargs) -> List[Dict[str, Any]]:
+    """
+    Read all the items matching key_condition on the SK-PK index into one list
+    Falls back to a parallel scan filtered by scan_filter when the index does not exist
+    """
+    return list(chain.from_iterable(
+        iter_sk_pk_pages(reader, key_condition, scan_filter, total_segments, **read_kwargs)
+    ))
+
+def count_sk_pk_items(reader, key_condition, scan_filter, total_segments: int = SCAN_SEGMENTS,
+                      **read_kwargs) -> int:
+    """
+    Count the items matching key_condition on the SK-PK index with Select='COUNT', so no items
+    are transferred. Falls back to a parallel scan filtered by scan_filter when the index does not exist
+    """
+    return sum(
+        response.get('Count', 0)
+        for response in _iter_index_responses(reader, key_condition, scan_filter, total_segments,
+                                              Select='COUNT', **read_kwargs)
+    )
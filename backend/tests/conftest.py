@@ -0,0 +1,46 @@
+"""
+Shared test setup: put the Lambda and helper modules on the import path, and stand in for
+boto3/botocore/requests when they are not installed so the modules import without AWS access.
+Tests replace the module-level clients with fakes; nothing here talks to AWS.
+"""
+
+import os
+import sys
+import importlib.util
+from types import ModuleType
+from unittest.mock import MagicMock
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.join(BACKEND_DIR, 'lambda'), os.path.join(BACKEND_DIR, 'helper')]
+
+# Real clients are created at import time when boto3 is installed; give them a region
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+
+
+class ClientError(Exception):
+    """Stand-in for botocore.exceptions.ClientError with the same constructor and response"""
+    
+    def __init__(self, error_response, operation_name):
+        super().__init__(f"An error occurred ({error_response.get('Error', {}).get('Code')}) "
+                         f"when calling the {operation_name} operation")
+        self.response = error_response
+        self.operation_name = operation_name
+
+
+def _stub_modules(names):
+    for name in names:
+        sys.modules.setdefault(name, MagicMock(name=name))
+
+
+if importlib.util.find_spec('botocore') is None:
+    _stub_modules(['botocore', 'botocore.config'])
+    exceptions = ModuleType('botocore.exceptions')
+    exceptions.ClientError = ClientError
+    sys.modules['botocore.exceptions'] = exceptions
+    sys.modules['botocore'].exceptions = exceptions
+
+if importlib.util.find_spec('boto3') is None:
+    _stub_modules(['boto3', 'boto3.dynamodb', 'boto3.dynamodb.conditions'])
+
+if importlib.util.find_spec('requests') is None:
+    _stub_modules(['requests', 'requests.adapters'])
@@ -0,0 +1,70 @@
+import json
+
+import automatic_report
+
+
+def _aggregate_item(user_id, energy='7000'):
+    return {
+        'PK': {'S': f'User#{user_id}'},
+        'totalEnergyWh': {'N': energy},
+        'totalEarnings': {'N': '9.5'},
+        'totalCO2': {'N': '4'},
+        'perSystem': {'L': [
+            {'M': {'systemId': {'S': 'a'}, 'systemName': {'S': 'System A'},
+                   'energyProductionWh': {'N': energy}, 'earnings': {'N': '9.5'}}}
+        ]}
+    }
+
+
+def test_malformed_aggregate_is_skipped(monkeypatch):
+    items = [
+        _aggregate_item('u1'),
+        dict(_aggregate_item('u2'), perSystem={'L': [{'M': {'systemName': {'S': 'No ID'}}}]}),
+        {key: value for key, value in _aggregate_item('u3').items() if key != 'totalCO2'},
+        _aggregate_item('u4', energy='not a number'),
+    ]
+    monkeypatch.setattr(automatic_report, '_batch_get_items', lambda keys, projection: items)
+    
+    aggregates = automatic_report.get_user_monthly_aggregates(['u1', 'u2', 'u3', 'u4'], '2025-03')
+    
+    assert list(aggregates) == ['u1']
+    totals, systems_data = aggregates['u1']
+    assert totals == (7000.0, 9.5, 4.0)
+    assert [data['systemId'] for data in systems_data] == ['a']
+    assert systems_data[0]['energyProductionWh'] == 7000.0
+
+
+class FakeProfileTable:
+    def __init__(self, profiles):
+        self.profiles = profiles
+    
+    def get_item(self, Key, **kwargs):
+        item = self.profiles.get(Key['PK'])
+        return {'Item': item} if item else {}
+
+
+def test_dispatch_sends_only_user_id_and_month(monkeypatch):
+    invocations = []
+    lambda_client = type('FakeLambda', (), {'invoke': lambda self, **kwargs: invocations.append(kwargs)})()
+    monkeypatch.setattr(automatic_report, 'lambda_client', lambda_client)
+    
+    users = [{'userId': 'u1', 'name': 'One', 'phoneNumber': '6135550001', 'email': 'one@example.com'}]
+    assert automatic_report.dispatch_user_reports(users, '2025-03') == 1
+    assert json.loads(invocations[0]['Payload']) == {'userId': 'u1', 'month': '2025-03'}
+
+
+def test_worker_reloads_the_profile(monkeypatch):
+    monkeypatch.setattr(automatic_report, 'table', FakeProfileTable({
+        'User#u1': {'userId': 'u1', 'name': 'One', 'role': 'user', 'phoneNumber': '6135550001'},
+        'User#admin': {'userId': 'admin', 'name': 'Admin', 'role': 'admin', 'phoneNumber': '6135550002'},
+    }))
+    sent_to = []
+    monkeypatch.setattr(automatic_report, 'send_user_report',
+                        lambda user, month, month_name: sent_to.append(user) or True)
+    
+    event = {'userId': 'u1', 'month': '2025-03', 'phoneNumber': '9995550000', 'name': 'Someone'}
+    automatic_report.handle_worker_event(event, '2025-03', 'March 2025')
+    automatic_report.handle_worker_event({'userId': 'admin'}, '2025-03', 'March 2025')
+    automatic_report.handle_worker_event({'userId': 'missing'}, '2025-03', 'March 2025')
+    
+    assert [(user['userId'], user['phoneNumber'], user['name']) for user in sent_to] == [('u1', '6135550001', 'One')]
@@ -0,0 +1,307 @@
+import heapq
+import time
+from collections import Counter
+from datetime import datetime
+
+import pytest
+
+import device_status_polling
+
+
+class FakeResource:
+    """DynamoDB resource whose batch_get_item answers one key per call and leaves the rest unprocessed"""
+    
+    def __init__(self, table_name, found, max_answered_calls=None):
+        self.table_name = table_name
+        self.found = found
+        self.max_answered_calls = max_answered_calls
+        self.calls = 0
+    
+    def batch_get_item(self, RequestItems):
+        self.calls += 1
+        request = RequestItems[self.table_name]
+        keys = request['Keys']
+        if self.max_answered_calls is not None and self.calls > self.max_answered_calls:
+            answered, rest = [], keys
+        else:
+            answered, rest = keys[:1], keys[1:]
+        items = [{'PK': key['PK'], 'status': 'green'} for key in answered if key['PK'] in self.found]
+        return {
+            'Responses': {self.table_name: items},
+            'UnprocessedKeys': {self.table_name: dict(request, Keys=rest)} if rest else {}
+        }
+
+
+def _patch(monkeypatch, resource):
+    table = type('FakeTable', (), {'name': resource.table_name})()
+    monkeypatch.setattr(device_status_polling, 'table', table)
+    monkeypatch.setattr(device_status_polling, 'dynamodb', resource)
+    monkeypatch.setattr(device_status_polling.time, 'sleep', lambda seconds: None)
+
+
+def test_unprocessed_keys_are_retried(monkeypatch):
+    resource = FakeResource('Moose-DDB', found={'Inverter#a', 'Inverter#b'})
+    _patch(monkeypatch, resource)
+    
+    statuses, unread = device_status_polling.get_device_statuses_from_db(['a', 'b', 'c'])
+    
+    assert set(statuses) == {'a', 'b'}
+    assert unread == set()
+    assert resource.calls == 3
+
+
+def test_keys_still_unprocessed_are_returned_as_unread(monkeypatch):
+    resource = FakeResource('Moose-DDB', found={'Inverter#a', 'Inverter#b', 'Inverter#c'}, max_answered_calls=1)
+    _patch(monkeypatch, resource)
+    
+    statuses, unread = device_status_polling.get_device_statuses_from_db(['a', 'b', 'c'])
+    
+    assert len(statuses) == 1
+    assert unread == {'a', 'b', 'c'} - set(statuses)
+    assert resource.calls == device_status_polling.MAX_RETRIES + 1
+
+
+def test_failed_request_marks_chunk_unread(monkeypatch):
+    resource = FakeResource('Moose-DDB', found=set())
+    resource.batch_get_item = lambda RequestItems: (_ for _ in ()).throw(RuntimeError('throttled'))
+    _patch(monkeypatch, resource)
+    
+    statuses, unread = device_status_polling.get_device_statuses_from_db(['a', 'b'])
+    
+    assert statuses == {}
+    assert unread == {'a', 'b'}
+
+
+class FailingBatchWriter:
+    """batch_writer whose flush on exit raises, as when BatchWriteItem keeps failing"""
+    
+    def __init__(self):
+        self.items = []
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        raise RuntimeError('flush failed')
+    
+    def put_item(self, Item):
+        self.items.append(Item)
+
+
+def test_failed_buffer_flush_counts_every_row(monkeypatch):
+    table = type('FakeTable', (), {'name': 'Moose-DDB', 'batch_writer': lambda self: FailingBatchWriter()})()
+    monkeypatch.setattr(device_status_polling, 'table', table)
+    stats = {'errors': 0}
+    write_buffer = []
+    
+    results = [
+        device_status_polling.update_device_status_in_db(
+            f'd{i}', 's1', 'green', 1.5, '', existing_record={}, write_buffer=write_buffer, stats=stats
+        )
+        for i in range(device_status_polling.STATUS_WRITE_BATCH_SIZE)
+    ]
+    
+    assert all(results)
+    assert write_buffer == []
+    assert stats['errors'] == device_status_polling.STATUS_WRITE_BATCH_SIZE
+
+
+def test_failed_status_change_flush_skips_notifications(monkeypatch):
+    table = type('FakeTable', (), {'name': 'Moose-DDB', 'batch_writer': lambda self: FailingBatchWriter()})()
+    monkeypatch.setattr(device_status_polling, 'table', table)
+    published = []
+    monkeypatch.setattr(device_status_polling, 'publish_status_changes',
+                        lambda entries, stats: published.extend(entries))
+    stats = {'errors': 0}
+    
+    device_status_polling.flush_status_changes([({'PK': 'Inverter#a'}, {'Id': 'a'}),
+                                                ({'PK': 'Inverter#b'}, {'Id': 'b'})], stats)
+    
+    assert stats['errors'] == 2
+    assert published == []
+
+
+ONLINE_NULL = {'status': {'isOnline': True}, 'data': None}
+ONLINE_DATA = {'status': {'isOnline': True}, 'data': {'channels': []}}
+
+
+def test_flowdata_retry_delay_is_returned_instead_of_slept(monkeypatch):
+    monkeypatch.setattr(device_status_polling, 'api_request', lambda endpoint: ONLINE_NULL)
+    monkeypatch.setattr(device_status_polling.time, 'sleep', lambda seconds: pytest.fail('slept on the worker'))
+    
+    response, delay = device_status_polling.get_device_flowdata('s1', 'd1')
+    assert response == ONLINE_NULL and delay > 0
+    
+    last_attempt = device_status_polling.FLOWDATA_MAX_ATTEMPTS
+    assert device_status_polling.get_device_flowdata('s1', 'd1', last_attempt) == (ONLINE_NULL, None)
+
+
+def test_null_flowdata_is_deferred_to_the_retry_heap(monkeypatch):
+    monkeypatch.setattr(device_status_polling, 'api_request', lambda endpoint: ONLINE_NULL)
+    flowdata_retries = []
+    inverter = device_status_polling.InverterMetadata('s1', 'd1')
+    
+    success, _ = device_status_polling.process_device_status(
+        inverter, None, {}, current_status_data={'status': 'green'},
+        system_context=object(), flowdata_retries=flowdata_retries
+    )
+    
+    assert success is None
+    ready_at, _, deferred_inverter, attempt, status_data = flowdata_retries[0]
+    assert ready_at > time.monotonic()
+    assert (deferred_inverter, attempt, status_data) == (inverter, 2, {'status': 'green'})
+
+
+def test_deferred_devices_are_resubmitted(monkeypatch):
+    inverters = [device_status_polling.InverterMetadata('s1', 'a'), device_status_polling.InverterMetadata('s1', 'b')]
+    monkeypatch.setattr(device_status_polling, 'get_jwt_token', lambda: 'token')
+    monkeypatch.setattr(device_status_polling, 'get_all_error_codes_from_supabase', lambda: {})
+    monkeypatch.setattr(device_status_polling, 'iter_inverter_pages', lambda: iter([inverters]))
+    monkeypatch.setattr(device_status_polling, 'get_device_statuses_from_db', lambda device_ids: ({}, set()))
+    monkeypatch.setattr(device_status_polling, 'get_system_context', lambda pv_system_id, target_date: ({}, None, None))
+    calls = []
+    
+    def fake_process(inverter, target_date, stats, current_status_data, write_buffer, sns_buffer,
+                     error_codes, system_context, flowdata_retries, flowdata_attempt=1):
+        calls.append((inverter.device_id, flowdata_attempt))
+        if inverter.device_id == 'b' and flowdata_attempt < 3:
+            with device_status_polling.flowdata_retries_lock:
+                heapq.heappush(flowdata_retries, (time.monotonic() + 0.01, flowdata_attempt, inverter,
+                                                  flowdata_attempt + 1, current_status_data))
+            return None, Counter()
+        return True, Counter(green_devices=1)
+    monkeypatch.setattr(device_status_polling, 'process_device_status', fake_process)
+    
+    stats = device_status_polling.process_devices_concurrently()
+    
+    assert sorted(calls) == [('a', 1), ('b', 1), ('b', 2), ('b', 3)]
+    assert stats['devices_processed'] == 2
+    assert stats['green_devices'] == 2
+    assert stats['api_calls_made'] == 6
+    assert stats['errors'] == 0
+
+
+class FakeSNS:
+    """publish_batch recording each request; fail(request_number, entry_index) returns a Failed entry or None"""
+    
+    def __init__(self, fail=lambda request_number, index: None, raise_on=()):
+        self.fail = fail
+        self.raise_on = raise_on
+        self.requests = []
+    
+    def publish_batch(self, TopicArn, PublishBatchRequestEntries):
+        self.requests.append(PublishBatchRequestEntries)
+        request_number = len(self.requests)
+        if request_number in self.raise_on:
+            raise RuntimeError('publish failed')
+        successful, failed = [], []
+        for index, entry in enumerate(PublishBatchRequestEntries):
+            failure = self.fail(request_number, index)
+            if failure:
+                failed.append(dict(failure, Id=entry['Id']))
+            else:
+                successful.append({'Id': entry['Id'], 'MessageId': f'm{request_number}-{index}'})
+        return {'Successful': successful, 'Failed': failed}
+
+
+def _sns_entries(count, message_size=10):
+    return [{'Subject': f'Change {i}', 'Message': f'{i}'.ljust(message_size, 'x'), 'MessageAttributes': {}}
+            for i in range(count)]
+
+
+def test_status_changes_are_published_ten_per_request(monkeypatch):
+    sns = FakeSNS()
+    monkeypatch.setattr(device_status_polling, 'sns', sns)
+    stats = {'status_changes': 0, 'errors': 0}
+    
+    device_status_polling.publish_status_changes(_sns_entries(23), stats)
+    
+    assert [len(request) for request in sns.requests] == [10, 10, 3]
+    assert all(len({entry['Id'] for entry in request}) == len(request) for request in sns.requests)
+    assert [entry['Subject'] for request in sns.requests for entry in request] == [f'Change {i}' for i in range(23)]
+    assert stats == {'status_changes': 23, 'errors': 0}
+
+
+def test_publish_batches_are_split_by_size(monkeypatch):
+    sns = FakeSNS()
+    monkeypatch.setattr(device_status_polling, 'sns', sns)
+    stats = {'status_changes': 0, 'errors': 0}
+    
+    device_status_polling.publish_status_changes(_sns_entries(5, message_size=100 * 1024), stats)
+    
+    assert [len(request) for request in sns.requests] == [2, 2, 1]
+    assert all(sum(len(entry['Message']) for entry in request) <= device_status_polling.SNS_BATCH_MAX_BYTES
+               for request in sns.requests)
+    assert stats['status_changes'] == 5
+
+
+def test_failed_publish_entries_are_retried_once(monkeypatch):
+    # Entry 1 fails on SNS's side twice, entry 2 once, and entry 3 is a sender fault
+    failures = {
+        (1, 1): {'Code': 'InternalError', 'SenderFault': False},
+        (1, 2): {'Code': 'InternalError', 'SenderFault': False},
+        (1, 3): {'Code': 'InvalidParameter', 'SenderFault': True},
+        (2, 0): {'Code': 'InternalError', 'SenderFault': False},
+    }
+    sns = FakeSNS(fail=lambda request_number, index: failures.get((request_number, index)))
+    monkeypatch.setattr(device_status_polling, 'sns', sns)
+    stats = {'status_changes': 0, 'errors': 0}
+    
+    device_status_polling.publish_status_changes(_sns_entries(5), stats)
+    
+    assert [[entry['Subject'] for entry in request] for request in sns.requests] == [
+        [f'Change {i}' for i in range(5)], ['Change 1', 'Change 2']
+    ]
+    assert stats == {'status_changes': 3, 'errors': 2}
+
+
+def test_failed_publish_request_is_retried_once(monkeypatch):
+    sns = FakeSNS(raise_on=(1,))
+    monkeypatch.setattr(device_status_polling, 'sns', sns)
+    stats = {'status_changes': 0, 'errors': 0}
+    
+    device_status_polling.publish_status_changes(_sns_entries(3), stats)
+    
+    assert len(sns.requests) == 2
+    assert stats == {'status_changes': 3, 'errors': 0}
+    
+    sns = FakeSNS(raise_on=(1, 2))
+    monkeypatch.setattr(device_status_polling, 'sns', sns)
+    stats = {'status_changes': 0, 'errors': 0}
+    
+    device_status_polling.publish_status_changes(_sns_entries(3), stats)
+    
+    assert len(sns.requests) == 2
+    assert stats == {'status_changes': 0, 'errors': 3}
+
+
+def _clock(hour, minute):
+    """datetime whose now() is the given local time of day"""
+    class FixedDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return cls(2025, 6, 21, hour, minute, tzinfo=tz)
+    return FixedDatetime
+
+
+@pytest.mark.parametrize('sunrise, sunset, expected', [
+    ('05:22 AM', '08:50 PM', (19 * 3600 + 50 * 60, 6 * 3600 + 22 * 60)),
+    # Sunset shortly after midnight: an hour before it is the previous evening
+    ('06:00 AM', '12:30 AM', (23 * 3600 + 30 * 60, 7 * 3600)),
+    # Sunrise shortly before midnight: an hour after it is the next morning
+    ('11:30 PM', '03:00 PM', (14 * 3600, 30 * 60)),
+])
+def test_moon_bounds_wrap_around_midnight(monkeypatch, sunrise, sunset, expected):
+    monkeypatch.setattr(device_status_polling, '_moon_bounds_cache', {})
+    
+    assert device_status_polling.compute_moon_bounds(sunrise, sunset) == expected
+
+
+@pytest.mark.parametrize('hour, minute, expected', [
+    (23, 45, True), (0, 0, True), (6, 59, True), (7, 1, False), (12, 0, False), (23, 29, False),
+])
+def test_moon_time_across_midnight(monkeypatch, hour, minute, expected):
+    monkeypatch.setattr(device_status_polling, '_moon_bounds_cache', {})
+    monkeypatch.setattr(device_status_polling, 'datetime', _clock(hour, minute))
+    
+    assert device_status_polling.is_moon_time('06:00 AM', '12:30 AM', 'America/Toronto') is expected
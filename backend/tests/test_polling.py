@@ -0,0 +1,76 @@
+from datetime import datetime
+from decimal import Decimal
+
+import polling
+
+
+class FakeBatchWriter:
+    """Collects puts; raises on exit when fail_flush is set"""
+    
+    def __init__(self, fail_flush=False):
+        self.fail_flush = fail_flush
+        self.items = []
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        if self.fail_flush:
+            raise RuntimeError('flush failed')
+    
+    def put_item(self, Item):
+        self.items.append(Item)
+
+
+def _patch(monkeypatch, writer):
+    table = type('FakeTable', (), {'batch_writer': lambda self: writer})()
+    monkeypatch.setattr(polling, 'table', table)
+
+
+def _copy(system_id, energy):
+    return {'systemId': system_id, 'systemName': f'System {system_id}', 'energyProductionWh': Decimal(energy),
+            'earnings': Decimal('1.5'), 'co2Savings': Decimal('0.5'), 'PK': f'System#{system_id}'}
+
+
+USER_COPIES = {
+    'User#u1': {'System#a': _copy('a', '1000'), 'System#b': _copy('b', '2500')},
+    'User#u2': {'System#a': _copy('a', '1000')},
+    'User#bad': {'System#c': {'systemId': 'c'}},
+}
+
+
+def test_aggregates_roll_up_each_user(monkeypatch):
+    writer = FakeBatchWriter()
+    _patch(monkeypatch, writer)
+    
+    stored = polling.store_user_monthly_aggregates('2025-03', USER_COPIES)
+    
+    assert stored == 2
+    aggregates = {item['PK']: item for item in writer.items}
+    assert set(aggregates) == {'User#u1', 'User#u2'}
+    assert aggregates['User#u1']['SK'] == 'MONTHLY#2025-03'
+    assert aggregates['User#u1']['totalEnergyWh'] == Decimal('3500')
+    assert aggregates['User#u1']['totalEarnings'] == Decimal('3.0')
+    assert [copy['systemId'] for copy in aggregates['User#u1']['perSystem']] == ['a', 'b']
+    assert len({item['updatedAt'] for item in writer.items}) == 1
+
+
+def test_failed_flush_stores_nothing(monkeypatch):
+    _patch(monkeypatch, FakeBatchWriter(fail_flush=True))
+    
+    assert polling.store_user_monthly_aggregates('2025-03', USER_COPIES) == 0
+
+
+def test_failed_user_copies_do_not_fail_the_monthly_entry(monkeypatch):
+    stored = []
+    table = type('FakeTable', (), {'put_item': lambda self, Item: stored.append(Item)})()
+    monkeypatch.setattr(polling, 'table', table)
+    monkeypatch.setattr(polling, 'api_request', lambda endpoint, params=None: None)
+    
+    def fail_copies(item):
+        raise RuntimeError('user-system index unavailable')
+    monkeypatch.setattr(polling, 'store_user_monthly_copies', fail_copies)
+    
+    system = polling.PvSystemMetadata('a', 'System A')
+    assert polling.store_monthly_data(system, datetime(2025, 3, 15), 0.1) is True
+    assert [item['SK'] for item in stored] == ['DATA#MONTHLY#2025-03']
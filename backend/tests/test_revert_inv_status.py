@@ -0,0 +1,69 @@
+import revert_inv_status
+
+
+class FakeBatchWriter:
+    """Buffers puts and sends them 25 at a time like boto3's batch writer, failing the send numbered fail_on_send"""
+    
+    def __init__(self, fail_on_send=None):
+        self.fail_on_send = fail_on_send
+        self.buffer = []
+        self.sent = []
+        self.sends = 0
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        if self.buffer:
+            self._send()
+    
+    def put_item(self, Item):
+        self.buffer.append(Item)
+        if len(self.buffer) >= revert_inv_status.BATCH_WRITE_SIZE:
+            self._send()
+    
+    def _send(self):
+        items, self.buffer = self.buffer, []
+        self.sends += 1
+        if self.sends == self.fail_on_send:
+            raise RuntimeError('BatchWriteItem failed')
+        self.sent.extend(items)
+
+
+def _patch(monkeypatch, writer):
+    table = type('FakeTable', (), {'batch_writer': lambda self, **kwargs: writer})()
+    monkeypatch.setattr(revert_inv_status, 'table', table)
+
+
+def _entries(count):
+    return [{'PK': f'Inverter#d{i}', 'SK': 'STATUS', 'device_id': f'd{i}', 'pvSystemId': 's1'}
+            for i in range(count)]
+
+
+def test_all_entries_written(monkeypatch):
+    writer = FakeBatchWriter()
+    _patch(monkeypatch, writer)
+    
+    chunk_stats = revert_inv_status.write_clean_entries(_entries(60), 0, '2025-03-01T00:00:00')
+    
+    assert chunk_stats == {'entries_created': 60, 'create_errors': 0}
+    assert len(writer.sent) == 60
+
+
+def test_failed_automatic_flush_fails_its_whole_buffer(monkeypatch):
+    writer = FakeBatchWriter(fail_on_send=2)
+    _patch(monkeypatch, writer)
+    
+    chunk_stats = revert_inv_status.write_clean_entries(_entries(60), 0, '2025-03-01T00:00:00')
+    
+    assert chunk_stats == {'entries_created': 25, 'create_errors': 35}
+    assert len(writer.sent) == 25
+
+
+def test_failed_final_flush_fails_the_remainder(monkeypatch):
+    writer = FakeBatchWriter(fail_on_send=3)
+    _patch(monkeypatch, writer)
+    
+    chunk_stats = revert_inv_status.write_clean_entries(_entries(60), 0, '2025-03-01T00:00:00')
+    
+    assert chunk_stats == {'entries_created': 50, 'create_errors': 10}
@@ -0,0 +1,81 @@
+import pytest
+from botocore.exceptions import ClientError
+
+import sk_pk_index
+
+
+def _error(code):
+    return ClientError({'Error': {'Code': code, 'Message': code}}, 'Query')
+
+
+class FakeReader:
+    """Table whose query returns query_pages in order, raising any exception in the list"""
+    
+    def __init__(self, query_pages, scan_items=()):
+        self.query_pages = list(query_pages)
+        self.scan_items = list(scan_items)
+        self.query_calls = []
+        self.scan_calls = []
+    
+    def query(self, **kwargs):
+        self.query_calls.append(kwargs)
+        page_number = kwargs.get('ExclusiveStartKey', 0)
+        page = self.query_pages[page_number]
+        if isinstance(page, Exception):
+            raise page
+        response = {'Items': page, 'Count': len(page)}
+        if page_number + 1 < len(self.query_pages):
+            response['LastEvaluatedKey'] = page_number + 1
+        return response
+    
+    def scan(self, **kwargs):
+        self.scan_calls.append(kwargs)
+        items = self.scan_items if kwargs['Segment'] == 0 else []
+        return {'Items': items, 'Count': len(items)}
+
+
+def test_query_pages_are_read_in_order():
+    reader = FakeReader([[{'PK': 'a'}], [{'PK': 'b'}], [{'PK': 'c'}]])
+    
+    items = sk_pk_index.read_sk_pk_items(reader, 'key', 'filter')
+    
+    assert [item['PK'] for item in items] == ['a', 'b', 'c']
+    assert reader.scan_calls == []
+
+
+def test_missing_index_falls_back_to_parallel_scan():
+    reader = FakeReader([_error('ValidationException')], scan_items=[{'PK': 'a'}, {'PK': 'b'}])
+    
+    items = sk_pk_index.read_sk_pk_items(reader, 'key', 'filter', total_segments=3,
+                                         FilterExpression='query only')
+    
+    assert [item['PK'] for item in items] == ['a', 'b']
+    assert sorted(call['Segment'] for call in reader.scan_calls) == [0, 1, 2]
+    assert all(call['FilterExpression'] == 'filter' and call['TotalSegments'] == 3
+               for call in reader.scan_calls)
+    assert all('IndexName' not in call for call in reader.scan_calls)
+
+
+def test_error_after_first_page_is_raised_without_scanning():
+    reader = FakeReader([[{'PK': 'a'}], _error('ValidationException')], scan_items=[{'PK': 'a'}])
+    pages = sk_pk_index.iter_sk_pk_pages(reader, 'key', 'filter')
+    
+    assert next(pages) == [{'PK': 'a'}]
+    with pytest.raises(ClientError):
+        next(pages)
+    assert reader.scan_calls == []
+
+
+def test_other_errors_are_raised():
+    reader = FakeReader([_error('ProvisionedThroughputExceededException')])
+    
+    with pytest.raises(ClientError):
+        sk_pk_index.read_sk_pk_items(reader, 'key', 'filter')
+    assert reader.scan_calls == []
+
+
+def test_count_uses_select_count():
+    reader = FakeReader([[{'PK': 'a'}, {'PK': 'b'}], [{'PK': 'c'}]])
+    
+    assert sk_pk_index.count_sk_pk_items(reader, 'key', 'filter') == 3
+    assert all(call['Select'] == 'COUNT' for call in reader.query_calls)
@@ -0,0 +1,56 @@
+import update_inverter_gs
+
+
+class FakeClient:
+    """BatchExecuteStatement client that fails statements by PK, a fixed number of times each"""
+    
+    def __init__(self, errors):
+        # {PK: [error code per attempt]}; the statement succeeds once its codes run out
+        self.errors = errors
+        self.calls = []
+    
+    def batch_execute_statement(self, Statements):
+        self.calls.append([statement['Parameters'][2] for statement in Statements])
+        responses = []
+        for statement in Statements:
+            codes = self.errors.get(statement['Parameters'][2])
+            responses.append({'Error': {'Code': codes.pop(0), 'Message': ''}} if codes else {})
+        return {'Responses': responses}
+
+
+class FakeTable:
+    name = 'Moose-DDB'
+    
+    def __init__(self, client):
+        self.meta = type('Meta', (), {'client': client})()
+
+
+def _items(*device_ids):
+    return [
+        {'PK': f'Inverter#{device_id}', 'SK': 'STATUS',
+         'GSI2PK': 'System#s1', 'GSI2SK': f'Inverter#{device_id}'}
+        for device_id in device_ids
+    ]
+
+
+def test_retryable_errors_are_retried(monkeypatch):
+    monkeypatch.setattr(update_inverter_gs.time, 'sleep', lambda seconds: None)
+    client = FakeClient({
+        'Inverter#a': ['ThrottlingError', 'ProvisionedThroughputExceeded'],
+        'Inverter#b': ['ConditionalCheckFailed'],
+    })
+    
+    failed = update_inverter_gs.write_gsi_batch(FakeTable(client), _items('a', 'b', 'c'))
+    
+    assert failed == 1
+    assert client.calls == [['Inverter#a', 'Inverter#b', 'Inverter#c'], ['Inverter#a'], ['Inverter#a']]
+
+
+def test_statements_still_throttled_count_as_failed(monkeypatch):
+    monkeypatch.setattr(update_inverter_gs.time, 'sleep', lambda seconds: None)
+    client = FakeClient({'Inverter#a': ['ThrottlingError'] * update_inverter_gs.MAX_BATCH_RETRIES})
+    
+    failed = update_inverter_gs.write_gsi_batch(FakeTable(client), _items('a', 'b'))
+    
+    assert failed == 1
+    assert len(client.calls) == update_inverter_gs.MAX_BATCH_RETRIES